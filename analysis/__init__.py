@@ -5,10 +5,11 @@ Pipeline: calibrazione campo → preprocessing → detection → tracking → ev
 from .config import AnalysisConfig
 from .field_calibration import FieldCalibrator
 from .video_preprocessing import preprocess_video, get_preprocessed_path
-from .player_detection import PlayerDetector, run_player_detection, get_detections_path
+from .player_detection import PlayerDetector, create_player_detector, run_player_detection, get_detections_path
 from .player_tracking import run_player_tracking, get_tracks_path
 from .ball_detection import run_ball_detection, get_ball_detections_path
 from .ball_tracking import run_ball_tracking, get_ball_tracks_path
+from .unified_detection import run_unified_detection
 
 __all__ = [
     "AnalysisConfig",
@@ -16,6 +17,7 @@ __all__ = [
     "preprocess_video",
     "get_preprocessed_path",
     "PlayerDetector",
+    "create_player_detector",
     "run_player_detection",
     "get_detections_path",
     "run_player_tracking",
@@ -24,4 +26,5 @@ __all__ = [
     "get_ball_detections_path",
     "run_ball_tracking",
     "get_ball_tracks_path",
+    "run_unified_detection",
 ]
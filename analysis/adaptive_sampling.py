@@ -0,0 +1,154 @@
+"""
+Campionamento adattivo al movimento per la detection.
+
+Il video viene letto al passo base (ceiling_fps, es. 10 fps) ma al modello arrivano solo i frame
+"utili": quando l'inquadratura è ferma (o non mostra il campo) si scende verso floor_fps,
+durante il gioco veloce si resta a ceiling_fps. Il costo di decidere è un absdiff su un frame
+ridotto (SceneChangeDetector) + la percentuale di verde (_field_score), trascurabile rispetto
+all'inference.
+
+Ogni frame emesso porta `step` (frame video dal campione precedente) e `motion` (movimento
+smussato 0-1): run_*_detection li scrivono nel JSON, tracking ed event engine li usano per
+tempi e velocità con passo variabile.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+import cv2
+
+from .frame_sampler import FrameSampler, VideoFrame, frame_step_for
+from .game_segment_detection import _field_score
+from .track_store import TrackStore
+from .per_frame_calibrator import SceneChangeDetector
+
+_ANALYSIS_DOWNSAMPLE = 4  # frame ridotto 1/4 per motion e campo
+
+
+@dataclass
+class AdaptiveSampling:
+    """
+    Parametri del campionamento adattivo.
+    motion_low / motion_high: differenza media (0-1, come SceneChangeDetector) sotto cui la scena
+    è "ferma" (floor_fps) e sopra cui è "gioco veloce" (ceiling_fps); in mezzo interpolazione lineare.
+    field_min: sotto questa quota di campo visibile (_field_score) si usa floor_fps.
+    scene_cut: differenza oltre cui il frame è un cambio scena e viene sempre emesso.
+    """
+
+    floor_fps: float = 2.0
+    ceiling_fps: float = 10.0
+    motion_low: float = 0.004
+    motion_high: float = 0.03
+    field_min: float = 0.25
+    scene_cut: float = 0.12
+    smoothing: float = 0.5  # peso del nuovo valore nella media esponenziale del movimento
+
+    def steps(self, video_fps: float) -> Tuple[int, int]:
+        """(passo base, passo massimo) in frame video; il massimo è multiplo del base."""
+        base = frame_step_for(video_fps, self.ceiling_fps)
+        floor_step = frame_step_for(video_fps, min(self.floor_fps, self.ceiling_fps))
+        return base, max(base, (floor_step // base) * base)
+
+    def as_dict(self, video_fps: float) -> dict:
+        base, max_step = self.steps(video_fps)
+        return {
+            "mode": "adaptive",
+            "floor_fps": self.floor_fps,
+            "ceiling_fps": self.ceiling_fps,
+            "base_step": base,
+            "max_step": max_step,
+        }
+
+
+class AdaptiveFrameSampler:
+    """
+    Itera i frame di `video` al passo base e decide quali emettere.
+    Produce (VideoFrame, step, motion): step = frame video dal campione emesso precedente
+    (passo base per il primo), motion = movimento smussato al momento della decisione.
+    """
+
+    def __init__(
+        self,
+        video,
+        video_fps: float,
+        config: Optional[AdaptiveSampling] = None,
+        start_frame: int = 0,
+        end_frame: Optional[int] = None,
+    ):
+        self.config = config or AdaptiveSampling()
+        self.base_step, self.max_step = self.config.steps(video_fps)
+        self._sampler = FrameSampler(video, step=self.base_step, start_frame=start_frame, end_frame=end_frame)
+        self._scene = SceneChangeDetector(threshold=self.config.scene_cut, downsample=1)
+
+    def desired_step(self, motion: float, field: float) -> int:
+        """Passo (multiplo del base) per il livello di movimento e di campo visibile."""
+        cfg = self.config
+        if field < cfg.field_min or cfg.motion_high <= cfg.motion_low:
+            t = 0.0 if field < cfg.field_min else float(motion >= cfg.motion_high)
+        else:
+            t = min(1.0, max(0.0, (motion - cfg.motion_low) / (cfg.motion_high - cfg.motion_low)))
+        ratio = self.max_step // self.base_step
+        return self.base_step * max(1, int(round(ratio - t * (ratio - 1))))
+
+    def __iter__(self) -> Iterator[Tuple[VideoFrame, int, float]]:
+        cfg = self.config
+        motion = 0.0
+        last = None
+        for vf in self._sampler:
+            h, w = vf.image.shape[:2]
+            small = cv2.resize(
+                vf.image,
+                (max(1, w // _ANALYSIS_DOWNSAMPLE), max(1, h // _ANALYSIS_DOWNSAMPLE)),
+                interpolation=cv2.INTER_AREA,
+            )
+            cut, diff = self._scene.has_changed(small)
+            first = last is None
+            if not first:
+                motion = cfg.smoothing * diff + (1.0 - cfg.smoothing) * motion
+            if first or cut or vf.index - last >= self.desired_step(motion, _field_score(small)):
+                yield vf, (self.base_step if first else vf.index - last), round(motion, 4)
+                last = vf.index
+
+    def release(self) -> None:
+        self._sampler.release()
+
+
+def sample_age_step(frame_data: dict, sampling: Optional[dict]) -> int:
+    """
+    Invecchiamento di un track non associato, in campioni al passo base: 1 con passo fisso,
+    step / base_step con campionamento adattivo (max_age resta una durata, non un numero di campioni).
+    """
+    if not sampling or not frame_data.get("step"):
+        return 1
+    return max(1, int(frame_data["step"]) // max(1, int(sampling.get("base_step") or 1)))
+
+
+def sample_fields(frame_data: dict, sampling: Optional[dict]) -> dict:
+    """Campi da riportare nei track per frame con campionamento adattivo: frame video e passo ({} con passo fisso)."""
+    if not sampling:
+        return {}
+    return {"video_frame": frame_data.get("frame"), "step": frame_data.get("step")}
+
+
+def sample_times_ms(*tracks) -> Optional[Dict[int, float]]:
+    """
+    Timestamp (ms) per indice campione da player_tracks / ball_tracks con campionamento adattivo
+    (campo "video_frame" per frame). None con passo fisso: i consumer usano frame * 1000 / fps.
+    Accetta dict JSON o archivio TrackStore. Il primo file con un indice ha la precedenza.
+    """
+    times: Dict[int, float] = {}
+    for data in tracks:
+        if not data or not data.get("sampling"):
+            continue
+        fps = float(data.get("fps") or 25.0)
+        if isinstance(data, TrackStore):
+            video = data.frame_fields.get("video_frame")
+            if video is None:
+                continue
+            for f, v in zip(data.frame_index.tolist(), video.tolist()):
+                if v >= 0:
+                    times.setdefault(f, v * 1000.0 / fps)
+            continue
+        for fd in data.get("frames", []):
+            if fd.get("video_frame") is not None:
+                times.setdefault(fd["frame"], fd["video_frame"] * 1000.0 / fps)
+    return times or None
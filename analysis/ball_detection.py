@@ -1,16 +1,19 @@
 """
 Ball detection per analisi automatica.
-Usa YOLOX-s (COCO class 32 = sports ball).
+Usa YOLOX-s custom soccer (classi Ball/football, vedi player_detection.BALL_CLASS_IDS).
 Riutilizza la stessa infrastruttura di player_detection.
 """
 from pathlib import Path
 from typing import Callable, List, Optional, Tuple
 from dataclasses import dataclass
-import json
+import threading
 
 import cv2
 import numpy as np
 
+from .adaptive_sampling import AdaptiveSampling
+from .checkpoint_log import CheckpointLog
+
 
 def _to_scalar(x) -> float:
     """Converte a scalare Python anche se x è un array numpy (evita WinError scalare)."""
@@ -18,9 +21,6 @@ def _to_scalar(x) -> float:
     return float(arr.flat[0]) if arr.size >= 1 else 0.0
 
 
-# COCO class id per "sports ball"
-COCO_SPORTS_BALL_CLASS_ID = 32
-
 DETECTIONS_DIR = "detections"
 BALL_DETECTIONS_FILE = "ball_detections.json"
 
@@ -35,71 +35,124 @@ class BallBox:
 
 
 def _get_yolox_predictor():
-    """Crea/carica predictor YOLOX. Ritorna (predictor, error_msg); predictor=None se fallisce."""
-    from .player_detection import PlayerDetector
-    det = PlayerDetector(conf_thresh=0.25)
+    """Crea/carica predictor YOLOX (backend configurato). Ritorna (predictor, error_msg); predictor=None se fallisce."""
+    from .player_detection import create_player_detector
+    det = create_player_detector(conf_thresh=0.25)
     if not det._init_predictor():
         return None, det.get_init_error() or "YOLOX non inizializzato."
     return det._predictor, None
 
 
+def _ball_mask(batch, conf_thresh: float):
+    """Maschera delle detection delle classi palla (Ball, football) con conf >= conf_thresh."""
+    from .player_detection import BALL_CLASS_IDS
+    return np.isin(batch.class_id, list(BALL_CLASS_IDS)) & (batch.conf >= conf_thresh)
+
+
+def _balls_from_batch(batch, conf_thresh: float = 0.15) -> List[BallBox]:
+    """BallBox per le detection palla di un DetectionBatch."""
+    idx = np.flatnonzero(_ball_mask(batch, conf_thresh))
+    return [
+        BallBox(x=x, y=y, w=w, h=h, confidence=c)
+        for (x, y, w, h), c in zip(batch.xywh[idx].tolist(), batch.conf[idx].tolist())
+    ]
+
+
+def _best_ball(batch, conf_thresh: float = 0.15) -> Optional[BallBox]:
+    """Candidato palla con confidenza massima (il primo in caso di parità), o None."""
+    idx = np.flatnonzero(_ball_mask(batch, conf_thresh))
+    if idx.size == 0:
+        return None
+    i = int(idx[np.argmax(batch.conf[idx])])
+    x, y, w, h = batch.xywh[i].tolist()
+    return BallBox(x=x, y=y, w=w, h=h, confidence=float(batch.conf[i]))
+
+
 def _detect_balls(frame: np.ndarray, predictor, conf_thresh: float = 0.15) -> List[BallBox]:
-    """Detection palla (COCO class 32).
+    """Detection palla con il modello soccer (classi Ball/football).
     Usa img_info['ratio'] per mappare le coordinate dallo spazio preprocessato al frame originale."""
+    from .player_detection import _decode_yolox_output
     outputs, img_info = predictor.inference(frame)
-    boxes = []
-    if outputs is None or len(outputs) == 0:
-        return boxes
-    out0 = outputs[0]
-    if out0 is None:
-        return boxes
-    ratio = float(img_info.get("ratio", 1.0)) or 1.0
-    out_arr = np.asarray(out0) if not isinstance(out0, np.ndarray) else out0
-    if out_arr.ndim == 1:
-        out_arr = out_arr.reshape(1, -1)
-    for i in range(len(out_arr)):
-        out = out_arr[i]
-        if len(out) < 7:
-            continue
-        class_id = int(_to_scalar(out[6])) if len(out) > 6 else 0
-        if class_id != COCO_SPORTS_BALL_CLASS_ID:
-            continue
-        x1 = _to_scalar(out[0]); y1 = _to_scalar(out[1]); x2 = _to_scalar(out[2]); y2 = _to_scalar(out[3])
-        obj_conf = _to_scalar(out[4])
-        class_conf = _to_scalar(out[5]) if len(out) > 5 else obj_conf
-        conf = obj_conf * class_conf if len(out) > 6 else obj_conf
-        if conf < conf_thresh:
-            continue
-        x1, x2 = min(x1, x2), max(x1, x2)
-        y1, y2 = min(y1, y2), max(y1, y2)
-        w, h = x2 - x1, y2 - y1
-        if w <= 0 or h <= 0:
-            continue
-        x1, y1, w, h = x1 / ratio, y1 / ratio, w / ratio, h / ratio
-        boxes.append(BallBox(x=x1, y=y1, w=w, h=h, confidence=conf))
+    return _balls_from_batch(_decode_yolox_output(outputs, img_info, conf_thresh), conf_thresh)
+
+
+# ROI palla: lato minimo del ritaglio (px del frame di detection) e ricerca full-frame periodica
+DEFAULT_ROI_SIZE = 320
+DEFAULT_ROI_FULL_EVERY = 25
+
+
+class BallRoiTracker:
+    """
+    Predice la posizione della palla (velocità costante tra frame campionati) e sceglie la
+    regione su cui eseguire l'inference: ritaglio roi_size x roi_size attorno alla posizione
+    prevista finché la palla è agganciata, frame intero quando è persa o ogni full_every frame.
+    Il ritaglio viene portato a test_size dal letterbox YOLOX: la palla arriva al modello ingrandita.
+    """
+
+    def __init__(self, roi_size: int = DEFAULT_ROI_SIZE, full_every: int = DEFAULT_ROI_FULL_EVERY):
+        self.roi_size = max(32, int(roi_size))
+        self.full_every = max(1, int(full_every))
+        self._center: Optional[Tuple[float, float]] = None
+        self._velocity = (0.0, 0.0)
+        self._ball_size = 0.0
+        self._since_full = 0
+
+    @property
+    def alive(self) -> bool:
+        return self._center is not None
+
+    def roi(self, width: int, height: int) -> Optional[Tuple[int, int, int, int]]:
+        """(x0, y0, x1, y1) del ritaglio per il prossimo frame, o None per la ricerca full-frame."""
+        if self._center is None or self._since_full >= self.full_every:
+            return None
+        side = int(max(self.roi_size, 6 * self._ball_size))
+        if side >= min(width, height):
+            return None
+        cx = self._center[0] + self._velocity[0]
+        cy = self._center[1] + self._velocity[1]
+        x0 = int(min(max(cx - side / 2, 0), width - side))
+        y0 = int(min(max(cy - side / 2, 0), height - side))
+        return x0, y0, x0 + side, y0 + side
+
+    def update(self, best: Optional[BallBox], full_frame: bool) -> None:
+        """Aggiorna lo stato con la palla trovata (coordinate del frame di detection) o None."""
+        self._since_full = 0 if full_frame else self._since_full + 1
+        if best is None:
+            self._center = None
+            self._velocity = (0.0, 0.0)
+            return
+        center = (best.x + best.w / 2, best.y + best.h / 2)
+        if self._center is not None:
+            self._velocity = (center[0] - self._center[0], center[1] - self._center[1])
+        self._center = center
+        self._ball_size = max(best.w, best.h)
+
+
+def _detect_balls_roi(frame: np.ndarray, predictor, tracker: BallRoiTracker, conf_thresh: float) -> List[BallBox]:
+    """
+    Detection palla guidata dal tracker: inference sul ritaglio attorno alla posizione prevista;
+    se nel ritaglio non c'è palla, ricerca sul frame intero. Coordinate sempre nel frame passato.
+    """
+    h, w = frame.shape[:2]
+    roi = tracker.roi(w, h)
+    if roi is not None:
+        x0, y0, x1, y1 = roi
+        boxes = _detect_balls(frame[y0:y1, x0:x1], predictor, conf_thresh)
+        if boxes:
+            boxes = [BallBox(b.x + x0, b.y + y0, b.w, b.h, b.confidence) for b in boxes]
+            tracker.update(max(boxes, key=lambda b: b.confidence), full_frame=False)
+            return boxes
+    boxes = _detect_balls(frame, predictor, conf_thresh)
+    tracker.update(max(boxes, key=lambda b: b.confidence) if boxes else None, full_frame=True)
     return boxes
 
 
-def _apply_field_crop(
-    frame: np.ndarray,
-    calibration_path: Optional[str],
-) -> Tuple[np.ndarray, Optional[Tuple[int, int, int, int]]]:
-    """Ritaglia frame all'area campo se calibration valida. Ritorna (frame_crop, (x0,y0,x1,y1)) o (frame, None)."""
-    if not calibration_path or not Path(calibration_path).exists():
-        return frame, None
-    try:
-        from .field_calibration import FieldCalibrator
-        bounds = FieldCalibrator.get_field_bounds(Path(calibration_path))
-        if bounds is None:
-            return frame, None
-        h, w = frame.shape[:2]
-        x0, y0 = max(0, int(bounds[0])), max(0, int(bounds[1]))
-        x1, y1 = min(w, int(bounds[2])), min(h, int(bounds[3]))
-        if x1 <= x0 or y1 <= y0:
-            return frame, None
-        return frame[y0:y1, x0:x1].copy(), (x0, y0, x1, y1)
-    except Exception:
-        return frame, None
+def _ball_to_json(best: Optional[BallBox], crop_bounds: Optional[Tuple[int, int, int, int]]) -> Optional[dict]:
+    """Serializza la miglior detection palla del frame (coords frame completo) o None."""
+    if best is None:
+        return None
+    dx, dy = (crop_bounds[0], crop_bounds[1]) if crop_bounds is not None else (0, 0)
+    return {"x": float(best.x) + float(dx), "y": float(best.y) + float(dy), "w": float(best.w), "h": float(best.h), "conf": float(best.confidence)}
 
 
 def run_ball_detection(
@@ -114,15 +167,39 @@ def run_ball_detection(
     first_checkpoint: int = 500,
     start_frame: int = 0,
     initial_results: Optional[dict] = None,
+    prefetch: int = 0,
+    cancel_event: Optional[threading.Event] = None,
+    stats_callback: Optional[Callable[[dict], None]] = None,
+    frame_range: Optional[Tuple[int, Optional[int]]] = None,
+    roi_mode: bool = False,
+    roi_size: int = DEFAULT_ROI_SIZE,
+    roi_full_every: int = DEFAULT_ROI_FULL_EVERY,
+    adaptive: Optional[AdaptiveSampling] = None,
+    resume: bool = False,
 ) -> tuple[bool, str]:
     """
     Rileva la palla in ogni frame. Salva in JSON.
     Ritorna (ok, messaggio_errore).
     target_fps: FPS target per sampling (10-12 consigliato per CPU). 0 = legacy (1 ogni 2 frame).
     calibration_path: se valido, ritaglia frame all'area campo (boost prestazioni).
-    checkpoint_interval: salva ogni N frame dopo il primo (0=off). first_checkpoint: primo salvataggio.
-    start_frame, initial_results: ripresa da checkpoint.
+    checkpoint_interval: flush del log di checkpoint ogni N frame dopo il primo (0=off). first_checkpoint: primo flush.
+    start_frame, initial_results, resume: ripresa come in run_player_detection.
+    prefetch, cancel_event, stats_callback, frame_range: come in run_player_detection.
+    roi_mode: se True, mentre la palla è agganciata l'inference gira solo su un ritaglio roi_size
+    attorno alla posizione prevista (BallRoiTracker); frame intero quando la palla è persa o ogni
+    roi_full_every frame campionati. Formato di ball_detections.json invariato.
+    adaptive: campionamento adattivo al movimento (AdaptiveSampling), come in run_player_detection.
     """
+    from .detection_pipeline import PipelineCancelled, run_detection_pipeline
+    from .frame_sampler import frame_step_for
+    from .player_detection import (
+        _iter_sampled_frames,
+        _progress_count,
+        _sampled_count,
+        _sampling_fields,
+        _set_frame_meta,
+    )
+
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         return False, "Impossibile aprire il video."
@@ -135,83 +212,64 @@ def run_ball_detection(
 
     total = int(_to_scalar(cap.get(cv2.CAP_PROP_FRAME_COUNT))) or 0
     video_fps = _to_scalar(cap.get(cv2.CAP_PROP_FPS)) or 25.0
-    if target_fps > 0 and video_fps > 0:
-        frame_step = max(1, int(round(video_fps / target_fps)))
-    else:
-        frame_step = 2  # legacy
-    total_to_process = (total + frame_step - 1) // frame_step if total > 0 else 0
-    if initial_results and start_frame > 0:
+    frame_step = frame_step_for(video_fps, target_fps)  # target_fps <= 0 → legacy (1 ogni 2)
+    if adaptive is not None:
+        frame_step = adaptive.steps(video_fps)[0]
+    total_to_process = _sampled_count(total, frame_step, frame_range)
+    range_start, range_end = frame_range or (0, None)
+    if initial_results and start_frame > 0 and not resume:
         results = initial_results
-        frame_idx = start_frame
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
     else:
         results = {"frames": [], "width": 0, "height": 0, "fps": video_fps, "frame_step": frame_step, "target_fps": target_fps if target_fps > 0 else None, "crop_bounds": None}
-        frame_idx = 0
-    last_pct = -1
-    crop_bounds = None
-    processed_count = len(results.get("frames", []))
+        if adaptive is not None:
+            results["sampling"] = adaptive.as_dict(video_fps)
+        start_frame = 0
+    log = CheckpointLog(output_path, results, checkpoint_interval, first_checkpoint, resume=resume)
+    if log.start_frame is not None:
+        start_frame = log.start_frame
+    start_frame = max(start_frame, range_start)
+    state = {"last_pct": -1, "processed": log.count}
 
-    try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            if frame_idx == 0:
-                results["width"] = int(frame.shape[1])
-                results["height"] = int(frame.shape[0])
-                results["fps"] = _to_scalar(cap.get(cv2.CAP_PROP_FPS)) or 25.0
-
-            frame_to_detect, crop_bounds = _apply_field_crop(frame, calibration_path)
-            if frame_idx == 0 and crop_bounds is not None:
-                results["crop_bounds"] = {"x0": crop_bounds[0], "y0": crop_bounds[1], "x1": crop_bounds[2], "y1": crop_bounds[3]}
-
-            if frame_idx % frame_step == 0:
-                boxes = _detect_balls(frame_to_detect, predictor, conf_thresh)
-                best = max(boxes, key=lambda b: b.confidence) if boxes else None
-            else:
-                best = None
-            if frame_idx % frame_step == 0:
-                if best and crop_bounds is not None:
-                    x0, y0 = crop_bounds[0], crop_bounds[1]
-                    det_json = {"x": float(best.x) + float(x0), "y": float(best.y) + float(y0), "w": float(best.w), "h": float(best.h), "conf": float(best.confidence)}
-                elif best:
-                    det_json = {"x": float(best.x), "y": float(best.y), "w": float(best.w), "h": float(best.h), "conf": float(best.confidence)}
-                else:
-                    det_json = None
-                frame_data = {"frame": frame_idx, "detection": det_json}
-                results["frames"].append(frame_data)
-                processed_count += 1
-
-                n = len(results["frames"])
-                _should_save = (
-                    checkpoint_interval > 0
-                    and n > 0
-                    and (
-                        n == first_checkpoint
-                        or (n > first_checkpoint and (n - first_checkpoint) % checkpoint_interval == 0)
-                    )
-                )
-                if _should_save:
-                    ckpt_path = str(Path(output_path).with_suffix("")) + f"_checkpoint_{frame_idx}.json"
-                    with open(ckpt_path, "w", encoding="utf-8") as f:
-                        json.dump(results, f, indent=2)
-
-                if total_to_process > 0 and progress_callback:
-                    pct = int(100 * processed_count / total_to_process)
-                    if pct != last_pct and (pct % 10 == 0 or pct >= 100):
-                        progress_callback(processed_count, total_to_process, f"Frame {processed_count}/{total_to_process}")
-                        last_pct = pct
-
-            frame_idx += 1
+    def _emit(sf, boxes: List[BallBox]) -> None:
+        _set_frame_meta(results, sf, video_fps)
+        best = max(boxes, key=lambda b: b.confidence) if boxes else None
+        log.append({"frame": sf.index, "detection": _ball_to_json(best, sf.crop_bounds), **_sampling_fields(sf)})
+        state["processed"] += 1
+        processed_count = _progress_count(sf, state["processed"], frame_step, frame_range)
+
+        if total_to_process > 0 and progress_callback:
+            pct = int(100 * processed_count / total_to_process)
+            if pct != state["last_pct"] and (pct % 10 == 0 or pct >= 100):
+                progress_callback(processed_count, total_to_process, f"Frame {processed_count}/{total_to_process}")
+                state["last_pct"] = pct
+
+    # ROI: stato sequenziale, lo stadio inference processa i frame in ordine nello stesso thread
+    tracker = BallRoiTracker(roi_size, roi_full_every) if roi_mode else None
 
+    def infer_fn(frames: List[np.ndarray]) -> List[List[BallBox]]:
+        if tracker is not None:
+            return [_detect_balls_roi(f, predictor, tracker, conf_thresh) for f in frames]
+        return [_detect_balls(f, predictor, conf_thresh) for f in frames]
+
+    try:
+        stats = run_detection_pipeline(
+            _iter_sampled_frames(cap, frame_step, calibration_path, start_frame, range_end, adaptive),
+            infer_fn,
+            _emit,
+            threaded=prefetch > 0,
+            queue_size=prefetch,
+            cancel_event=cancel_event,
+        )
         cap.release()
-        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2)
+        if stats_callback:
+            stats_callback(stats.as_dict())
+        log.finish()
         if progress_callback and total_to_process > 0:
             progress_callback(total_to_process, total_to_process, "Completato")
         return True, ""
+    except PipelineCancelled:
+        cap.release()
+        return False, "Analisi interrotta."
     except Exception as e:
         if cap.isOpened():
             cap.release()
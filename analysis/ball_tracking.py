@@ -1,12 +1,21 @@
 """
 Ball tracking: associa la palla tra frame consecutivi.
 Riutilizza la logica IoU di player_tracking adattata per 0-1 detection per frame.
+Post-pass vettoriale sulla traiettoria (interpolate_ball_frames): scarta i punti fuori traiettoria e
+riempie i buchi brevi con segmenti ad accelerazione costante, marcando i punti con "interpolated".
 """
 import json
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from .adaptive_sampling import sample_age_step, sample_fields
 
 BALL_TRACKING_FILE = "ball_tracks.json"
+# Vicini (per lato) usati per il fit quadratico leave-one-out nel test outlier
+_OUTLIER_NEIGHBORS = 3
+_OUTLIER_PASSES = 4
 
 
 def _iou_box(b1: tuple, b2: tuple) -> float:
@@ -21,16 +30,145 @@ def _iou_box(b1: tuple, b2: tuple) -> float:
     return inter / union if union > 0 else 0
 
 
+def _ball_arrays(frames: List[dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Campioni con palla: indici nella lista frames, tempo (frame video se presente, altrimenti indice
+    campione), centri (N, 2) e dimensioni (N, 2).
+    """
+    idx, t, box = [], [], []
+    for i, fr in enumerate(frames):
+        d = fr.get("detection")
+        if d:
+            idx.append(i)
+            t.append(fr["video_frame"] if fr.get("video_frame") is not None else i)
+            box.append((d["x"], d["y"], d["w"], d["h"]))
+    box = np.asarray(box, dtype=np.float64).reshape(-1, 4)
+    return np.asarray(idx, dtype=np.int64), np.asarray(t, dtype=np.float64), box[:, :2] + box[:, 2:] / 2, box[:, 2:]
+
+
+def _loo_residuals(idx: np.ndarray, t: np.ndarray, c: np.ndarray, keep: np.ndarray, max_gap: int) -> np.ndarray:
+    """
+    Scarto di ogni punto dalla parabola (per coordinata) stimata sui _OUTLIER_NEIGHBORS vicini per lato,
+    escluso il punto stesso e i punti con keep=False; solo vicini entro max_gap + 1 campioni.
+    NaN se i vicini validi sono meno di 4. Tutti i punti in blocco: (N,).
+    """
+    n, k = len(t), _OUTLIER_NEIGHBORS
+    offsets = np.concatenate([np.arange(-k, 0), np.arange(1, k + 1)])
+    nb = np.arange(n)[:, None] + offsets[None, :]  # (N, 2k)
+    inside = (nb >= 0) & (nb < n)
+    nb = np.clip(nb, 0, max(n - 1, 0))
+    valid = inside & keep[nb] & (np.abs(idx[nb] - idx[:, None]) <= max_gap + 1)
+    tau = t[nb] - t[:, None]
+    scale = np.maximum(np.abs(tau).max(axis=1, initial=1.0), 1.0)[:, None]
+    tau = tau / scale
+    A = np.stack([np.ones_like(tau), tau, tau ** 2], axis=2)  # (N, 2k, 3)
+    w = valid.astype(np.float64)
+    AtW = A.transpose(0, 2, 1) * w[:, None, :]
+    M = AtW @ A + np.eye(3) * 1e-9
+    coef = np.linalg.solve(M, AtW @ c[nb])  # (N, 3, 2): parabola per x e y
+    res = np.hypot(*(c - coef[:, 0, :]).T)
+    res[valid.sum(axis=1) < 4] = np.nan
+    return res
+
+
+def interpolate_ball_frames(
+    frames: List[dict],
+    max_gap: int = 10,
+    outlier_factor: float = 5.0,
+) -> Tuple[int, int]:
+    """
+    Post-pass sulla traiettoria palla (frames di ball_tracks.json, modificati in place).
+    - Outlier: punto a più di outlier_factor × diagonale mediana del box dalla parabola dei vicini
+      (leave-one-out, passate ripetute sui massimi locali per non penalizzare i vicini di un outlier)
+      → detection rimossa.
+    - Buchi fino a max_gap campioni tra due punti: parabola per i due estremi con accelerazione stimata
+      dai punti subito fuori dal buco (se mancano, segmento lineare); box interpolati con
+      "interpolated": True e track_id del punto precedente.
+    Ritorna (punti interpolati, outlier rimossi). max_gap <= 0 disattiva il post-pass.
+    """
+    if max_gap <= 0:
+        return 0, 0
+    idx, t, c, wh = _ball_arrays(frames)
+    n = len(idx)
+    if n < 2:
+        return 0, 0
+
+    # Outlier: a ogni passata si scartano solo i massimi locali dello scarto (un outlier sporca anche il fit
+    # dei vicini), poi si ricalcola senza di loro
+    thresh = outlier_factor * max(1.0, float(np.median(np.hypot(wh[:, 0], wh[:, 1]))))
+    keep = np.ones(n, dtype=bool)
+    k = _OUTLIER_NEIGHBORS
+    for _ in range(_OUTLIER_PASSES):
+        res = _loo_residuals(idx, t, c, keep, max_gap)
+        score = np.where(keep & (res > thresh), res, -np.inf)
+        padded = np.pad(score, k, constant_values=-np.inf)
+        local_max = score >= np.lib.stride_tricks.sliding_window_view(padded, 2 * k + 1).max(axis=1)
+        drop = np.isfinite(score) & local_max
+        if not drop.any():
+            break
+        keep &= ~drop
+    rejected = int((~keep).sum())
+    for i in idx[~keep]:
+        frames[i]["detection"] = None
+    idx, t, c, wh = idx[keep], t[keep], c[keep], wh[keep]
+    if len(idx) < 2:
+        return 0, rejected
+
+    # Buchi da riempire: tra i punti consecutivi j e j + 1
+    gap = np.diff(idx) - 1
+    g = np.flatnonzero((gap >= 1) & (gap <= max_gap))
+    if not len(g):
+        return 0, rejected
+    t0, t1 = t[g], t[g + 1]
+    c0, c1 = c[g], c[g + 1]
+    span = np.maximum(t1 - t0, 1e-9)
+
+    # Accelerazione (coefficiente di tau * (tau - 1)) dai punti esterni g - 1 e g + 2, se vicini
+    acc_num = np.zeros((len(g), 2))
+    acc_den = np.full(len(g), 1e-9)
+    for outer in (g - 1, g + 2):
+        ok = (outer >= 0) & (outer < len(idx))
+        o = np.clip(outer, 0, len(idx) - 1)
+        ok &= np.abs(idx[o] - np.where(outer < g, idx[g], idx[g + 1])) <= max_gap + 1
+        tau = (t[o] - t0) / span
+        q = tau * (tau - 1)
+        r = c[o] - (c0 + (c1 - c0) * tau[:, None])
+        acc_num += (ok * q)[:, None] * r
+        acc_den += ok * q * q
+    acc = acc_num / acc_den[:, None]
+
+    # Tutti i campioni mancanti in blocco
+    lens = gap[g]
+    owner = np.repeat(np.arange(len(g)), lens)
+    fill_idx = idx[g][owner] + (np.arange(lens.sum()) - np.repeat(np.cumsum(lens) - lens, lens)) + 1
+    fill_t = np.array([
+        frames[i]["video_frame"] if frames[i].get("video_frame") is not None else i for i in fill_idx
+    ], dtype=np.float64)
+    tau = ((fill_t - t0[owner]) / span[owner])[:, None]
+    centers = c0[owner] + (c1[owner] - c0[owner]) * tau + acc[owner] * tau * (tau - 1)
+    sizes = wh[g][owner] + (wh[g + 1][owner] - wh[g][owner]) * tau
+    boxes = np.concatenate([centers - sizes / 2, sizes], axis=1)
+    prev_ids = [frames[i]["detection"].get("track_id") for i in idx[g]]
+    for i, b, o in zip(fill_idx.tolist(), boxes.tolist(), owner.tolist()):
+        frames[i]["detection"] = {
+            "x": b[0], "y": b[1], "w": b[2], "h": b[3], "track_id": prev_ids[o], "interpolated": True,
+        }
+    return len(fill_idx), rejected
+
+
 def run_ball_tracking(
     ball_detections_path: str,
     output_path: str,
     max_age: int = 15,
     iou_thresh: float = 0.2,
     progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    max_gap: int = 10,
+    outlier_factor: float = 5.0,
 ) -> bool:
     """
     Traccia la palla sui risultati di ball_detection.
     Output: ball_tracks.json con track_id per frame.
+    max_gap, outlier_factor: post-pass interpolate_ball_frames (max_gap = campioni, 0 = disattivato).
     """
     if not Path(ball_detections_path).exists():
         return False
@@ -45,10 +183,13 @@ def run_ball_tracking(
     width = data.get("width", 0)
     height = data.get("height", 0)
     fps = data.get("fps", 25.0)
+    sampling = data.get("sampling")  # campionamento adattivo: passo variabile tra i frame
     total = len(frames_data)
     next_track_id = 0
     active_track = None  # massimo 1 track per palla
     results = {"frames": [], "width": width, "height": height, "fps": fps}
+    if sampling:
+        results["sampling"] = sampling
     last_pct = -1
 
     for frame_idx, frame_data in enumerate(frames_data):
@@ -78,11 +219,11 @@ def run_ball_tracking(
                 out_det = {"x": d["x"], "y": d["y"], "w": d["w"], "h": d["h"], "track_id": t.track_id}
         else:
             if active_track is not None:
-                active_track.age += 1
+                active_track.age += sample_age_step(frame_data, sampling)
                 if active_track.age > max_age:
                     active_track = None
 
-        results["frames"].append({"frame": frame_idx, "detection": out_det})
+        results["frames"].append({"frame": frame_idx, "detection": out_det, **sample_fields(frame_data, sampling)})
 
         if progress_callback and total > 0:
             pct = int(100 * (frame_idx + 1) / total)
@@ -90,6 +231,8 @@ def run_ball_tracking(
                 progress_callback(frame_idx + 1, total, f"Frame {frame_idx + 1}/{total}")
                 last_pct = pct
 
+    interpolate_ball_frames(results["frames"], max_gap=max_gap, outlier_factor=outlier_factor)
+
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(results, f, indent=2)
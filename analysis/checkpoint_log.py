@@ -0,0 +1,171 @@
+"""
+Checkpoint delle detection come log append-only (JSONL).
+
+Al posto di uno snapshot completo del JSON a ogni checkpoint (I/O quadratico sulla partita), ogni
+esecuzione accoda i frame processati a <stem>_checkpoint.jsonl accanto all'output, es.
+player_detections_checkpoint.jsonl:
+
+  {"meta": {...}}                     prima riga: campi del JSON senza "frames" (width, fps, crop_bounds, ...)
+  {"n": 1, "frame": {...}}            un frame per riga, n = frame registrati fino a quello incluso
+  ...
+
+Il flush (con fsync) avviene ai frame di _should_save_checkpoint; per riprendere basta leggere la prima
+e l'ultima riga completa. A fine detection il log viene compattato nel JSON finale (formato invariato)
+ed eliminato: la sua presenza indica un'analisi interrotta (has_checkpoint, --resume).
+"""
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+LOG_SUFFIX = "_checkpoint.jsonl"
+_TAIL_BLOCK = 1 << 16
+
+
+def checkpoint_log_path(output_path) -> Path:
+    """Log di checkpoint per un file di detection (es. .../player_detections_checkpoint.jsonl)."""
+    p = Path(output_path)
+    return p.with_name(p.stem + LOG_SUFFIX)
+
+
+def _read_head(path: Path) -> Optional[dict]:
+    """Meta dalla prima riga del log, None se assente o illeggibile."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            head = json.loads(f.readline())
+    except (OSError, json.JSONDecodeError):
+        return None
+    return head.get("meta") if isinstance(head, dict) else None
+
+
+def _read_tail(path: Path) -> Tuple[Optional[dict], int]:
+    """
+    Ultima riga frame completa e offset di fine dell'ultima riga completa (byte).
+    Legge solo la coda del file (blocchi crescenti finché non trova una riga intera).
+    """
+    try:
+        size = path.stat().st_size
+        with open(path, "rb") as f:
+            block = _TAIL_BLOCK
+            while True:
+                start = max(0, size - block)
+                f.seek(start)
+                chunk = f.read(size - start)
+                end = chunk.rfind(b"\n")
+                if end < 0:
+                    if start == 0:
+                        return None, 0
+                    block *= 2
+                    continue
+                prev = chunk.rfind(b"\n", 0, end)
+                if prev < 0 and start > 0:
+                    block *= 2
+                    continue
+                # Una riga troncata (crash durante il flush) resta dopo end e viene ignorata
+                last = json.loads(chunk[prev + 1:end])
+                return (last if "frame" in last else None), start + end + 1
+    except (OSError, ValueError):
+        return None, 0
+
+
+def read_checkpoint_tail(output_path) -> Optional[Tuple[int, int]]:
+    """
+    (start_frame, frame registrati) dal log di output_path: start_frame è il primo frame da processare.
+    None se il log non esiste o non contiene frame.
+    """
+    last, _ = _read_tail(checkpoint_log_path(output_path))
+    if last is None:
+        return None
+    return int(last["frame"].get("frame", -1)) + 1, int(last["n"])
+
+
+def read_checkpoint(output_path) -> Optional[dict]:
+    """Risultati parziali completi (meta + tutti i frame) dal log di output_path, None se vuoto."""
+    path = checkpoint_log_path(output_path)
+    meta = _read_head(path)
+    if meta is None:
+        return None
+    frames = []
+    with open(path, "r", encoding="utf-8") as f:
+        f.readline()
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            frames.append(json.loads(line)["frame"])
+    if not frames:
+        return None
+    return {"frames": frames, **meta}
+
+
+class CheckpointLog:
+    """
+    Output di una detection. results: dict del JSON in costruzione; results["frames"] contiene solo i
+    frame non ancora scritti nel log (con checkpoint disattivati, tutti i frame come prima).
+    resume: continua il log esistente (meta ripresi dalla prima riga, count dall'ultima).
+    """
+
+    def __init__(self, output_path, results: dict, checkpoint_interval: int = 0, first_checkpoint: int = 500,
+                 resume: bool = False):
+        self.output_path = Path(output_path)
+        self.path = checkpoint_log_path(output_path)
+        self.results = results
+        self.checkpoint_interval = checkpoint_interval
+        self.first_checkpoint = first_checkpoint
+        self.enabled = checkpoint_interval > 0
+        self.count = len(results["frames"])
+        self.start_frame: Optional[int] = None  # primo frame da processare se resume è riuscito
+        if not self.enabled:
+            return
+        last, end = _read_tail(self.path) if resume else (None, 0)
+        meta = _read_head(self.path) if last is not None else None
+        if last is None or meta is None:
+            self.path.unlink(missing_ok=True)
+            return
+        with open(self.path, "r+b") as f:
+            f.truncate(end)  # scarta un'eventuale riga troncata
+        results.update(meta)
+        results["frames"] = []
+        self.count = int(last["n"])
+        self.start_frame = int(last["frame"].get("frame", -1)) + 1
+
+    def append(self, frame: dict) -> None:
+        """Accoda un frame; flush del log ai frame di checkpoint."""
+        from .player_detection import _should_save_checkpoint
+
+        self.results["frames"].append(frame)
+        self.count += 1
+        if self.enabled and _should_save_checkpoint(self.count, self.checkpoint_interval, self.first_checkpoint):
+            self.flush()
+
+    def flush(self) -> None:
+        """Scrive nel log i frame in memoria (con la riga meta se il log è nuovo) e li rilascia."""
+        pending: List[dict] = self.results["frames"]
+        if not pending:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lines = []
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            meta = {k: v for k, v in self.results.items() if k != "frames"}
+            lines.append(json.dumps({"meta": meta}))
+        n0 = self.count - len(pending)
+        lines.extend(json.dumps({"n": n0 + i + 1, "frame": fr}) for i, fr in enumerate(pending))
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.results["frames"] = []
+
+    def finish(self) -> None:
+        """Scrive il JSON finale (compattando il log se usato) ed elimina i file di checkpoint."""
+        if self.enabled and (self.path.exists() or self.count > len(self.results["frames"])):
+            self.flush()
+            data = read_checkpoint(self.output_path) or {**self.results, "frames": []}
+        else:
+            data = self.results
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        self.path.unlink(missing_ok=True)
+        # Snapshot del vecchio formato (*_checkpoint_<frame>.json) rimasti da versioni precedenti
+        for old in self.output_path.parent.glob(f"{self.output_path.stem}_checkpoint_*.json"):
+            old.unlink(missing_ok=True)
@@ -5,7 +5,25 @@ import os
 from pathlib import Path
 
 # Backend detection opzionale: "soccernet" per usare un modello SoccerNet (vedi docs/LIMITI_E_COME_MIGLIORARE.md)
+# "onnx" per ONNX Runtime su CPU (modello esportato con training/export_onnx.py, vedi docs/FASE1_OPTIMIZATIONS.md)
 DETECTION_BACKEND = os.environ.get("FOOTBALL_ANALYZER_DETECTION_BACKEND", "").strip().lower() or None
+# Precisione del modello ONNX: "fp32" (models/best_ckpt.onnx) o "int8" (models/best_ckpt.int8.onnx,
+# creato con training/quantize_onnx.py). "int8" implica il backend "onnx".
+ONNX_PRECISION = os.environ.get("FOOTBALL_ANALYZER_ONNX_PRECISION", "").strip().lower() or "fp32"
+# Modello ONNX per il backend "onnx" (sovrascrive la scelta per precisione)
+ONNX_MODEL_PATH = os.environ.get("FOOTBALL_ANALYZER_ONNX_MODEL", "").strip() or None
+# Thread intra-op di ONNX Runtime (0 = default ORT, tutti i core fisici)
+ONNX_NUM_THREADS = int(os.environ.get("FOOTBALL_ANALYZER_ONNX_THREADS", "0") or 0)
+
+# Cache delle detection (analysis/detection_cache.py): cartella e budget su disco (MB, LRU)
+DETECTION_CACHE_DIR = os.environ.get("FOOTBALL_ANALYZER_CACHE_DIR", "").strip() or None
+DETECTION_CACHE_MB = int(os.environ.get("FOOTBALL_ANALYZER_CACHE_MB", "4096") or 4096)
+
+# Lato dell'input del modello YOLOX torch (0 = default dell'Exp, 640). Il profilo hardware può ridurlo.
+INPUT_SIZE = int(os.environ.get("FOOTBALL_ANALYZER_INPUT_SIZE", "0") or 0)
+# Profilo hardware (micro-benchmark, analysis/hardware_profile.py)
+HARDWARE_PROFILE_FILE = "hardware_profile.json"
+HARDWARE_PROFILE_PATH = os.environ.get("FOOTBALL_ANALYZER_HARDWARE_PROFILE", "").strip() or None
 
 # Campi standard FIFA
 FIELD_LENGTH_M = 105.0
@@ -34,6 +52,29 @@ def get_calibration_path(project_dir: str = None) -> Path:
     return base / CALIBRATION_FILE
 
 
+def get_user_cache_dir() -> Path:
+    """Cartella utente per dati locali rigenerabili (%LOCALAPPDATA%/Football Analyzer, ~/.cache/Football Analyzer)."""
+    if os.name == "nt":
+        base = os.getenv("LOCALAPPDATA") or os.getenv("APPDATA") or os.path.expanduser("~")
+    else:
+        base = os.path.expanduser("~/.cache")
+    return Path(base) / "Football Analyzer"
+
+
+def get_detection_cache_dir() -> Path:
+    """Cartella della cache detection: FOOTBALL_ANALYZER_CACHE_DIR o cartella utente dell'app."""
+    if DETECTION_CACHE_DIR:
+        return Path(DETECTION_CACHE_DIR)
+    return get_user_cache_dir() / "detection_cache"
+
+
+def get_hardware_profile_path() -> Path:
+    """File del profilo hardware (analysis/hardware_profile.py): FOOTBALL_ANALYZER_HARDWARE_PROFILE o cartella utente."""
+    if HARDWARE_PROFILE_PATH:
+        return Path(HARDWARE_PROFILE_PATH)
+    return get_user_cache_dir() / HARDWARE_PROFILE_FILE
+
+
 class AnalysisConfig:
     """Configurazione runtime per l'analisi."""
     def __init__(self):
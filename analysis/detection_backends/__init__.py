@@ -0,0 +1,5 @@
+"""
+Backend alternativi per la detection, con la stessa interfaccia di PlayerDetector.
+Selezione tramite FOOTBALL_ANALYZER_DETECTION_BACKEND (analysis/config.py) e
+player_detection.create_player_detector().
+"""
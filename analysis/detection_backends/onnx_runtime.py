@@ -0,0 +1,250 @@
+"""
+Backend ONNX Runtime (CPU) per il modello YOLOX-s soccer.
+
+- export_onnx(): converte models/best_ckpt.pth in ONNX (batch fisso o dinamico). Richiede torch + yolox.
+- OnnxPredictor: stessa interfaccia usata da player/ball detection del Predictor YOLOX
+  (inference(img) -> (outputs, img_info)), ma con solo onnxruntime + numpy + OpenCV a runtime.
+- OnnxPlayerDetector: PlayerDetector che usa OnnxPredictor.
+
+Preprocessing (letterbox 114, niente normalizzazione) e postprocess (conf = obj * cls, NMS
+class-agnostic) replicano quelli di YOLOX, così le detection coincidono con il backend torch.
+"""
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from ..player_detection import PlayerDetector, SOCCER_CLASSES, _get_soccer_checkpoint, get_models_dir
+
+ONNX_MODEL_FILE = "best_ckpt.onnx"
+ONNX_INT8_MODEL_FILE = "best_ckpt.int8.onnx"
+INPUT_NAME = "images"
+OUTPUT_NAME = "output"
+
+# Valori di default dell'Exp YOLOX (test_size, test_conf, nmsthre); l'export li salva nei metadata
+DEFAULT_INPUT_SIZE = (640, 640)
+DEFAULT_TEST_CONF = 0.01
+DEFAULT_NMS_THRE = 0.65
+
+
+def get_onnx_model_path(precision: Optional[str] = None) -> Path:
+    """
+    Path del modello ONNX: FOOTBALL_ANALYZER_ONNX_MODEL se impostato, altrimenti
+    models/best_ckpt.onnx (fp32) o models/best_ckpt.int8.onnx (int8) secondo la precisione.
+    """
+    from ..config import ONNX_MODEL_PATH, ONNX_PRECISION
+    if precision is None:
+        if ONNX_MODEL_PATH:
+            return Path(ONNX_MODEL_PATH)
+        precision = ONNX_PRECISION
+    return get_models_dir() / (ONNX_INT8_MODEL_FILE if precision == "int8" else ONNX_MODEL_FILE)
+
+
+def export_onnx(
+    output_path: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+    batch_size: int = 1,
+    dynamic_batch: bool = False,
+    opset: int = 11,
+) -> Tuple[bool, str]:
+    """
+    Esporta il checkpoint soccer in ONNX. Ritorna (True, path_output) o (False, messaggio_errore).
+    batch_size: dimensione batch fissa dell'input; dynamic_batch=True → asse batch dinamico.
+    Il decode delle griglie YOLOX resta nel grafo: l'output è (B, N, 5 + num_classes).
+    """
+    try:
+        import torch
+        from torch import nn
+        from yolox.models.network_blocks import SiLU
+        from yolox.utils import replace_module
+        from ..player_detection import _get_soccer_exp
+    except ImportError as e:
+        return False, f"Export ONNX richiede torch e yolox: pip install torch torchvision yolox onnx\n{e}"
+
+    ckpt_path = Path(checkpoint_path) if checkpoint_path else _get_soccer_checkpoint()
+    if not ckpt_path or not ckpt_path.exists():
+        return False, "Checkpoint soccer non trovato: models/best_ckpt.pth"
+    out = Path(output_path) if output_path else get_onnx_model_path("fp32")
+    out.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        exp = _get_soccer_exp()
+        model = exp.get_model()
+        ckpt = torch.load(str(ckpt_path), map_location="cpu", weights_only=False)
+        model.load_state_dict(ckpt["model"] if "model" in ckpt else ckpt, strict=False)
+        model.eval()
+        model = replace_module(model, nn.SiLU, SiLU)  # SiLU esportabile anche con opset vecchi
+        model.head.decode_in_inference = True
+
+        batch_size = max(1, int(batch_size or 1))
+        dummy = torch.zeros(batch_size, 3, exp.test_size[0], exp.test_size[1])
+        dynamic_axes = {INPUT_NAME: {0: "batch"}, OUTPUT_NAME: {0: "batch"}} if dynamic_batch else None
+        torch.onnx.export(
+            model,
+            dummy,
+            str(out),
+            input_names=[INPUT_NAME],
+            output_names=[OUTPUT_NAME],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+        _write_metadata(out, exp)
+    except Exception as e:
+        return False, str(e)
+    return True, str(out)
+
+
+def _write_metadata(path: Path, exp) -> None:
+    """Salva nel modello ONNX i parametri dell'Exp necessari al postprocess."""
+    try:
+        import onnx
+    except ImportError:
+        return  # senza onnx il predictor usa i default (uguali all'Exp soccer)
+    model = onnx.load(str(path))
+    meta = {
+        "num_classes": str(exp.num_classes),
+        "test_conf": str(exp.test_conf),
+        "nmsthre": str(exp.nmsthre),
+        "classes": ",".join(SOCCER_CLASSES),
+    }
+    for key, value in meta.items():
+        prop = model.metadata_props.add()
+        prop.key, prop.value = key, value
+    onnx.save(model, str(path))
+
+
+def preproc(img: np.ndarray, input_size: Tuple[int, int]) -> Tuple[np.ndarray, float]:
+    """Letterbox YOLOX (ValTransform, legacy=False): resize a ratio fisso, padding 114, CHW float32."""
+    padded = np.full((input_size[0], input_size[1], 3), 114, dtype=np.uint8)
+    r = min(input_size[0] / img.shape[0], input_size[1] / img.shape[1])
+    resized = cv2.resize(img, (int(img.shape[1] * r), int(img.shape[0] * r)), interpolation=cv2.INTER_LINEAR)
+    padded[: resized.shape[0], : resized.shape[1]] = resized
+    return np.ascontiguousarray(padded.transpose(2, 0, 1), dtype=np.float32), r
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_thresh: float) -> np.ndarray:
+    """NMS greedy (come torchvision.ops.nms): indici mantenuti, in ordine di score decrescente."""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-12)
+        order = rest[iou <= iou_thresh]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def postprocess(prediction: np.ndarray, num_classes: int, conf_thre: float, nms_thre: float) -> List[Optional[np.ndarray]]:
+    """
+    Equivalente NumPy di yolox.utils.postprocess (class_agnostic=True).
+    prediction: (B, N, 5 + num_classes) con box cx, cy, w, h. Ritorna per immagine un array
+    (M, 7) x1, y1, x2, y2, obj, cls_conf, cls oppure None.
+    """
+    out: List[Optional[np.ndarray]] = []
+    for pred in prediction:
+        cls_scores = pred[:, 5: 5 + num_classes]
+        class_pred = np.argmax(cls_scores, axis=1)
+        class_conf = cls_scores[np.arange(len(pred)), class_pred]
+        mask = pred[:, 4] * class_conf >= conf_thre
+        if not mask.any():
+            out.append(None)
+            continue
+        p = pred[mask]
+        cx, cy, w, h = p[:, 0], p[:, 1], p[:, 2], p[:, 3]
+        dets = np.stack(
+            [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2, p[:, 4], class_conf[mask], class_pred[mask].astype(p.dtype)],
+            axis=1,
+        )
+        keep = nms(dets[:, :4], dets[:, 4] * dets[:, 5], nms_thre)
+        out.append(dets[keep])
+    return out
+
+
+class OnnxPredictor:
+    """Predictor YOLOX su ONNX Runtime (CPU). inference()/inference_batch() come il Predictor torch."""
+
+    def __init__(self, model_path: Union[str, Path], num_threads: int = 0):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            opts.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(model_path), sess_options=opts, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        # Batch fisso (int) o dinamico (stringa/None); dimensioni spaziali dal grafo se note
+        self.fixed_batch = inp.shape[0] if isinstance(inp.shape[0], int) else None
+        h, w = inp.shape[2], inp.shape[3]
+        self.test_size = (h, w) if isinstance(h, int) and isinstance(w, int) else DEFAULT_INPUT_SIZE
+        meta = self.session.get_modelmeta().custom_metadata_map or {}
+        self.num_classes = int(meta.get("num_classes", len(SOCCER_CLASSES)))
+        self.confthre = float(meta.get("test_conf", DEFAULT_TEST_CONF))
+        self.nmsthre = float(meta.get("nmsthre", DEFAULT_NMS_THRE))
+        self.device = "cpu"
+
+    def _run(self, blobs: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """Forward + postprocess; con batch fisso divide in blocchi e completa l'ultimo con padding."""
+        chunk = self.fixed_batch or len(blobs)
+        results: List[Optional[np.ndarray]] = []
+        for start in range(0, len(blobs), chunk):
+            part = blobs[start: start + chunk]
+            n = len(part)
+            if n < chunk:
+                part = part + [np.full_like(part[0], 114.0)] * (chunk - n)
+            pred = self.session.run(None, {self.input_name: np.stack(part)})[0]
+            results.extend(postprocess(pred[:n], self.num_classes, self.confthre, self.nmsthre))
+        return results
+
+    def inference(self, img: np.ndarray) -> Tuple[list, dict]:
+        return self.inference_batch([img])[0]
+
+    def inference_batch(self, frames: List[np.ndarray]) -> List[Tuple[list, dict]]:
+        """Un solo forward pass per N frame; ritorna (outputs, img_info) per frame come predictor.inference."""
+        blobs = []
+        infos = []
+        for frame in frames:
+            blob, ratio = preproc(frame, self.test_size)
+            blobs.append(blob)
+            h, w = frame.shape[:2]
+            infos.append({"id": 0, "file_name": None, "height": h, "width": w, "raw_img": frame, "ratio": ratio})
+        if not blobs:
+            return []
+        outputs = self._run(blobs)
+        return [([outputs[i]], infos[i]) for i in range(len(frames))]
+
+
+class OnnxPlayerDetector(PlayerDetector):
+    """PlayerDetector con backend ONNX Runtime: nessuna dipendenza da torch/yolox a runtime."""
+
+    def __init__(self, conf_thresh: float = 0.5, device: str = "cpu", model_path: Optional[str] = None):
+        super().__init__(conf_thresh=conf_thresh, device=device)
+        self._model_path = model_path
+
+    def _init_predictor(self) -> bool:
+        if self._predictor is not None:
+            return True
+        if self._init_error:
+            return False
+        path = Path(self._model_path) if self._model_path else get_onnx_model_path()
+        if not path.exists():
+            hint = "training/quantize_onnx.py" if path.name == ONNX_INT8_MODEL_FILE else "training/export_onnx.py"
+            self._init_error = f"Modello ONNX non trovato: {path}. Esegui: python {hint}"
+            return False
+        try:
+            from ..config import ONNX_NUM_THREADS
+            self._predictor = OnnxPredictor(path, num_threads=ONNX_NUM_THREADS)
+            return True
+        except ImportError as e:
+            self._init_error = f"Installa ONNX Runtime: pip install onnxruntime\n{e}"
+            return False
+        except Exception as e:
+            self._init_error = str(e)
+            return False
@@ -0,0 +1,206 @@
+"""
+Quantizzazione INT8 del modello ONNX soccer (ONNX Runtime) e confronto con il modello FP32.
+
+- dynamic: pesi INT8, attivazioni quantizzate a runtime. Nessun dato di calibrazione.
+- static:  pesi e attivazioni INT8 (formato QDQ); range delle attivazioni stimati su frame
+           estratti dai nostri video (extract_calibration_frames), con lo stesso letterbox
+           usato in inference.
+
+compare_models() misura ms/frame dei due modelli e l'accordo delle detection (INT8 vs FP32
+come riferimento: precision, recall, F1, IoU medio), per scegliere il modello per deployment.
+"""
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..frame_sampler import FrameSampler
+from ..player_detection import DetectionBatch, _crop_to_bounds, _decode_yolox_output, _load_field_bounds
+from .onnx_runtime import OnnxPredictor, preproc
+
+QUANT_MODES = ("dynamic", "static")
+DEFAULT_CALIBRATION_FRAMES = 64
+
+
+def extract_calibration_frames(
+    video_paths: Sequence[str],
+    n_frames: int = DEFAULT_CALIBRATION_FRAMES,
+    calibration_path: Optional[str] = None,
+) -> List[np.ndarray]:
+    """
+    Estrae n_frames equidistanti (ripartiti tra i video), ritagliati al campo se calibration_path.
+    Frame rappresentativi di quelli che il modello vede in analisi (stessa inquadratura e crop).
+    """
+    paths = [p for p in video_paths if p and Path(p).exists()]
+    if not paths or n_frames <= 0:
+        return []
+    bounds = _load_field_bounds(calibration_path)
+    per_video = max(1, -(-n_frames // len(paths)))
+    frames: List[np.ndarray] = []
+    for path in paths:
+        with FrameSampler(path) as sampler:
+            total = sampler.frame_count
+            if total <= 0:
+                continue
+            for idx in np.linspace(0, total - 1, per_video, dtype=np.int64):
+                vf = sampler.read_frame(int(idx))
+                if vf is not None:
+                    frames.append(_crop_to_bounds(vf.image, bounds)[0])
+    return frames[:n_frames]
+
+
+def _make_calibration_reader(frames: List[np.ndarray], input_name: str, input_size: Tuple[int, int], batch: int):
+    """CalibrationDataReader ORT che fornisce i frame già preprocessati, `batch` alla volta."""
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class _FrameReader(CalibrationDataReader):
+        def __init__(self):
+            blobs = [preproc(f, input_size)[0] for f in frames]
+            self._batches = [
+                np.stack((blobs[i: i + batch] + [blobs[-1]] * batch)[:batch]) for i in range(0, len(blobs), batch)
+            ]
+            self._it = iter(self._batches)
+
+        def get_next(self):
+            arr = next(self._it, None)
+            return None if arr is None else {input_name: arr}
+
+        def rewind(self):
+            self._it = iter(self._batches)
+
+    return _FrameReader()
+
+
+def quantize_model(
+    fp32_path: str,
+    int8_path: str,
+    mode: str = "dynamic",
+    calibration_frames: Optional[List[np.ndarray]] = None,
+    per_channel: bool = False,
+) -> Tuple[bool, str]:
+    """
+    Crea il modello INT8. Ritorna (True, int8_path) o (False, messaggio_errore).
+    mode="static" richiede calibration_frames (vedi extract_calibration_frames).
+    """
+    if mode not in QUANT_MODES:
+        return False, f"Modalità non valida: {mode} (ammesse: {', '.join(QUANT_MODES)})"
+    if not Path(fp32_path).exists():
+        return False, f"Modello FP32 non trovato: {fp32_path}. Esegui: python training/export_onnx.py"
+    try:
+        import onnxruntime as ort
+        from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    except ImportError as e:
+        return False, f"Installa ONNX Runtime: pip install onnxruntime onnx\n{e}"
+
+    Path(int8_path).parent.mkdir(parents=True, exist_ok=True)
+    try:
+        if mode == "dynamic":
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8, per_channel=per_channel)
+            return True, int8_path
+        if not calibration_frames:
+            return False, "Quantizzazione statica: nessun frame di calibrazione (passa uno o più video)."
+        inp = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0]
+        batch = inp.shape[0] if isinstance(inp.shape[0], int) else 1
+        input_size = (inp.shape[2], inp.shape[3]) if isinstance(inp.shape[2], int) else (640, 640)
+        reader = _make_calibration_reader(calibration_frames, inp.name, input_size, batch)
+        quantize_static(
+            fp32_path,
+            int8_path,
+            reader,
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=per_channel,
+        )
+        return True, int8_path
+    except Exception as e:
+        return False, str(e)
+
+
+def match_detections(ref: DetectionBatch, other: DetectionBatch, iou_thresh: float = 0.5) -> Tuple[int, List[float]]:
+    """
+    Abbina greedy (per IoU decrescente) le detection di `other` a quelle di `ref` con stessa classe.
+    Ritorna (numero abbinamenti, IoU degli abbinamenti).
+    """
+    if len(ref) == 0 or len(other) == 0:
+        return 0, []
+    a, b = ref.xywh, other.xywh
+    ix = np.clip(
+        np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]),
+        0, None,
+    )
+    iy = np.clip(
+        np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]),
+        0, None,
+    )
+    inter = ix * iy
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - inter
+    iou = np.where(union > 0, inter / np.maximum(union, 1e-12), 0.0)
+    iou[ref.class_id[:, None] != other.class_id[None, :]] = 0.0
+    ious: List[float] = []
+    used_a = np.zeros(len(a), dtype=bool)
+    used_b = np.zeros(len(b), dtype=bool)
+    for flat in np.argsort(-iou, axis=None, kind="stable"):
+        i, j = divmod(int(flat), len(b))
+        if iou[i, j] < iou_thresh:
+            break
+        if used_a[i] or used_b[j]:
+            continue
+        used_a[i] = used_b[j] = True
+        ious.append(float(iou[i, j]))
+    return len(ious), ious
+
+
+def _timed_detections(predictor: OnnxPredictor, frames: List[np.ndarray], conf_thresh: float) -> Tuple[List[DetectionBatch], float]:
+    """Detection per frame e ms/frame (dopo un frame di warm-up)."""
+    predictor.inference(frames[0])
+    t0 = time.perf_counter()
+    dets = [_decode_yolox_output(*predictor.inference(f), conf_thresh) for f in frames]
+    return dets, 1000.0 * (time.perf_counter() - t0) / len(frames)
+
+
+def compare_models(
+    fp32_path: str,
+    int8_path: str,
+    frames: List[np.ndarray],
+    conf_thresh: float = 0.2,
+    iou_thresh: float = 0.5,
+    num_threads: int = 0,
+) -> dict:
+    """Report velocità + accordo detection INT8 vs FP32 sugli stessi frame."""
+    if not frames:
+        raise ValueError("Nessun frame per il confronto.")
+    fp32 = OnnxPredictor(fp32_path, num_threads=num_threads)
+    int8 = OnnxPredictor(int8_path, num_threads=num_threads)
+    ref_dets, fp32_ms = _timed_detections(fp32, frames, conf_thresh)
+    q_dets, int8_ms = _timed_detections(int8, frames, conf_thresh)
+
+    matched = 0
+    ious: List[float] = []
+    n_ref = sum(len(d) for d in ref_dets)
+    n_q = sum(len(d) for d in q_dets)
+    for r, q in zip(ref_dets, q_dets):
+        m, frame_ious = match_detections(r, q, iou_thresh)
+        matched += m
+        ious.extend(frame_ious)
+    precision = matched / n_q if n_q else 1.0
+    recall = matched / n_ref if n_ref else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+    return {
+        "frames": len(frames),
+        "conf_thresh": conf_thresh,
+        "iou_thresh": iou_thresh,
+        "fp32": {"model": str(fp32_path), "ms_per_frame": round(fp32_ms, 2), "detections": n_ref,
+                 "size_mb": round(Path(fp32_path).stat().st_size / 1e6, 2)},
+        "int8": {"model": str(int8_path), "ms_per_frame": round(int8_ms, 2), "detections": n_q,
+                 "size_mb": round(Path(int8_path).stat().st_size / 1e6, 2)},
+        "speedup": round(fp32_ms / int8_ms, 2) if int8_ms > 0 else None,
+        "agreement": {
+            "matched": matched,
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(f1, 4),
+            "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+        },
+    }
@@ -0,0 +1,189 @@
+"""
+Cache content-addressed dei risultati di detection.
+
+La chiave di una voce è l'hash di tutto ciò che determina player_detections.json / ball_detections.json:
+  - impronta veloce del video (dimensione + hash di blocchi campionati, video_fingerprint)
+  - hash del modello in uso (checkpoint .pth o modello ONNX)
+  - parametri di detection (modalità, conf_thresh, target_fps, crop_bounds, campionamento adattivo, ...)
+
+Voce completa → l'analisi salta la detection e copia il JSON. Voce parziale (detection interrotta,
+salvata dall'ultimo checkpoint) → la detection riprende da metà video. Le voci meno usate di recente
+vengono eliminate quando la cache supera il budget su disco (DETECTION_CACHE_MB).
+
+Struttura: <cache_dir>/<chiave>/{detections.json, meta.json}.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+CACHE_VERSION = 1  # da incrementare se cambia il formato dei JSON di detection
+DATA_FILE = "detections.json"
+META_FILE = "meta.json"
+_FINGERPRINT_SAMPLES = 16
+_FINGERPRINT_CHUNK = 1 << 20  # 1 MB
+
+_file_hash_memo: Dict[Tuple[str, int, int], str] = {}
+
+
+def video_fingerprint(path: str, samples: int = _FINGERPRINT_SAMPLES, chunk_size: int = _FINGERPRINT_CHUNK) -> str:
+    """
+    Impronta veloce del video: dimensione + SHA-256 di `samples` blocchi equidistanti (primo e ultimo inclusi).
+    Legge al più samples * chunk_size byte anche per video di diversi GB.
+    """
+    size = os.path.getsize(path)
+    h = hashlib.sha256(str(size).encode())
+    with open(path, "rb") as f:
+        if size <= samples * chunk_size:
+            h.update(f.read())
+        else:
+            for i in range(samples):
+                f.seek((size - chunk_size) * i // (samples - 1))
+                h.update(f.read(chunk_size))
+    return h.hexdigest()
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 completo di un file (modello), memorizzato per (path, dimensione, mtime)."""
+    st = os.stat(path)
+    memo_key = (str(Path(path).resolve()), st.st_size, st.st_mtime_ns)
+    if memo_key not in _file_hash_memo:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_FINGERPRINT_CHUNK), b""):
+                h.update(block)
+        _file_hash_memo[memo_key] = h.hexdigest()
+    return _file_hash_memo[memo_key]
+
+
+def cache_key(kind: str, video_path: str, params: dict) -> Optional[str]:
+    """
+    Chiave della voce per un file di detection ("player" o "ball").
+    None se il modello non è disponibile (niente da cui derivare l'hash: la cache non si usa).
+    """
+    from .player_detection import get_detection_backend, get_detection_model_path
+
+    backend = get_detection_backend()
+    model_path = get_detection_model_path(backend)
+    if model_path is None:
+        return None
+    payload = {
+        "version": CACHE_VERSION,
+        "kind": kind,
+        "video": video_fingerprint(video_path),
+        "model": file_hash(str(model_path)),
+        "backend": backend or "torch",
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@dataclass
+class CacheHit:
+    complete: bool
+    next_frame: int  # primo frame da processare (voce parziale); 0 per voce completa
+    data: Optional[dict] = None  # risultati parziali (solo voce parziale)
+
+
+class DetectionCache:
+    """Cache su disco con eviction LRU per budget. root / budget_mb: default da analysis/config.py."""
+
+    def __init__(self, root: Optional[str] = None, budget_mb: Optional[int] = None):
+        from .config import DETECTION_CACHE_MB, get_detection_cache_dir
+
+        self.root = Path(root) if root else get_detection_cache_dir()
+        self.budget_bytes = int((DETECTION_CACHE_MB if budget_mb is None else budget_mb) * 1024 * 1024)
+
+    def _dir(self, key: str) -> Path:
+        return self.root / key
+
+    def _read_meta(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._dir(key) / META_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _write_meta(self, key: str, meta: dict) -> None:
+        tmp = self._dir(key) / (META_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, self._dir(key) / META_FILE)
+
+    def lookup(self, key: str, output_path: Optional[str] = None) -> Optional[CacheHit]:
+        """
+        Cerca la voce e aggiorna l'ultimo uso. Voce completa: se output_path, vi copia il JSON.
+        Voce parziale: ritorna i risultati da cui riprendere.
+        """
+        meta = self._read_meta(key)
+        data_path = self._dir(key) / DATA_FILE
+        if meta is None or not data_path.exists():
+            return None
+        meta["last_used"] = time.time()
+        self._write_meta(key, meta)
+        if meta.get("complete"):
+            if output_path:
+                Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(data_path, output_path)
+            return CacheHit(True, 0)
+        try:
+            with open(data_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return CacheHit(False, int(meta.get("next_frame", 0)), data)
+
+    def store(self, key: str, source_path: Optional[str] = None, data: Optional[dict] = None,
+              complete: bool = True, next_frame: int = 0) -> None:
+        """
+        Salva una voce da file (source_path, detection completa) o da dict (data, es. ultimo checkpoint
+        con next_frame = primo frame da processare). Poi applica il budget su disco.
+        """
+        entry = self._dir(key)
+        entry.mkdir(parents=True, exist_ok=True)
+        tmp = entry / (DATA_FILE + ".tmp")
+        if source_path is not None:
+            shutil.copyfile(source_path, tmp)
+        else:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+        os.replace(tmp, entry / DATA_FILE)
+        now = time.time()
+        self._write_meta(key, {
+            "complete": complete,
+            "next_frame": next_frame,
+            "size_bytes": (entry / DATA_FILE).stat().st_size,
+            "created": now,
+            "last_used": now,
+        })
+        self.evict(keep=key)
+
+    def entries(self) -> List[Tuple[str, dict]]:
+        """(chiave, meta) delle voci valide."""
+        if not self.root.exists():
+            return []
+        out = []
+        for d in self.root.iterdir():
+            meta = self._read_meta(d.name) if d.is_dir() else None
+            if meta is not None:
+                out.append((d.name, meta))
+        return out
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """Elimina le voci usate meno di recente finché la cache sta nel budget; `keep` non viene eliminata."""
+        entries = sorted(self.entries(), key=lambda e: e[1].get("last_used", 0))
+        total = sum(int(m.get("size_bytes", 0)) for _, m in entries)
+        removed = []
+        for key, meta in entries:
+            if total <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._dir(key), ignore_errors=True)
+            total -= int(meta.get("size_bytes", 0))
+            removed.append(key)
+        return removed
@@ -0,0 +1,237 @@
+"""
+Pipeline producer/consumer per la detection su video.
+
+Tre stadi collegati da code limitate (backpressure):
+  1. decode      – thread che legge il video e produce i frame campionati (già ritagliati)
+  2. inference   – thread chiamante: raggruppa fino a batch_size frame ed esegue il modello
+  3. post        – thread che filtra, classifica squadre e costruisce il JSON (ordine preservato)
+
+Con threaded=False gli stessi stadi girano in sequenza nel thread chiamante (stesso output).
+Un errore in qualunque stadio, o cancel_event impostato, ferma tutti gli stadi e viene
+rilanciato nel chiamante (PipelineCancelled per l'interruzione volontaria).
+"""
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_QUEUE_SIZE = 8
+_END = object()  # sentinella fine stream
+_POLL_S = 0.1    # timeout get/put per controllare stop/cancel
+
+
+class PipelineCancelled(Exception):
+    """Pipeline interrotta tramite cancel_event."""
+
+
+@dataclass
+class SampledFrame:
+    index: int  # indice frame nel video
+    image: np.ndarray  # frame da passare al modello (ritagliato se crop_bounds)
+    crop_bounds: Optional[Tuple[int, int, int, int]]  # (x0, y0, x1, y1) o None
+    full_size: Tuple[int, int]  # (width, height) del frame originale
+    step: Optional[int] = None  # campionamento adattivo: frame video dal campione precedente
+    motion: Optional[float] = None  # campionamento adattivo: movimento smussato 0-1
+
+
+class PipelineStats:
+    """Tempi per stadio: busy = lavoro utile, wait = attesa su code (sintomo di collo di bottiglia altrove)."""
+
+    STAGES = ("decode", "inference", "post")
+
+    def __init__(self):
+        self.busy: Dict[str, float] = {s: 0.0 for s in self.STAGES}
+        self.wait: Dict[str, float] = {s: 0.0 for s in self.STAGES}
+        self.items: Dict[str, int] = {s: 0 for s in self.STAGES}
+        self.wall = 0.0
+
+    def bottleneck(self) -> str:
+        """Stadio con più tempo di lavoro effettivo."""
+        return max(self.STAGES, key=lambda s: self.busy[s])
+
+    def as_dict(self) -> dict:
+        return {
+            "wall_s": round(self.wall, 3),
+            "bottleneck": self.bottleneck(),
+            "stages": {
+                s: {
+                    "busy_s": round(self.busy[s], 3),
+                    "wait_s": round(self.wait[s], 3),
+                    "items": self.items[s],
+                    "ms_per_item": round(1000 * self.busy[s] / self.items[s], 2) if self.items[s] else 0.0,
+                }
+                for s in self.STAGES
+            },
+        }
+
+
+def run_detection_pipeline(
+    source: Iterable[SampledFrame],
+    infer_fn: Callable[[List[np.ndarray]], List[list]],
+    post_fn: Callable[[SampledFrame, list], None],
+    batch_size: int = 1,
+    threaded: bool = True,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    cancel_event: Optional[threading.Event] = None,
+) -> PipelineStats:
+    """
+    Esegue source → infer_fn → post_fn.
+    source: iterabile di SampledFrame (la decodifica avviene iterandolo).
+    infer_fn(images) -> lista di detection per immagine (stessa lunghezza).
+    post_fn(sampled_frame, detections): chiamata nell'ordine dei frame.
+    Ritorna PipelineStats; rilancia l'eccezione del primo stadio fallito.
+    """
+    batch_size = max(1, int(batch_size or 1))
+    stats = PipelineStats()
+    t_start = time.perf_counter()
+    if threaded:
+        _run_threaded(source, infer_fn, post_fn, batch_size, max(1, int(queue_size)), cancel_event, stats)
+    else:
+        _run_serial(source, infer_fn, post_fn, batch_size, cancel_event, stats)
+    stats.wall = time.perf_counter() - t_start
+    return stats
+
+
+def _infer_and_post(batch, infer_fn, post_fn, stats: PipelineStats) -> None:
+    t0 = time.perf_counter()
+    dets = infer_fn([sf.image for sf in batch])
+    stats.busy["inference"] += time.perf_counter() - t0
+    stats.items["inference"] += len(batch)
+    for sf, d in zip(batch, dets):
+        t0 = time.perf_counter()
+        post_fn(sf, d)
+        stats.busy["post"] += time.perf_counter() - t0
+        stats.items["post"] += 1
+
+
+def _run_serial(source, infer_fn, post_fn, batch_size, cancel_event, stats: PipelineStats) -> None:
+    batch: List[SampledFrame] = []
+    it = iter(source)
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            raise PipelineCancelled()
+        t0 = time.perf_counter()
+        sf = next(it, None)
+        stats.busy["decode"] += time.perf_counter() - t0
+        if sf is None:
+            break
+        stats.items["decode"] += 1
+        batch.append(sf)
+        if len(batch) >= batch_size:
+            _infer_and_post(batch, infer_fn, post_fn, stats)
+            batch = []
+    if batch:
+        _infer_and_post(batch, infer_fn, post_fn, stats)
+
+
+def _run_threaded(source, infer_fn, post_fn, batch_size, queue_size, cancel_event, stats: PipelineStats) -> None:
+    decoded: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    inferred: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def _stopped() -> bool:
+        return stop.is_set() or (cancel_event is not None and cancel_event.is_set())
+
+    def _put(q: "queue.Queue", item, stage: str) -> bool:
+        """put bloccante con backpressure; False se la pipeline è stata fermata nel frattempo."""
+        t0 = time.perf_counter()
+        while not _stopped():
+            try:
+                q.put(item, timeout=_POLL_S)
+                stats.wait[stage] += time.perf_counter() - t0
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(q: "queue.Queue", stage: str):
+        t0 = time.perf_counter()
+        while not _stopped():
+            try:
+                item = q.get(timeout=_POLL_S)
+                stats.wait[stage] += time.perf_counter() - t0
+                return item
+            except queue.Empty:
+                continue
+        return _END
+
+    def _fail(e: BaseException) -> None:
+        errors.append(e)
+        stop.set()
+
+    def _decode_worker():
+        try:
+            it = iter(source)
+            while not _stopped():
+                t0 = time.perf_counter()
+                sf = next(it, None)
+                stats.busy["decode"] += time.perf_counter() - t0
+                if sf is None:
+                    break
+                stats.items["decode"] += 1
+                if not _put(decoded, sf, "decode"):
+                    return
+            _put(decoded, _END, "decode")
+        except BaseException as e:
+            _fail(e)
+
+    def _post_worker():
+        try:
+            while True:
+                item = _get(inferred, "post")
+                if item is _END:
+                    return
+                sf, d = item
+                t0 = time.perf_counter()
+                post_fn(sf, d)
+                stats.busy["post"] += time.perf_counter() - t0
+                stats.items["post"] += 1
+        except BaseException as e:
+            _fail(e)
+
+    decode_thread = threading.Thread(target=_decode_worker, name="detection-decode", daemon=True)
+    post_thread = threading.Thread(target=_post_worker, name="detection-post", daemon=True)
+    decode_thread.start()
+    post_thread.start()
+
+    def _run_batch(batch: List[SampledFrame]) -> bool:
+        t0 = time.perf_counter()
+        dets = infer_fn([sf.image for sf in batch])
+        stats.busy["inference"] += time.perf_counter() - t0
+        stats.items["inference"] += len(batch)
+        for sf, d in zip(batch, dets):
+            if not _put(inferred, (sf, d), "inference"):
+                return False
+        return True
+
+    try:
+        batch: List[SampledFrame] = []
+        while True:
+            item = _get(decoded, "inference")
+            if item is _END:
+                break
+            batch.append(item)
+            if len(batch) >= batch_size:
+                if not _run_batch(batch):
+                    break
+                batch = []
+        if batch and not _stopped():
+            _run_batch(batch)
+        if not _stopped():
+            _put(inferred, _END, "inference")
+    except BaseException as e:
+        _fail(e)
+    finally:
+        # Il post drena la coda fino a _END; in caso di errore/cancel tutti escono al prossimo poll
+        post_thread.join()
+        stop.set()
+        decode_thread.join()
+
+    if errors:
+        raise errors[0]
+    if cancel_event is not None and cancel_event.is_set():
+        raise PipelineCancelled()
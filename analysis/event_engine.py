@@ -8,40 +8,40 @@ from __future__ import annotations
 import json
 import math
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+from .adaptive_sampling import sample_times_ms
 from .event_engine_params import get_params
+from .field_coords import FieldCoords, load_field_coords
 from .homography import get_calibrator
-
-
-def _ball_center(det: Optional[Dict]) -> Optional[Tuple[float, float]]:
-    if not det or "x" not in det:
-        return None
-    x, y = det["x"], det["y"]
-    w, h = det.get("w", 0), det.get("h", 0)
-    return (x + w / 2, y + h / 2)
-
-
-def _player_center(d: Dict) -> Tuple[float, float]:
-    x, y = d["x"], d["y"]
-    w, h = d.get("w", 0), d.get("h", 0)
-    return (x + w / 2, y + h / 2)
+from .track_store import TrackStore, load_player_tracks
 
 
 def _dist_m(ax: float, ay: float, bx: float, by: float) -> float:
     return math.hypot(ax - bx, ay - by)
 
 
+def _timestamp_ms(frame_idx: int, fps: float, times_ms: Optional[Dict[int, float]] = None) -> int:
+    """Timestamp del campione: da times_ms (campionamento adattivo, passo variabile) o frame * 1000 / fps."""
+    if times_ms is not None and frame_idx in times_ms:
+        return int(times_ms[frame_idx])
+    return int(frame_idx * 1000 / fps) if fps else 0
+
+
 def _build_frame_data(
-    player_tracks: Dict,
+    player_tracks: Union[TrackStore, Dict],
     ball_tracks: Dict,
     calibrator: Optional[Any],
     width: int,
     height: int,
     field_length_m: float,
     field_width_m: float,
+    field_coords: Optional[FieldCoords] = None,
 ) -> Tuple[Dict[int, Tuple[float, float]], Dict[int, List[Tuple[int, int, float, float]]], float]:
     """
+    player_tracks: archivio colonnare (TrackStore) o dict di player_tracks.json.
+    field_coords: coordinate campo già proiettate (load_field_coords); se None vengono proiettate qui
+    con calibrator (stesse ancore: base del bbox per i giocatori, centro per la palla).
     Restituisce:
     - ball_by_frame: frame_idx -> (x_m, y_m) o (x_px, y_px) se no calibrazione
     - players_by_frame: frame_idx -> [(track_id, team, x_m, y_m), ...]
@@ -51,42 +51,26 @@ def _build_frame_data(
     players_by_frame: Dict[int, List[Tuple[int, int, float, float]]] = {}
     scale = field_length_m / width if width else 0.05  # fallback
 
-    pt_frames = {f["frame"]: f for f in player_tracks.get("frames", [])}
+    store = player_tracks if isinstance(player_tracks, TrackStore) else TrackStore.from_json(player_tracks)
     bt_frames = {f["frame"]: f for f in ball_tracks.get("frames", [])}
-    all_frames = sorted(set(pt_frames.keys()) | set(bt_frames.keys()))
+    all_frames = sorted(set(store.frame_index.tolist()) | set(bt_frames.keys()))
 
+    if field_coords is None:
+        field_coords = FieldCoords.compute(store, ball_tracks, calibrator)
     for frame_idx in all_frames:
-        # Palla
-        bt = bt_frames.get(frame_idx, {})
-        det = bt.get("detection") if isinstance(bt.get("detection"), dict) else None
-        bc = _ball_center(det)
-        if bc:
-            px, py = bc
-            if calibrator:
-                pt_m = calibrator.pixel_to_field(px, py)
-                if pt_m:
-                    ball_by_frame[frame_idx] = pt_m
-                else:
-                    ball_by_frame[frame_idx] = (px * scale, py * scale)
-            else:
-                ball_by_frame[frame_idx] = (px * scale, py * scale)
-
-        # Giocatori
-        pt = pt_frames.get(frame_idx, {})
-        dets = pt.get("detections", [])
         players_by_frame[frame_idx] = []
-        for d in dets:
-            tid = d.get("track_id", -1)
-            team = d.get("team", -1)
-            cx, cy = _player_center(d)
-            if calibrator:
-                pt_m = calibrator.pixel_to_field(cx, cy)
-                if pt_m:
-                    players_by_frame[frame_idx].append((tid, team, pt_m[0], pt_m[1]))
-                else:
-                    players_by_frame[frame_idx].append((tid, team, cx * scale, cy * scale))
-            else:
-                players_by_frame[frame_idx].append((tid, team, cx * scale, cy * scale))
+    for frame_idx, pt in zip(field_coords.ball_frame.tolist(), field_coords.ball(scale).tolist()):
+        ball_by_frame[frame_idx] = tuple(pt)
+
+    # Giocatori: coordinate per riga dell'archivio
+    pts_m = field_coords.players(scale)
+    xs, ys = pts_m[:, 0].tolist(), pts_m[:, 1].tolist()
+    tids = store["track_id"].tolist()
+    teams = store["team"].tolist()
+    for frame_idx, rows in store.iter_frames():
+        players = players_by_frame[frame_idx]
+        for r in range(rows.start, rows.stop):
+            players.append((tids[r], teams[r], xs[r], ys[r]))
 
     return ball_by_frame, players_by_frame, scale
 
@@ -97,10 +81,13 @@ def _compute_possession(
     max_dist_m: float,
     min_frames: int,
     fps: float,
+    times_ms: Optional[Dict[int, float]] = None,
+    min_span_ms: float = 0.0,
 ) -> Tuple[List[Dict], Dict[int, Tuple[Optional[int], Optional[int]]]]:
     """
     Per ogni frame: giocatore più vicino alla palla sotto soglia -> possesso.
     Ritorna: (segmenti [{start_frame, end_frame, team, track_id}], possession_by_frame: frame -> (track_id, team))
+    Con times_ms (campionamento adattivo) la durata minima è in tempo: fine - inizio >= min_span_ms.
     """
     frames_sorted = sorted(set(ball_by_frame.keys()) & set(players_by_frame.keys()))
     possession_by_frame: Dict[int, Tuple[Optional[int], Optional[int]]] = {}
@@ -144,7 +131,11 @@ def _compute_possession(
                 break
             end_frame = f
             j += 1
-        if end_frame - start_frame + 1 >= min_frames:
+        if times_ms is not None:
+            long_enough = times_ms.get(end_frame, 0.0) - times_ms.get(start_frame, 0.0) >= min_span_ms
+        else:
+            long_enough = end_frame - start_frame + 1 >= min_frames
+        if long_enough:
             segments.append({
                 "start_frame": start_frame,
                 "end_frame": end_frame,
@@ -160,6 +151,7 @@ def _detect_passes(
     ball_by_frame: Dict[int, Tuple[float, float]],
     params: Dict,
     fps: float,
+    times_ms: Optional[Dict[int, float]] = None,
 ) -> List[Dict]:
     """Passaggio: cambio possesso da A a B stesso team con spostamento palla."""
     pass_events = []
@@ -183,7 +175,7 @@ def _detect_passes(
         dist_ball = _dist_m(b_prev[0], b_prev[1], b_curr[0], b_curr[1])
         if dist_ball < 0.5:
             continue
-        ts_ms = int(curr_frame * 1000 / fps) if fps else 0
+        ts_ms = _timestamp_ms(curr_frame, fps, times_ms)
         pass_events.append({
             "type": "pass",
             "timestamp_ms": ts_ms,
@@ -207,6 +199,7 @@ def _detect_recoveries(
     ball_by_frame: Dict[int, Tuple[float, float]],
     params: Dict,
     fps: float,
+    times_ms: Optional[Dict[int, float]] = None,
 ) -> List[Dict]:
     """Recupero: cambio possesso in area difensiva."""
     recovery_events = []
@@ -227,7 +220,7 @@ def _detect_recoveries(
         x_m = b_curr[0]
         if not _in_defensive_zone(x_m, params):
             continue
-        ts_ms = int(curr_frame * 1000 / fps) if fps else 0
+        ts_ms = _timestamp_ms(curr_frame, fps, times_ms)
         zone = "left" if x_m < 52.5 else "right"
         recovery_events.append({
             "type": "recovery",
@@ -245,6 +238,7 @@ def _detect_shots(
     ball_by_frame: Dict[int, Tuple[float, float]],
     params: Dict,
     fps: float,
+    times_ms: Optional[Dict[int, float]] = None,
 ) -> List[Dict]:
     """Tiro: velocità palla oltre soglia + direzione verso porta. Un solo evento per 'burst' (debounce)."""
     shot_events = []
@@ -266,6 +260,8 @@ def _detect_shots(
         p1 = ball_by_frame[f1]
         dx = p1[0] - p0[0]
         dy = p1[1] - p0[1]
+        if times_ms is not None and f0 in times_ms and f1 in times_ms:
+            dt_s = max(1e-3, (times_ms[f1] - times_ms[f0]) / 1000.0)  # passo variabile
         speed = math.hypot(dx, dy) / dt_s
         if speed < min_speed:
             continue
@@ -281,7 +277,7 @@ def _detect_shots(
             angle_deg_right = 360 - angle_deg_right
         if angle_deg_left > max_angle_deg and angle_deg_right > max_angle_deg:
             continue
-        ts_ms = int(f1 * 1000 / fps) if fps else 0
+        ts_ms = _timestamp_ms(f1, fps, times_ms)
         if last_shot_ts_ms is not None and (ts_ms - last_shot_ts_ms) < min_interval_ms:
             continue
         last_shot_ts_ms = ts_ms
@@ -303,6 +299,7 @@ def _detect_pressing(
     players_by_frame: Dict[int, List[Tuple[int, int, float, float]]],
     params: Dict,
     fps: float,
+    times_ms: Optional[Dict[int, float]] = None,
 ) -> List[Dict]:
     """Pressing: conteggio giocatori nel raggio attorno alla palla; evento quando supera soglia."""
     pressing_events = []
@@ -321,7 +318,7 @@ def _detect_pressing(
                 count_team[team] = count_team.get(team, 0) + 1
         for team, count in count_team.items():
             if count >= min_players:
-                ts_ms = int(frame_idx * 1000 / fps) if fps else 0
+                ts_ms = _timestamp_ms(frame_idx, fps, times_ms)
                 pressing_events.append({
                     "type": "pressing",
                     "timestamp_ms": ts_ms,
@@ -335,14 +332,16 @@ def _detect_pressing(
 
 
 def run_event_engine(
-    player_tracks: Dict[str, Any],
+    player_tracks: Union[TrackStore, Dict[str, Any]],
     ball_tracks: Dict[str, Any],
     fps: float,
     calibration_path: Optional[str] = None,
     params: Optional[Dict] = None,
+    field_coords: Optional[FieldCoords] = None,
 ) -> Dict[str, Any]:
     """
-    Esegue l'event engine su player_tracks e ball_tracks.
+    Esegue l'event engine su player_tracks (TrackStore o dict JSON) e ball_tracks.
+    field_coords: coordinate campo del progetto (load_field_coords); se None proietta con calibration_path.
     Ritorna un dict con:
       - possession_segments: [{start_frame, end_frame, team, track_id}, ...]
       - automatic: lista eventi in formato schema Step 0.1 (type, timestamp_ms, team, track_id, ...)
@@ -362,21 +361,26 @@ def run_event_engine(
 
     width = player_tracks.get("width") or ball_tracks.get("width") or 1280
     height = player_tracks.get("height") or ball_tracks.get("height") or 720
-    calibrator = get_calibrator(calibration_path) if calibration_path else None
+    calibrator = get_calibrator(calibration_path) if calibration_path and field_coords is None else None
 
     ball_by_frame, players_by_frame, _ = _build_frame_data(
-        player_tracks, ball_tracks, calibrator, width, height, field_length_m, field_width_m
+        player_tracks, ball_tracks, calibrator, width, height, field_length_m, field_width_m, field_coords
     )
     min_frames = max(1, int(min_time_s * fps))
+    # Campionamento adattivo: tempi per campione dal frame video (passo variabile)
+    times_ms = sample_times_ms(player_tracks, ball_tracks)
+    sampling = player_tracks.get("sampling") or ball_tracks.get("sampling") or {}
+    base_ms = 1000.0 * (sampling.get("base_step") or 1) / fps if fps else 0.0
     possession_segments, possession_by_frame = _compute_possession(
-        ball_by_frame, players_by_frame, max_dist_m, min_frames, fps
+        ball_by_frame, players_by_frame, max_dist_m, min_frames, fps,
+        times_ms=times_ms, min_span_ms=max(0.0, min_time_s * 1000 - base_ms),
     )
 
     automatic: List[Dict] = []
-    automatic.extend(_detect_passes(possession_by_frame, ball_by_frame, pass_params, fps))
-    automatic.extend(_detect_recoveries(possession_by_frame, ball_by_frame, recovery_params, fps))
-    automatic.extend(_detect_shots(ball_by_frame, shot_params, fps))
-    automatic.extend(_detect_pressing(ball_by_frame, players_by_frame, pressing_params, fps))
+    automatic.extend(_detect_passes(possession_by_frame, ball_by_frame, pass_params, fps, times_ms))
+    automatic.extend(_detect_recoveries(possession_by_frame, ball_by_frame, recovery_params, fps, times_ms))
+    automatic.extend(_detect_shots(ball_by_frame, shot_params, fps, times_ms))
+    automatic.extend(_detect_pressing(ball_by_frame, players_by_frame, pressing_params, fps, times_ms))
     automatic.sort(key=lambda e: e["timestamp_ms"])
 
     return {
@@ -405,10 +409,11 @@ def run_event_engine_from_project(
     bt_path = get_ball_tracks_path(project_analysis_dir)
     cal_path = get_calibration_path(project_analysis_dir)
 
-    if not pt_path.exists() or not bt_path.exists():
+    if not bt_path.exists():
+        return False
+    player_tracks = load_player_tracks(pt_path)
+    if player_tracks is None:
         return False
-    with open(pt_path, "r", encoding="utf-8") as f:
-        player_tracks = json.load(f)
     with open(bt_path, "r", encoding="utf-8") as f:
         ball_tracks = json.load(f)
 
@@ -418,11 +423,14 @@ def run_event_engine_from_project(
 
     if progress_callback:
         progress_callback(0, 1, "Event engine...")
+    # Coordinate campo proiettate una volta per analisi (riusate da metriche e overlay)
+    field_coords = load_field_coords(project_analysis_dir, player_tracks, ball_tracks)
     result = run_event_engine(
         player_tracks,
         ball_tracks,
         fps_use,
         calibration_path=str(cal_path) if cal_path.exists() else None,
+        field_coords=field_coords,
     )
     if progress_callback:
         progress_callback(1, 1, "Event engine completato.")
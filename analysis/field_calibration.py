@@ -80,6 +80,20 @@ class FieldCalibrator:
         out = cv2.perspectiveTransform(pt, self._homography)
         return (float(out[0][0][0]), float(out[0][0][1]))
 
+    def pixel_to_field_batch(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Come pixel_to_field su N punti (N, 2) in una sola perspectiveTransform.
+        Ritorna (coordinate campo (N, 2) float64, valid (N,) bool); righe non valide = NaN.
+        """
+        pts = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        out = np.full((len(pts), 2), np.nan)
+        if not len(pts) or (self._homography is None and not self.compute_homography()):
+            return out, np.zeros(len(pts), dtype=bool)
+        out[:] = cv2.perspectiveTransform(pts.reshape(-1, 1, 2), self._homography).reshape(-1, 2)
+        valid = np.isfinite(out).all(axis=1)
+        out[~valid] = np.nan
+        return out, valid
+
     def field_to_pixel(self, fx: float, fy: float) -> Optional[Tuple[float, float]]:
         """
         Trasforma coordinate campo (metri) → coordinate pixel.
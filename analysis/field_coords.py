@@ -0,0 +1,185 @@
+"""
+Coordinate campo (metri) dei track, proiettate una volta per analisi (detections/field_coords.npz).
+
+Event engine, metriche, post-processing cloud e overlay (tactical board, heatmap) leggono lo stesso
+artefatto invece di proiettare ognuno i centri pixel → metri:
+
+  player_px, player_m   (N, 2) per riga dell'archivio track (stesso ordine di TrackStore)
+  ball_frame            (B,) frame con palla; ball_px, ball_m (B, 2)
+  key                   versione, hash di field_calibration.json, firme di player_tracks.json / ball_tracks.json
+
+Punto di ancoraggio unico per tutti gli utenti:
+  - giocatori: centro della base del bbox (x + w/2, y + h), il contatto col terreno, cioè il piano su cui
+    è definita la homography (il centro del bbox cade ~1 m sopra il terreno e si proietta più lontano);
+  - palla: centro del bbox (x + w/2, y + h/2); il bbox è di pochi pixel.
+
+*_m è NaN dove la proiezione non è valida o manca la calibrazione: players(scale) / ball(scale)
+ricadono su pixel * scale. L'artefatto viene ricalcolato quando cambiano calibrazione (hash) o track
+(firma mtime + dimensione); clear_calibrator_cache(path), chiamato dopo una nuova calibrazione dalla
+UI, lo rimuove.
+"""
+import json
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .homography import calibration_hash, get_calibrator
+from .track_store import TrackStore, file_signature, load_player_tracks
+
+FIELD_COORDS_FILE = "field_coords.npz"
+FIELD_COORDS_VERSION = 1
+
+
+def get_field_coords_path(project_analysis_dir: str) -> Path:
+    from .config import get_analysis_output_path
+    return get_analysis_output_path(project_analysis_dir) / "detections" / FIELD_COORDS_FILE
+
+
+def player_anchors(store: TrackStore) -> np.ndarray:
+    """(N, 2) centro della base del bbox per ogni riga."""
+    return np.column_stack([store["x"] + store["w"] / 2, store["y"] + store["h"]])
+
+
+def ball_anchor(det: Optional[Dict]) -> Optional[Tuple[float, float]]:
+    """Centro del bbox palla, None senza detection."""
+    if not det or "x" not in det:
+        return None
+    x, y = det["x"], det["y"]
+    w, h = det.get("w", 0), det.get("h", 0)
+    return (x + w / 2, y + h / 2)
+
+
+def _with_fallback(px: np.ndarray, m: np.ndarray, scale: float) -> np.ndarray:
+    out = px * scale
+    valid = ~np.isnan(m[:, 0])
+    out[valid] = m[valid]
+    return out
+
+
+class FieldCoords:
+    """Ancore pixel e coordinate campo di giocatori (per riga) e palla (per frame)."""
+
+    def __init__(self, player_px: np.ndarray, player_m: np.ndarray,
+                 ball_frame: np.ndarray, ball_px: np.ndarray, ball_m: np.ndarray,
+                 key: Optional[dict] = None):
+        self.player_px = player_px
+        self.player_m = player_m
+        self.ball_frame = ball_frame
+        self.ball_px = ball_px
+        self.ball_m = ball_m
+        self.key = key
+
+    def players(self, scale: float) -> np.ndarray:
+        """(N, 2) metri per riga; senza proiezione valida ancora pixel * scale."""
+        return _with_fallback(self.player_px, self.player_m, scale)
+
+    def ball(self, scale: float) -> np.ndarray:
+        """(B, 2) metri per ball_frame; senza proiezione valida ancora pixel * scale."""
+        return _with_fallback(self.ball_px, self.ball_m, scale)
+
+    @classmethod
+    def compute(cls, store: TrackStore, ball_tracks: dict, calibrator=None,
+                key: Optional[dict] = None) -> "FieldCoords":
+        """Proietta in blocco (pixel_to_field_batch) le ancore di giocatori e palla."""
+        player_px = player_anchors(store)
+        bt_frames = {f["frame"]: f for f in (ball_tracks or {}).get("frames", [])}
+        ball_frame, ball_px = [], []
+        for frame_idx, bt in sorted(bt_frames.items()):
+            det = bt.get("detection") if isinstance(bt.get("detection"), dict) else None
+            anchor = ball_anchor(det)
+            if anchor:
+                ball_frame.append(frame_idx)
+                ball_px.append(anchor)
+        ball_px = np.array(ball_px, dtype=np.float64).reshape(-1, 2)
+
+        def project(px):
+            if calibrator is None:
+                return np.full(px.shape, np.nan)
+            return calibrator.pixel_to_field_batch(px)[0]
+
+        return cls(player_px, project(player_px), np.array(ball_frame, dtype=np.int64),
+                   ball_px, project(ball_px), key)
+
+    # --- file ---
+
+    def save(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f, key=np.array(json.dumps(self.key)),
+                player_px=self.player_px, player_m=self.player_m,
+                ball_frame=self.ball_frame, ball_px=self.ball_px, ball_m=self.ball_m,
+            )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path, key: Optional[dict] = None) -> Optional["FieldCoords"]:
+        """
+        Artefatto da file; con key, None se la chiave salvata è diversa. L'npz è letto in modo lazy:
+        con chiave diversa gli array non vengono letti.
+        """
+        try:
+            with np.load(path) as data:
+                saved_key = json.loads(str(data["key"]))
+                if key is not None and saved_key != key:
+                    return None
+                return cls(data["player_px"], data["player_m"], data["ball_frame"],
+                           data["ball_px"], data["ball_m"], saved_key)
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def field_coords_key(project_analysis_dir: str) -> dict:
+    """
+    Chiave attesa dell'artefatto del progetto: versione, hash della calibrazione (in cache, vedi
+    calibration_hash), firme dei track. Non legge né i track né l'artefatto.
+    """
+    from .ball_tracking import get_ball_tracks_path
+    from .config import get_calibration_path
+    from .player_tracking import get_tracks_path
+
+    cal_path = get_calibration_path(project_analysis_dir)
+    calibrator = get_calibrator(str(cal_path)) if cal_path.exists() else None
+    return {
+        "version": FIELD_COORDS_VERSION,
+        "calibration": calibration_hash(str(cal_path)) if calibrator else None,
+        "players": file_signature(get_tracks_path(project_analysis_dir)),
+        "ball": file_signature(get_ball_tracks_path(project_analysis_dir)),
+    }
+
+
+def load_field_coords(project_analysis_dir: str, player_tracks: Optional[TrackStore] = None,
+                      ball_tracks: Optional[dict] = None) -> Optional[FieldCoords]:
+    """
+    Coordinate campo del progetto: da field_coords.npz se calibrazione e track non sono cambiati,
+    altrimenti proiettate e salvate. player_tracks / ball_tracks evitano di rileggere i file se il
+    chiamante li ha già caricati. None se player_tracks.json manca.
+    """
+    from .ball_tracking import get_ball_tracks_path
+    from .config import get_calibration_path
+    from .player_tracking import get_tracks_path
+
+    key = field_coords_key(project_analysis_dir)
+    if key["players"] is None:
+        return None
+    path = get_field_coords_path(project_analysis_dir)
+    coords = FieldCoords.load(path, key)
+    if coords is not None:
+        return coords
+    if player_tracks is None:
+        player_tracks = load_player_tracks(get_tracks_path(project_analysis_dir))
+        if player_tracks is None:
+            return None
+    if ball_tracks is None:
+        ball_tracks = {}
+        if key["ball"] is not None:
+            with open(get_ball_tracks_path(project_analysis_dir), "r", encoding="utf-8") as f:
+                ball_tracks = json.load(f)
+    cal_path = get_calibration_path(project_analysis_dir)
+    calibrator = get_calibrator(str(cal_path)) if key["calibration"] else None
+    coords = FieldCoords.compute(player_tracks, ball_tracks, calibrator, key)
+    coords.save(path)
+    return coords
@@ -0,0 +1,164 @@
+"""
+Lettura video campionata: un frame ogni `step`, senza decodificare a vuoto quelli scartati.
+
+- Step piccolo: grab() per i frame saltati (solo demux/decode, niente conversione BGR né copia)
+  e retrieve() solo per i frame campionati.
+- Step grande (>= seek_threshold, ~ distanza tipica tra keyframe): seek con CAP_PROP_POS_FRAMES.
+  Il decoder riparte dal keyframe precedente al target, quindi il costo per campione è al più
+  un GOP invece di `step` frame. Dopo il seek la posizione reale viene verificata e, se il backend
+  si ferma prima del target, completata con grab(): gli indici restituiti sono sempre esatti.
+
+Uso:
+  with FrameSampler(video_path, step=3) as sampler:
+      for vf in sampler:
+          vf.index, vf.timestamp_ms, vf.image
+"""
+from dataclasses import dataclass
+from typing import Iterator, Optional, Union
+
+import cv2
+import numpy as np
+
+# Step (in frame) da cui conviene il seek invece di grab() consecutivi: ~2 s a 25 fps, GOP tipico H.264
+DEFAULT_SEEK_THRESHOLD = 50
+
+
+@dataclass
+class VideoFrame:
+    index: int  # indice frame nel video (0-based)
+    timestamp_ms: float  # index / fps * 1000
+    image: np.ndarray  # BGR
+
+
+def frame_step_for(video_fps: float, target_fps: float) -> int:
+    """Step di campionamento per ottenere target_fps da video_fps. target_fps <= 0 → legacy (1 ogni 2)."""
+    if target_fps > 0 and video_fps > 0:
+        return max(1, int(round(video_fps / target_fps)))
+    return 2
+
+
+class FrameSampler:
+    """
+    Itera i frame con indice multiplo di `step` in [start_frame, end_frame).
+    video: path oppure cv2.VideoCapture già aperto (in quel caso release() non lo chiude).
+    """
+
+    def __init__(
+        self,
+        video: Union[str, "cv2.VideoCapture"],
+        step: int = 1,
+        start_frame: int = 0,
+        end_frame: Optional[int] = None,
+        seek_threshold: int = DEFAULT_SEEK_THRESHOLD,
+    ):
+        if isinstance(video, cv2.VideoCapture):
+            self._cap = video
+            self._owns_cap = False
+        else:
+            self._cap = cv2.VideoCapture(str(video))
+            self._owns_cap = True
+        self.step = max(1, int(step))
+        self.start_frame = max(0, int(start_frame))
+        self.end_frame = end_frame
+        self.seek_threshold = max(1, int(seek_threshold))
+        self._pos = 0  # prossimo frame che il decoder restituirà
+        if self.is_opened():
+            self._pos = int(self._cap.get(cv2.CAP_PROP_POS_FRAMES) or 0)
+
+    def is_opened(self) -> bool:
+        return self._cap is not None and self._cap.isOpened()
+
+    @property
+    def fps(self) -> float:
+        return float(self._cap.get(cv2.CAP_PROP_FPS) or 0.0) or 25.0
+
+    @property
+    def frame_count(self) -> int:
+        return int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+    @property
+    def uses_seek(self) -> bool:
+        return self.step >= self.seek_threshold
+
+    def release(self) -> None:
+        if self._owns_cap and self._cap is not None:
+            self._cap.release()
+
+    def __enter__(self) -> "FrameSampler":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    def _seek(self, target: int) -> int:
+        """Posiziona il decoder su target; ritorna la posizione effettiva (>= target salvo fine video)."""
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+        actual = int(self._cap.get(cv2.CAP_PROP_POS_FRAMES) or target)
+        self._pos = actual
+        self._skip_to(target)
+        return self._pos
+
+    def _skip_to(self, target: int) -> bool:
+        """grab() fino a target escluso. False se il video finisce prima."""
+        while self._pos < target:
+            if not self._cap.grab():
+                return False
+            self._pos += 1
+        return True
+
+    def _retrieve_next(self) -> Optional[np.ndarray]:
+        """Decodifica il frame in posizione corrente e lo converte in BGR."""
+        if not self._cap.grab():
+            return None
+        self._pos += 1
+        ok, img = self._cap.retrieve()
+        if not ok or img is None or img.size == 0:
+            return None
+        return img
+
+    def read_frame(self, index: int) -> Optional[VideoFrame]:
+        """Legge un singolo frame per indice esatto (seek se lontano, grab se vicino in avanti)."""
+        if not self.is_opened():
+            return None
+        index = max(0, int(index))
+        if index < self._pos or index - self._pos >= self.seek_threshold:
+            index = self._seek(index)
+        elif not self._skip_to(index):
+            return None
+        img = self._retrieve_next()
+        if img is None:
+            return None
+        return VideoFrame(index, index * 1000.0 / self.fps, img)
+
+    def __iter__(self) -> Iterator[VideoFrame]:
+        if not self.is_opened():
+            return
+        step = self.step
+        fps = self.fps
+        total = self.frame_count
+        end = self.end_frame
+        if end is None and self.uses_seek and total > 0:
+            end = total  # con il seek non si può contare sul fallimento di read() a fine video
+        # primo indice campionato >= start_frame (campionamento allineato all'indice assoluto)
+        target = ((self.start_frame + step - 1) // step) * step
+        if target != self._pos:
+            target = self._seek(target)
+        while end is None or target < end:
+            if target != self._pos:
+                if self.uses_seek:
+                    target = self._seek(target)
+                elif not self._skip_to(target):
+                    return
+            if end is not None and target >= end:
+                return
+            img = self._retrieve_next()
+            if img is None:
+                return
+            yield VideoFrame(target, target * 1000.0 / fps, img)
+            target += step
+
+
+def read_frame_at(video_path: str, index: int) -> Optional[VideoFrame]:
+    """Legge il frame `index` dal video (comodo per calibrazione automatica e anteprime)."""
+    with FrameSampler(video_path) as sampler:
+        return sampler.read_frame(index)
@@ -32,12 +32,14 @@ def _activity_score(frame, prev_gray) -> tuple:
     else:
         motion = 0.0
 
-    # Field: percentuale di pixel verdi (erba)
+    return min(1.0, 0.55 * motion + 0.45 * _field_score(frame)), gray
+
+
+def _field_score(frame) -> float:
+    """Field: percentuale di pixel verdi (erba), normalizzata 0-1."""
     hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
     green = cv2.inRange(hsv, (32, 35, 35), (92, 255, 255))
-    field = min(1.0, float(np.count_nonzero(green)) / (frame.shape[0] * frame.shape[1]) * 2.2)
-
-    return min(1.0, 0.55 * motion + 0.45 * field), gray
+    return min(1.0, float(np.count_nonzero(green)) / (frame.shape[0] * frame.shape[1]) * 2.2)
 
 
 def detect_game_segments(
@@ -55,6 +57,8 @@ def detect_game_segments(
           'duration_ms': int,
         }
     """
+    from .frame_sampler import FrameSampler
+
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         return {'segments': [], 'times_ms': [], 'scores': [], 'duration_ms': 0}
@@ -70,18 +74,12 @@ def detect_game_segments(
     prev_gray  = None
     sample_idx = 0
 
-    frame_pos = 0
-    while frame_pos < total_frames:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_pos)
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        score, prev_gray = _activity_score(frame, prev_gray)
-        times_ms.append(int(frame_pos / fps * 1000))
+    # Step di ~2 s: FrameSampler usa il seek (ripartenza dal keyframe) invece di decodificare tutto
+    for vf in FrameSampler(cap, step=step_frames, end_frame=total_frames):
+        score, prev_gray = _activity_score(vf.image, prev_gray)
+        times_ms.append(int(vf.timestamp_ms))
         raw_scores.append(score)
 
-        frame_pos += step_frames
         sample_idx += 1
         if progress_cb and sample_idx % 8 == 0:
             progress_cb(sample_idx, total_samples)
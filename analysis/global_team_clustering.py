@@ -2,78 +2,38 @@
 Clustering globale squadre: un solo KMeans k=3 su tutti i campioni jersey (HSV)
 del video, poi assegnazione team coerente per tutto il video.
 
-Legge player_tracks.json (con jersey_hsv per detection), ricalcola team e sovrascrive il file.
+Legge i track giocatori (con jersey_hsv per detection) dall'archivio colonnare, ricalcola team e
+scrive solo la mappa track_id → team (player_tracks.teams.json, analysis/track_store.py): i track non
+vengono riscritti, i lettori applicano la mappa al caricamento.
+Se le detection hanno jersey_hist (team classification differita, --defer-teams) il clustering
+avviene una volta sola sugli istogrammi aggregati per track_id.
+Con per_track=True (--team-clustering-per-track) anche i jersey_hsv vengono prima aggregati per
+track_id (mediana + pochi esemplari) e clusterizzati con MiniBatchKMeans: costo proporzionale al
+numero di track, non di detection.
 """
-import json
-from pathlib import Path
-from typing import Callable, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 
 from .player_tracking import get_tracks_path
+from .track_store import TrackStore, load_player_tracks, stabilize_teams, write_team_overlay
 from .team_classifier import (
     _REF_REFEREE_HSV,
     _REF_REFEREE_YELLOW_HSV,
     _REF_WHITE_HSV,
     _distance_to_red,
     _hsv_distance,
+    _hsv_mean,
     _is_referee_jersey_hsv,
 )
 
 
-def run_global_team_clustering(
-    project_analysis_dir: str,
-    progress_callback: Optional[Callable[[int, int, str], None]] = None,
-) -> bool:
+def _cluster_to_team(centers: List[tuple], counts: List[int]) -> Dict[int, int]:
     """
-    Raccoglie tutti i jersey_hsv da player_tracks.json, esegue KMeans k=3,
-    assegna team (0, 1, -1) per centroide e sovrascrive il campo team in player_tracks.
-
-    Ritorna True se completato (anche se nessun campione: file non modificato).
+    Mappa cluster (3 centroidi HSV) → team 0 (chiara), 1 (rossa/scura), -1 (arbitro).
+    counts: detection per cluster (fallback arbitro = cluster chiaramente più piccolo).
     """
-    tracks_path = get_tracks_path(project_analysis_dir)
-    path = Path(tracks_path)
-    if not path.exists():
-        return False
-
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    frames_data = data.get("frames", [])
-    if not frames_data:
-        return True
-
-    # Raccogli campioni HSV (uno per detection che ha jersey_hsv)
-    samples: List[List[float]] = []
-    # Mappa indice (frame_idx, det_idx) -> indice in samples (per riassegnare dopo)
-    # In realtà dobbiamo riassegnare ogni detection: per ogni frame, per ogni det con jersey_hsv,
-    # troviamo il centroide più vicino e assegniamo team.
-    samples_per_detection: List[tuple] = []  # (frame_idx, det_idx_in_frame, [h,s,v])
-
-    for frame_idx, fd in enumerate(frames_data):
-        for det_idx, d in enumerate(fd.get("detections", [])):
-            hsv = d.get("jersey_hsv")
-            if not hsv or len(hsv) < 3:
-                continue
-            h, s, v = float(hsv[0]), float(hsv[1]), float(hsv[2])
-            samples.append([h, s, v])
-            samples_per_detection.append((frame_idx, det_idx))
-
-    if progress_callback:
-        progress_callback(0, 1, "Clustering globale squadre...")
-
-    if len(samples) < 3:
-        # Troppi pochi campioni: lascia team invariato
-        if progress_callback:
-            progress_callback(1, 1, "Completato (pochi campioni, team invariati)")
-        return True
-
-    X = np.array(samples)
-    kmeans = KMeans(n_clusters=3, random_state=42, n_init=15)
-    labels = kmeans.fit_predict(X)
-    centers = [tuple(c) for c in kmeans.cluster_centers_]
-
     # Quale cluster è arbitro? Distanza minima da giallo/lime; fallback: cluster più piccolo (arbitro = 1 persona)
     d_ref_lime = [_hsv_distance(c, _REF_REFEREE_HSV) for c in centers]
     d_ref_yellow = [_hsv_distance(c, _REF_REFEREE_YELLOW_HSV) for c in centers]
@@ -82,7 +42,6 @@ def run_global_team_clustering(
     h, s, v = centers[referee_cluster][0], centers[referee_cluster][1], centers[referee_cluster][2]
     if not _is_referee_jersey_hsv(h, s, v):
         # Fallback: il cluster con meno detection è probabilmente l'arbitro (una sola persona)
-        counts = [int(np.sum(labels == i)) for i in range(3)]
         min_count_idx = int(np.argmin(counts))
         # Arbitro = 1 persona: cluster con meno detection (solo se chiaramente più piccolo)
         mean_count = (sum(counts) - counts[min_count_idx]) / 2
@@ -109,41 +68,183 @@ def run_global_team_clustering(
             d_white = _hsv_distance(centers[i], _REF_WHITE_HSV)
             d_red = _distance_to_red(centers[i])
             label_to_team[i] = 0 if d_white < d_red else 1
+    return label_to_team
+
+
+def _track_histogram_teams(store: TrackStore) -> Optional[Dict[int, int]]:
+    """
+    Team classification differita (detection con jersey_hist): un istogramma medio per track_id,
+    KMeans k=3 sui track pesati per numero di detection, centroidi HSV per le euristiche
+    arbitro/bianco/rosso dalla media circolare dei jersey_hsv dei track del cluster.
+    Ritorna {track_id: team} o None se meno di 3 track con feature.
+    """
+    hist = store["jersey_hist"]
+    valid = hist[:, 0] >= 0
+    tids, inverse = np.unique(store["track_id"][valid], return_inverse=True)
+    if len(tids) < 3:
+        return None
+    X = np.zeros((len(tids), hist.shape[1]), dtype=np.float64)
+    np.add.at(X, inverse, np.maximum(hist[valid], 0))
+    X /= np.maximum(X.sum(axis=1, keepdims=True), 1e-9)
+    if store.has("jersey_hsv"):
+        hsv = store["jersey_hsv"][valid]
+        has_hsv = ~np.isnan(hsv).any(axis=1)
+    else:
+        hsv, has_hsv = np.zeros((int(valid.sum()), 3)), np.zeros(int(valid.sum()), dtype=bool)
+    weights = np.maximum(1, np.bincount(inverse[has_hsv], minlength=len(tids))).astype(np.float64)
+    kmeans = KMeans(n_clusters=3, random_state=42, n_init=10)
+    labels = kmeans.fit_predict(X, sample_weight=weights)
+
+    centers = []
+    counts = []
+    row_labels = labels[inverse]
+    for c in range(3):
+        centers.append(_hsv_mean(hsv[has_hsv & (row_labels == c)].reshape(-1, 3)))
+        counts.append(int(weights[labels == c].sum()))
+    label_to_team = _cluster_to_team(centers, counts)
+    return {int(t): label_to_team.get(int(lab), 0) for t, lab in zip(tids, labels)}
+
+
+_TRACK_EXEMPLARS = 4  # campioni per track oltre alla mediana (track con id scambiati, luce variabile)
+_HUE_SHIFT = 15.0  # H delle feature per track in [-15, 165)
+
+
+def _group_median(values: np.ndarray, inverse: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Mediana di values per gruppo (inverse: gruppo di ogni valore, counts: dimensione dei gruppi)."""
+    span = float(values.max() - values.min()) or 1.0
+    order = np.argsort(inverse + (values - values.min()) * (0.999 / span))  # gruppo, poi valore
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    lo = values[order[starts + (counts - 1) // 2]]
+    hi = values[order[starts + counts // 2]]
+    return (lo + hi) / 2
+
+
+def _track_hsv_features(track_id: np.ndarray, hsv: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Feature per track dai jersey_hsv delle sue detection: mediana robusta (H circolare attorno alla
+    media del track) più _TRACK_EXEMPLARS esemplari equispaziati nel track, con H vicino alla media
+    del track. H in [-_HUE_SHIFT, 180 - _HUE_SHIFT): il rosso (0 / 180) resta un solo gruppo.
+    Ritorna (tids (T,), punti (T * (1 + E), 3): prima le T mediane, pesi: metà alla mediana e metà
+    agli esemplari, in proporzione alle detection del track).
+    """
+    tids, inverse, counts = np.unique(track_id, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    ang = hsv[:, 0] * (np.pi / 90.0)
+    sin = np.bincount(inverse, np.sin(ang), len(tids))
+    cos = np.bincount(inverse, np.cos(ang), len(tids))
+    h_mean = np.mod(np.degrees(np.arctan2(sin, cos)) / 2.0 + _HUE_SHIFT, 180.0) - _HUE_SHIFT
+    dh = np.mod(hsv[:, 0] - h_mean[inverse] + 90.0, 180.0) - 90.0
+    median = np.column_stack([
+        h_mean + _group_median(dh, inverse, counts),
+        _group_median(hsv[:, 1], inverse, counts),
+        _group_median(hsv[:, 2], inverse, counts),
+    ])
+    order = np.argsort(inverse, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    exemplars = []
+    for j in range(_TRACK_EXEMPLARS):
+        rows = order[starts + (2 * j + 1) * counts // (2 * _TRACK_EXEMPLARS)]
+        exemplars.append(np.column_stack([h_mean + dh[rows], hsv[rows, 1], hsv[rows, 2]]))
+    points = np.concatenate([median] + exemplars)
+    weights = np.concatenate([counts / 2.0] + [counts / (2.0 * _TRACK_EXEMPLARS)] * _TRACK_EXEMPLARS)
+    return tids, points, weights
+
+
+def _track_hsv_teams(track_id: np.ndarray, hsv: np.ndarray) -> Optional[Dict[int, int]]:
+    """
+    Clustering globale sui track (per_track=True): MiniBatchKMeans k=3 sulle feature di
+    _track_hsv_features, team del track = cluster della sua mediana. None se meno di 3 track.
+    """
+    tids, points, weights = _track_hsv_features(track_id, hsv)
+    if len(tids) < 3:
+        return None
+    kmeans = MiniBatchKMeans(n_clusters=3, random_state=42, n_init=15, batch_size=1024)
+    labels = kmeans.fit_predict(points, sample_weight=weights)
+    centers = [tuple(c) for c in kmeans.cluster_centers_]
+    counts = [int(round(weights[labels == c].sum())) for c in range(3)]
+    label_to_team = _cluster_to_team(centers, counts)
+    return {int(t): label_to_team.get(int(lab), 0) for t, lab in zip(tids, labels[:len(tids)])}
+
+
+def run_global_team_clustering(
+    project_analysis_dir: str,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    per_track: bool = False,
+) -> bool:
+    """
+    Raccoglie tutti i jersey_hsv dai track (archivio colonnare, analysis/track_store.py), esegue KMeans k=3,
+    assegna team (0, 1, -1) per centroide e scrive la mappa track_id → team (player_tracks.teams.json).
+    per_track: clustering sulle feature aggregate per track_id (MiniBatchKMeans) invece che su ogni
+    detection; ogni track riceve un solo team.
+
+    Ritorna True se completato (anche se nessun campione: mappa non modificata).
+    """
+    tracks_path = get_tracks_path(project_analysis_dir)
+    store = load_player_tracks(tracks_path)
+    if store is None:
+        return False
+
+    if not store.n_frames:
+        return True
+
+    track_id = store["track_id"]
+    if store.has("jersey_hist"):
+        # Detection con team classification differita: un'assegnazione per track
+        if progress_callback:
+            progress_callback(0, 1, "Clustering globale squadre (per track)...")
+        track_team = _track_histogram_teams(store)
+        if track_team is None:
+            if progress_callback:
+                progress_callback(1, 1, "Completato (pochi campioni, team invariati)")
+            return True
+        write_team_overlay(tracks_path, track_team)
+        if progress_callback:
+            progress_callback(1, 1, "Clustering globale completato")
+        return True
+
+    # Campioni HSV: uno per detection che ha jersey_hsv, in ordine di frame e di detection
+    if store.has("jersey_hsv"):
+        hsv = store["jersey_hsv"]
+        has_hsv = ~np.isnan(hsv).any(axis=1)
+    else:
+        hsv, has_hsv = np.zeros((len(store), 3)), np.zeros(len(store), dtype=bool)
+
+    if progress_callback:
+        progress_callback(0, 1, "Clustering globale squadre...")
+
+    if int(has_hsv.sum()) < 3:
+        # Troppi pochi campioni: lascia team invariato
+        if progress_callback:
+            progress_callback(1, 1, "Completato (pochi campioni, team invariati)")
+        return True
+
+    if per_track:
+        track_team = _track_hsv_teams(track_id[has_hsv], hsv[has_hsv])
+        if track_team is None:
+            if progress_callback:
+                progress_callback(1, 1, "Completato (pochi campioni, team invariati)")
+            return True
+        write_team_overlay(tracks_path, track_team)
+        if progress_callback:
+            progress_callback(1, 1, "Clustering globale completato")
+        return True
+
+    X = hsv[has_hsv]
+    kmeans = KMeans(n_clusters=3, random_state=42, n_init=15)
+    labels = kmeans.fit_predict(X)
+    centers = [tuple(c) for c in kmeans.cluster_centers_]
+
+    counts = [int(np.sum(labels == i)) for i in range(3)]
+    label_to_team = _cluster_to_team(centers, counts)
 
     # Riassegna team per ogni detection che ha jersey_hsv (usa il label del suo campione)
-    for idx, (frame_idx, det_idx) in enumerate(samples_per_detection):
-        lab = int(labels[idx])
-        new_team = label_to_team.get(lab, 0)
-        frame_data = frames_data[frame_idx]
-        detections = frame_data.get("detections", [])
-        if det_idx < len(detections):
-            detections[det_idx]["team"] = new_team
+    team = store["team"]
+    team[has_hsv] = np.array([label_to_team.get(i, 0) for i in range(3)])[labels]
 
     # Stabilizza team per track_id: un track = un team (moda sui frame)
-    from collections import Counter
-    track_teams: dict = {}
-    for fd in frames_data:
-        for d in fd.get("detections", []):
-            tid = d.get("track_id")
-            if tid is None:
-                continue
-            t = d.get("team", 0)
-            if tid not in track_teams:
-                track_teams[tid] = []
-            track_teams[tid].append(t)
-    track_mode = {}
-    for tid, teams in track_teams.items():
-        cnt = Counter(teams)
-        track_mode[tid] = cnt.most_common(1)[0][0]
-    for fd in frames_data:
-        for d in fd.get("detections", []):
-            tid = d.get("track_id")
-            if tid is not None and tid in track_mode:
-                d["team"] = track_mode[tid]
-
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    team = stabilize_teams(track_id, team)
+    tids, first = np.unique(track_id, return_index=True)
+    write_team_overlay(tracks_path, dict(zip(tids.tolist(), team[first].tolist())))
 
     if progress_callback:
         progress_callback(1, 1, "Clustering globale completato")
@@ -0,0 +1,364 @@
+"""
+Profilo hardware per l'analysis engine (micro-benchmark una tantum).
+
+Misura sulla macchina:
+  - decode: fps di decodifica sequenziale del video (OpenCV)
+  - inference: ms/frame del modello soccer al variare di thread, batch size e lato dell'input
+  - RAM totale e disponibile
+
+Dalle misure sceglie le impostazioni più veloci (recommended: threads, batch_size, input_size) e
+stima il tempo di detection di una partita da 90 minuti. Il profilo è salvato in
+get_hardware_profile_path(); analysis_engine.py e _get_engine_command (ui/analysis_process_dialog.py)
+lo usano quando i parametri non sono indicati esplicitamente.
+
+CLI (dalla root del progetto):
+  python -m analysis.hardware_profile                    # mostra il profilo (lo crea se assente)
+  python -m analysis.hardware_profile --video partita.mp4 --refresh
+"""
+import argparse
+import json
+import os
+import platform
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+PROFILE_VERSION = 1
+MATCH_DURATION_S = 90 * 60
+DEFAULT_BATCH_SIZES = (1, 4, 8)
+DEFAULT_INPUT_SIZES = (640, 512, 416)
+# Oltre questa stima per 90 minuti si riduce il lato dell'input (meno accurato sulla palla, ma più veloce)
+MAX_MATCH_TIME_S = 3 * 3600
+# RAM stimata per frame in un batch (input float32 + attivazioni YOLOX-s), usata per limitare batch_size
+BATCH_FRAME_RAM_MB = 150
+_DECODE_FRAMES = 150
+
+
+def thread_candidates(cpu_count: Optional[int] = None) -> List[int]:
+    """Numeri di thread da provare: potenze di 2 fino al numero di core, più il numero di core."""
+    cpu_count = max(1, cpu_count or os.cpu_count() or 1)
+    counts = {cpu_count}
+    n = 1
+    while n < cpu_count:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+
+def limit_threads(num_threads: int) -> None:
+    """
+    Limita i thread di inference del processo (torch / ONNX Runtime): usato dall'engine con il valore del
+    profilo e dai worker di sharded_detection con la loro quota di core. num_threads <= 0: nessun limite.
+    """
+    if num_threads <= 0:
+        return
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except ImportError:
+        pass
+    from . import config
+    if not config.ONNX_NUM_THREADS:
+        config.ONNX_NUM_THREADS = num_threads
+
+
+def get_ram_info() -> dict:
+    """RAM totale e disponibile in GB (0 se psutil non è installato)."""
+    try:
+        import psutil
+        vm = psutil.virtual_memory()
+        return {"ram_gb": round(vm.total / 1024 ** 3, 1), "ram_available_gb": round(vm.available / 1024 ** 3, 1)}
+    except ImportError:
+        return {"ram_gb": 0.0, "ram_available_gb": 0.0}
+
+
+def benchmark_decode(video_path: Optional[str], max_frames: int = _DECODE_FRAMES) -> Optional[dict]:
+    """fps di decodifica sequenziale (primi max_frames frame) e fps/risoluzione del video. None senza video."""
+    if not video_path or not Path(video_path).exists():
+        return None
+    from .frame_sampler import FrameSampler
+
+    with FrameSampler(video_path) as sampler:
+        video_fps = sampler.fps
+        n = 0
+        size = None
+        t0 = time.perf_counter()
+        for vf in sampler:
+            size = size or [int(vf.image.shape[1]), int(vf.image.shape[0])]
+            n += 1
+            if n >= max_frames:
+                break
+        elapsed = time.perf_counter() - t0
+    if n == 0 or elapsed <= 0:
+        return None
+    return {"decode_fps": round(n / elapsed, 1), "video_fps": video_fps, "frame_size": size}
+
+
+def _benchmark_frames(video_path: Optional[str], n: int) -> List[np.ndarray]:
+    """Frame reali dal video se disponibile, altrimenti frame sintetici 1280x720."""
+    if video_path and Path(video_path).exists():
+        from .detection_backends.quantization import extract_calibration_frames
+        frames = extract_calibration_frames([video_path], n_frames=n)
+        if frames:
+            return frames
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (720, 1280, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def _set_threads(detector, backend: Optional[str], threads: int) -> None:
+    """Imposta i thread di inference: torch.set_num_threads o nuova sessione ONNX Runtime."""
+    if backend == "onnx":
+        from .detection_backends.onnx_runtime import OnnxPredictor
+        from .player_detection import get_detection_model_path
+        detector._predictor = OnnxPredictor(get_detection_model_path(backend), num_threads=threads)
+        return
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def _time_inference(predictor, frames: List[np.ndarray], batch_size: int, repeats: int) -> float:
+    """ms/frame medi (dopo un batch di warm-up) con forward pass da batch_size frame."""
+    from .player_detection import _inference_batch
+
+    batch = (frames * (batch_size // len(frames) + 1))[:batch_size]
+    _inference_batch(predictor, batch)
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        _inference_batch(predictor, batch)
+    return 1000.0 * (time.perf_counter() - t0) / (repeats * batch_size)
+
+
+def benchmark_inference(
+    threads: Sequence[int],
+    batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES,
+    input_sizes: Sequence[int] = DEFAULT_INPUT_SIZES,
+    frames: Optional[List[np.ndarray]] = None,
+    repeats: int = 2,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+) -> List[dict]:
+    """
+    ms/frame per ogni combinazione thread × batch × lato input. Con il backend ONNX il lato è quello
+    del grafo esportato (gli altri non vengono provati). Solleva RuntimeError se il modello non si carica.
+    """
+    from .player_detection import create_player_detector, get_detection_backend
+
+    backend = get_detection_backend()
+    detector = create_player_detector(conf_thresh=0.2)
+    if not detector._init_predictor():
+        raise RuntimeError(detector.get_init_error() or "Modello di detection non disponibile")
+    predictor = detector._predictor
+    if backend == "onnx":
+        input_sizes = [int(predictor.test_size[0])]
+    frames = frames or _benchmark_frames(None, 4)
+    native = tuple(predictor.test_size)
+    combos = [(t, b, s) for t in threads for s in input_sizes for b in batch_sizes]
+    results = []
+    for i, (t, b, s) in enumerate(combos):
+        if progress_callback:
+            progress_callback(i, len(combos), f"Inference: {t} thread, batch {b}, input {s}")
+        _set_threads(detector, backend, t)
+        predictor = detector._predictor
+        if backend != "onnx":
+            predictor.test_size = (s, s)
+        ms = _time_inference(predictor, frames, b, repeats)
+        results.append({"threads": t, "batch_size": b, "input_size": s, "ms_per_frame": round(ms, 2)})
+    if backend != "onnx":
+        predictor.test_size = native
+    return results
+
+
+def predict_match_seconds(
+    ms_per_frame: float,
+    decode_fps: Optional[float],
+    target_fps: float = 10.0,
+    video_fps: float = 25.0,
+    duration_s: float = MATCH_DURATION_S,
+) -> float:
+    """
+    Stima della detection su duration_s secondi di video: con la pipeline threaded decode e inference
+    si sovrappongono, quindi conta lo stadio più lento (la decodifica legge tutti i frame del video).
+    """
+    inference_s = duration_s * target_fps * ms_per_frame / 1000.0
+    decode_s = duration_s * video_fps / decode_fps if decode_fps else 0.0
+    return max(inference_s, decode_s)
+
+
+def choose_settings(
+    results: List[dict],
+    decode_fps: Optional[float],
+    ram_available_gb: float = 0.0,
+    target_fps: float = 10.0,
+    video_fps: float = 25.0,
+) -> dict:
+    """
+    Impostazioni più veloci: lato input più grande misurato (nativo) salvo stima oltre MAX_MATCH_TIME_S,
+    poi la combinazione thread/batch con meno ms/frame tra i batch compatibili con la RAM disponibile.
+    """
+    if not results:
+        return {}
+    max_batch = None
+    if ram_available_gb > 0:
+        max_batch = max(1, int(ram_available_gb * 1024 * 0.25 // BATCH_FRAME_RAM_MB))
+    usable = [r for r in results if max_batch is None or r["batch_size"] <= max_batch] or results
+    best = None
+    for size in sorted({r["input_size"] for r in usable}, reverse=True):
+        best = min((r for r in usable if r["input_size"] == size), key=lambda r: r["ms_per_frame"])
+        if predict_match_seconds(best["ms_per_frame"], decode_fps, target_fps, video_fps) <= MAX_MATCH_TIME_S:
+            break
+    return {
+        "threads": best["threads"],
+        "batch_size": best["batch_size"],
+        "input_size": best["input_size"],
+        "ms_per_frame": best["ms_per_frame"],
+    }
+
+
+def _machine_info() -> dict:
+    return {"cpu_count": os.cpu_count() or 1, "platform": platform.platform(), "processor": platform.processor()}
+
+
+def _model_info() -> dict:
+    from .player_detection import get_detection_backend, get_detection_model_path
+
+    backend = get_detection_backend()
+    path = get_detection_model_path(backend)
+    return {
+        "backend": backend or "torch",
+        "model": path.name if path else None,
+        "model_size": path.stat().st_size if path else None,
+    }
+
+
+def run_benchmark(
+    video_path: Optional[str] = None,
+    target_fps: float = 10.0,
+    threads: Optional[Sequence[int]] = None,
+    batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES,
+    input_sizes: Sequence[int] = DEFAULT_INPUT_SIZES,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+) -> dict:
+    """Esegue il micro-benchmark e ritorna il profilo (vedi save_profile / load_profile)."""
+    decode = benchmark_decode(video_path) or {}
+    ram = get_ram_info()
+    results = benchmark_inference(
+        threads or thread_candidates(),
+        batch_sizes,
+        input_sizes,
+        frames=_benchmark_frames(video_path, 4),
+        progress_callback=progress_callback,
+    )
+    video_fps = decode.get("video_fps") or 25.0
+    recommended = choose_settings(results, decode.get("decode_fps"), ram["ram_available_gb"], target_fps, video_fps)
+    return {
+        "version": PROFILE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": _machine_info(),
+        **_model_info(),
+        **ram,
+        "decode": decode or None,
+        "target_fps": target_fps,
+        "inference": results,
+        "recommended": recommended,
+        "predicted_match_s": round(predict_match_seconds(
+            recommended["ms_per_frame"], decode.get("decode_fps"), target_fps, video_fps,
+        )) if recommended else None,
+    }
+
+
+def save_profile(profile: dict, path: Optional[str] = None) -> Path:
+    from .config import get_hardware_profile_path
+
+    out = Path(path) if path else get_hardware_profile_path()
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    return out
+
+
+def load_profile(path: Optional[str] = None) -> Optional[dict]:
+    """
+    Profilo salvato se ancora valido per questa macchina e questo modello (stessa versione, numero di core,
+    backend e file del modello), altrimenti None.
+    """
+    from .config import get_hardware_profile_path
+
+    src = Path(path) if path else get_hardware_profile_path()
+    try:
+        with open(src, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if profile.get("version") != PROFILE_VERSION or not profile.get("recommended"):
+        return None
+    if profile.get("machine", {}).get("cpu_count") != (os.cpu_count() or 1):
+        return None
+    model = _model_info()
+    if any(profile.get(k) != v for k, v in model.items()):
+        return None
+    return profile
+
+
+def profile_engine_args(profile: Optional[dict]) -> List[str]:
+    """Argomenti di analysis_engine.py per le impostazioni consigliate dal profilo ([] senza profilo)."""
+    rec = (profile or {}).get("recommended") or {}
+    args = []
+    for flag, key in (("--threads", "threads"), ("--batch-size", "batch_size"), ("--input-size", "input_size")):
+        if rec.get(key):
+            args += [flag, str(rec[key])]
+    return args
+
+
+def format_profile(profile: dict) -> str:
+    """Riepilogo leggibile del profilo con la stima per una partita da 90 minuti."""
+    rec = profile.get("recommended") or {}
+    decode = profile.get("decode") or {}
+    lines = [
+        f"Profilo hardware ({profile.get('created', '?')})",
+        f"  CPU: {profile.get('machine', {}).get('cpu_count')} core - {profile.get('machine', {}).get('processor') or profile.get('machine', {}).get('platform')}",
+        f"  RAM: {profile.get('ram_gb')} GB (disponibile {profile.get('ram_available_gb')} GB)",
+        f"  Backend: {profile.get('backend')} ({profile.get('model')})",
+        f"  Decodifica: {decode.get('decode_fps', 'n/d')} fps" + (f" su {decode['frame_size'][0]}x{decode['frame_size'][1]}" if decode.get("frame_size") else ""),
+        "  Inference (ms/frame):",
+    ]
+    for r in sorted(profile.get("inference", []), key=lambda r: r["ms_per_frame"]):
+        lines.append(f"    {r['threads']:>3} thread  batch {r['batch_size']:>2}  input {r['input_size']}: {r['ms_per_frame']:.1f}")
+    lines.append(
+        f"  Consigliato: {rec.get('threads')} thread, batch {rec.get('batch_size')}, input {rec.get('input_size')}"
+        f" ({rec.get('ms_per_frame')} ms/frame)"
+    )
+    predicted = profile.get("predicted_match_s")
+    if predicted is not None:
+        h, m = divmod(int(predicted) // 60, 60)
+        lines.append(f"  Stima partita 90 min a {profile.get('target_fps')} fps: {h} h {m:02d} min")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Profilo hardware per l'analysis engine (micro-benchmark)")
+    parser.add_argument("--video", type=str, default=None, help="Video per misurare la decodifica e usare frame reali")
+    parser.add_argument("--fps", type=float, default=10.0, help="FPS di campionamento per la stima (default: 10)")
+    parser.add_argument("--refresh", action="store_true", help="Ripete il benchmark anche se il profilo esiste")
+    parser.add_argument("--profile", type=str, default=None, help="File del profilo (default: cartella utente)")
+    args = parser.parse_args()
+
+    profile = None if args.refresh else load_profile(args.profile)
+    if profile is None:
+        def on_progress(cur: int, total: int, msg: str):
+            print(f"[{cur + 1}/{total}] {msg}", flush=True)
+        try:
+            profile = run_benchmark(args.video, target_fps=args.fps, progress_callback=on_progress)
+        except RuntimeError as e:
+            print(f"Errore: {e}")
+            return 1
+        print(f"Profilo salvato: {save_profile(profile, args.profile)}")
+    print(format_profile(profile))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -10,7 +10,11 @@ Uso:
   cal = get_calibrator(calibration_path)
   if cal:
       mx, my = cal.pixel_to_field(px, py)
+      field_pts, valid = cal.pixel_to_field_batch(points)   # N punti in una chiamata
+
+Le coordinate campo dei track di un progetto si leggono già proiettate da field_coords.load_field_coords.
 """
+import hashlib
 from pathlib import Path
 from typing import Optional
 
@@ -18,6 +22,8 @@ from .field_calibration import FieldCalibrator
 
 # Cache per path → calibrator (evita rilettura file ripetuta)
 _calibrator_cache: dict = {}
+# Cache per path → hash del file di calibrazione
+_hash_cache: dict = {}
 
 
 def get_calibrator(calibration_path: Optional[str]) -> Optional[FieldCalibrator]:
@@ -43,14 +49,39 @@ def get_calibrator(calibration_path: Optional[str]) -> Optional[FieldCalibrator]
     return cal
 
 
+def calibration_hash(calibration_path: Optional[str]) -> Optional[str]:
+    """
+    SHA-1 del contenuto di field_calibration.json (chiave delle coordinate campo proiettate, vedi
+    field_coords). In cache come il calibrator: invalidata da clear_calibrator_cache.
+    """
+    if not calibration_path:
+        return None
+    path = Path(calibration_path).resolve()
+    key = str(path)
+    if key not in _hash_cache:
+        try:
+            _hash_cache[key] = hashlib.sha1(path.read_bytes()).hexdigest()
+        except OSError:
+            return None
+    return _hash_cache[key]
+
+
 def clear_calibrator_cache(calibration_path: Optional[str] = None):
     """
     Invalida la cache. Se calibration_path è None, svuota tutta la cache.
-    Utile dopo aver riscritto field_calibration.json dalla UI.
+    Utile dopo aver riscritto field_calibration.json dalla UI: con calibration_path rimuove anche le
+    coordinate campo proiettate del progetto (detections/field_coords.npz accanto al file).
     """
     global _calibrator_cache
     if calibration_path is None:
         _calibrator_cache.clear()
+        _hash_cache.clear()
         return
     key = str(Path(calibration_path).resolve())
     _calibrator_cache.pop(key, None)
+    _hash_cache.pop(key, None)
+    from .field_coords import FIELD_COORDS_FILE
+    try:
+        (Path(key).parent / "detections" / FIELD_COORDS_FILE).unlink()
+    except OSError:
+        pass
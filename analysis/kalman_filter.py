@@ -0,0 +1,91 @@
+"""
+Filtro di Kalman a velocità costante per i box del tracking, in blocco su tutti i track.
+
+Stato per track: (cx, cy, w, h, vcx, vcy, vw, vh), velocità in pixel per frame video; misura: (cx, cy, w, h).
+Rumore di processo e di misura proporzionali alla dimensione del box (come ByteTrack / DeepSORT), così
+la stessa taratura vale per giocatori vicini e lontani dalla camera. Il tempo è in frame video e il
+rumore di processo cresce con sqrt(dt): la taratura non dipende da frame_step / target_fps.
+Tutte le funzioni lavorano su array: mean (N, 8), cov (N, 8, 8).
+"""
+from typing import Tuple, Union
+
+import numpy as np
+
+_STD_POSITION = 1.0 / 20
+_STD_VELOCITY = 1.0 / 160
+
+_H = np.hstack([np.eye(4), np.zeros((4, 4))])
+
+
+def _scale(mean: np.ndarray) -> np.ndarray:
+    """Scala per dimensione: (h, h, w, h) per ogni box. (N, 4)."""
+    w, h = np.maximum(mean[:, 2], 1.0), np.maximum(mean[:, 3], 1.0)
+    return np.stack([h, h, w, h], axis=1)
+
+
+def xywh_to_measurement(xywh: np.ndarray) -> np.ndarray:
+    """(N, 4) x, y, w, h → (N, 4) cx, cy, w, h."""
+    xywh = np.asarray(xywh, dtype=np.float64).reshape(-1, 4)
+    return np.concatenate([xywh[:, :2] + xywh[:, 2:] / 2, xywh[:, 2:]], axis=1)
+
+
+def state_to_xywh(mean: np.ndarray) -> np.ndarray:
+    """Box previsti (N, 4) x, y, w, h dallo stato (N, 8)."""
+    wh = np.maximum(mean[:, 2:4], 1.0)
+    return np.concatenate([mean[:, :2] - wh / 2, wh], axis=1)
+
+
+def position_std(cov: np.ndarray) -> np.ndarray:
+    """Deviazione standard del centro (sx, sy) per ogni track: (N, 2)."""
+    return np.sqrt(np.stack([cov[:, 0, 0], cov[:, 1, 1]], axis=1))
+
+
+def initiate(xywh: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Stato iniziale dai primi box (velocità nulla, incertezza alta sulla velocità)."""
+    z = xywh_to_measurement(xywh)
+    mean = np.concatenate([z, np.zeros_like(z)], axis=1)
+    s = _scale(mean)
+    std = np.concatenate([2 * _STD_POSITION * s, 10 * _STD_VELOCITY * s], axis=1)
+    cov = np.zeros((len(z), 8, 8))
+    idx = np.arange(8)
+    cov[:, idx, idx] = std ** 2
+    return mean, cov
+
+
+def predict(mean: np.ndarray, cov: np.ndarray, dt: Union[float, np.ndarray] = 1.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Predizione a velocità costante di dt frame video (scalare o (N,), es. distanza tra due campioni
+    consecutivi). Ritorna nuovi (mean, cov).
+    """
+    n = len(mean)
+    if n == 0:
+        return mean, cov
+    dt = np.broadcast_to(np.asarray(dt, dtype=np.float64), (n,))
+    F = np.tile(np.eye(8), (n, 1, 1))
+    F[:, np.arange(4), np.arange(4) + 4] = dt[:, None]
+    s = _scale(mean)
+    std = np.concatenate([_STD_POSITION * s, _STD_VELOCITY * s], axis=1) * np.sqrt(dt)[:, None]
+    Q = np.zeros((n, 8, 8))
+    idx = np.arange(8)
+    Q[:, idx, idx] = std ** 2
+    mean = np.einsum("nij,nj->ni", F, mean)
+    cov = F @ cov @ F.transpose(0, 2, 1) + Q
+    return mean, cov
+
+
+def update(mean: np.ndarray, cov: np.ndarray, xywh: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Correzione con i box associati (N, 4) x, y, w, h. Ritorna nuovi (mean, cov)."""
+    if len(mean) == 0:
+        return mean, cov
+    z = xywh_to_measurement(xywh)
+    std = _STD_POSITION * _scale(mean)
+    R = np.zeros((len(mean), 4, 4))
+    idx = np.arange(4)
+    R[:, idx, idx] = std ** 2
+    PHt = cov @ _H.T                      # (N, 8, 4)
+    S = _H @ PHt + R                      # (N, 4, 4)
+    K = np.linalg.solve(S, PHt.transpose(0, 2, 1)).transpose(0, 2, 1)  # (N, 8, 4)
+    innovation = z - mean[:, :4]
+    mean = mean + np.einsum("nij,nj->ni", K, innovation)
+    cov = cov - K @ S @ K.transpose(0, 2, 1)
+    return mean, cov
@@ -8,16 +8,14 @@ from __future__ import annotations
 import json
 import math
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
 
 from .event_engine_params import get_params
+from .field_coords import FieldCoords, load_field_coords
 from .homography import get_calibrator
-
-
-def _player_center(d: Dict) -> Tuple[float, float]:
-    x, y = d["x"], d["y"]
-    w, h = d.get("w", 0), d.get("h", 0)
-    return (x + w / 2, y + h / 2)
+from .track_store import TrackStore, load_player_tracks
 
 
 def _dist_m(ax: float, ay: float, bx: float, by: float) -> float:
@@ -38,35 +36,31 @@ def _cell_index(x_m: float, y_m: float) -> Tuple[int, int]:
 
 
 def _build_trajectories_m(
-    player_tracks: Dict,
+    player_tracks: TrackStore,
     calibrator: Optional[Any],
     width: int,
     height: int,
     scale: float,
+    field_coords: Optional[FieldCoords] = None,
 ) -> Dict[int, List[Tuple[int, float, float]]]:
     """
     Ritorna track_id -> lista (frame_idx, x_m, y_m) per ogni frame in cui il giocatore è presente.
+    field_coords: coordinate campo già proiettate (load_field_coords); se None proietta con calibrator.
     """
     field_l = get_params().get("field", {}).get("length_m", FIELD_LENGTH_M)
     field_w = get_params().get("field", {}).get("width_m", FIELD_WIDTH_M)
     scale_use = scale if scale > 0 else field_l / width if width else 0.05
     trajectories: Dict[int, List[Tuple[int, float, float]]] = {}
-    for f in player_tracks.get("frames", []):
-        frame_idx = f.get("frame", 0)
-        for d in f.get("detections", []):
-            tid = d.get("track_id", -1)
-            cx, cy = _player_center(d)
-            if calibrator:
-                pt_m = calibrator.pixel_to_field(cx, cy)
-                if pt_m:
-                    x_m, y_m = pt_m[0], pt_m[1]
-                else:
-                    x_m, y_m = cx * scale_use, cy * scale_use
-            else:
-                x_m, y_m = cx * scale_use, cy * scale_use
-            if tid not in trajectories:
-                trajectories[tid] = []
-            trajectories[tid].append((frame_idx, x_m, y_m))
+    frames = player_tracks["frame"].tolist()
+    tids = player_tracks["track_id"].tolist()
+    if field_coords is None:
+        field_coords = FieldCoords.compute(player_tracks, {}, calibrator)
+    pts_m = field_coords.players(scale_use)
+    xs, ys = pts_m[:, 0].tolist(), pts_m[:, 1].tolist()
+    for r, tid in enumerate(tids):
+        if tid not in trajectories:
+            trajectories[tid] = []
+        trajectories[tid].append((frames[r], xs[r], ys[r]))
     return trajectories
 
 
@@ -118,17 +112,21 @@ def _zones_pct(positions: List[Tuple[int, float, float]]) -> Dict[str, float]:
 
 
 def compute_metrics(
-    player_tracks: Dict[str, Any],
+    player_tracks: Union[TrackStore, Dict[str, Any]],
     ball_tracks: Dict[str, Any],
     events_result: Dict[str, Any],
     calibration_path: Optional[str] = None,
     fps: float = 10.0,
+    field_coords: Optional[FieldCoords] = None,
 ) -> Dict[str, Any]:
     """
-    Calcola metriche per giocatore e per squadra.
+    Calcola metriche per giocatore e per squadra. player_tracks: TrackStore o dict di player_tracks.json.
     events_result: output di event_engine (possession_segments, automatic).
+    field_coords: coordinate campo del progetto (load_field_coords); se None proietta con calibration_path.
     Ritorna { "players": [...], "teams": [...] } nel formato schema Step 0.1.
     """
+    if not isinstance(player_tracks, TrackStore):
+        player_tracks = TrackStore.from_json(player_tracks)
     params = get_params()
     field = params.get("field", {})
     field_l = field.get("length_m", FIELD_LENGTH_M)
@@ -136,23 +134,24 @@ def compute_metrics(
     width = player_tracks.get("width") or ball_tracks.get("width") or 1280
     height = player_tracks.get("height") or ball_tracks.get("height") or 720
     scale = field_l / width if width else 0.05
-    calibrator = get_calibrator(calibration_path) if calibration_path else None
+    calibrator = get_calibrator(calibration_path) if calibration_path and field_coords is None else None
 
     possession_segments = events_result.get("possession_segments", [])
     automatic = events_result.get("automatic", [])
 
-    trajectories = _build_trajectories_m(player_tracks, calibrator, width, height, scale)
+    trajectories = _build_trajectories_m(player_tracks, calibrator, width, height, scale, field_coords)
 
     # Set di track_id con team (da segmenti o da trajectory con team dal primo frame)
     track_team: Dict[int, int] = {}
     for seg in possession_segments:
         track_team[seg["track_id"]] = seg["team"]
-    pt_frames = {f["frame"]: f for f in player_tracks.get("frames", [])}
-    for frame_idx, f in sorted(pt_frames.items()):
-        for d in f.get("detections", []):
-            tid = d.get("track_id", -1)
-            if tid not in track_team:
-                track_team[tid] = d.get("team", -1)
+    order = np.argsort(player_tracks["frame"], kind="stable")
+    tids_sorted = player_tracks["track_id"][order]
+    _, first = np.unique(tids_sorted, return_index=True)
+    first.sort()
+    for tid, team in zip(tids_sorted[first].tolist(), player_tracks["team"][order][first].tolist()):
+        if tid not in track_team:
+            track_team[tid] = team
 
     # --- Per giocatore ---
     pass_events = [e for e in automatic if e.get("type") == "pass"]
@@ -283,12 +282,11 @@ def run_metrics_from_project(
     cal_path = get_calibration_path(project_analysis_dir)
     events_path = detections_dir / "events_engine.json"
 
-    if not pt_path.exists() or not bt_path.exists():
+    if not bt_path.exists() or not events_path.exists():
         return False
-    if not events_path.exists():
+    player_tracks = load_player_tracks(pt_path)
+    if player_tracks is None:
         return False
-    with open(pt_path, "r", encoding="utf-8") as f:
-        player_tracks = json.load(f)
     with open(bt_path, "r", encoding="utf-8") as f:
         ball_tracks = json.load(f)
     with open(events_path, "r", encoding="utf-8") as f:
@@ -305,6 +303,7 @@ def run_metrics_from_project(
         events_result,
         calibration_path=str(cal_path) if cal_path.exists() else None,
         fps=fps_use,
+        field_coords=load_field_coords(project_analysis_dir, player_tracks, ball_tracks),
     )
     if progress_callback:
         progress_callback(1, 1, "Metriche completate.")
@@ -0,0 +1,330 @@
+"""
+Indice per frame dell'overlay di tracking (video widget, tactical board, heatmap).
+
+Per ogni sorgente (player, ball) un file di record a larghezza fissa e una tabella frame → offset,
+aperti in memory-map: il widget legge solo le righe del frame mostrato, senza parse né dict, e la
+memoria residente non cresce con la durata della partita.
+
+  detections/overlay/{stem}_records.npy   record RECORD_DTYPE (x, y, w, h, x_m, y_m, track_id, team, role)
+  detections/overlay/{stem}_offsets.npy   (F + 1,) righe del frame i = [offsets[i], offsets[i + 1])
+  detections/overlay/{stem}_video_frame.npy  (F,) frame video per campione, solo con campionamento adattivo
+  detections/overlay/meta.json            width, height, fps per sorgente + firma del JSON d'origine
+
+L'indice si costruisce una volta per analisi (load_overlay_index) e si ricostruisce quando
+player_tracks.json / ball_tracks.json o la mappa squadre (player_tracks.teams.json) cambiano (firma
+mtime + dimensione), o cambia la calibrazione (hash, come la chiave di field_coords.npz da cui vengono
+x_m / y_m). stem contiene la firma:
+un nuovo indice non sovrascrive i file ancora mappati dal widget (bloccati su Windows); le versioni
+vecchie vengono rimosse quando possibile.
+"""
+import json
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .field_coords import FieldCoords, field_coords_key, load_field_coords
+from .track_store import ROLE_NAMES, TrackStore, file_signature, load_player_tracks, team_overlay_path
+
+OVERLAY_DIR = "overlay"
+OVERLAY_KINDS = ("player", "ball")
+OVERLAY_FORMAT = 2  # 2: video_frame per campione (campionamento adattivo)
+
+RECORD_DTYPE = np.dtype([
+    ("x", "<f4"), ("y", "<f4"), ("w", "<f4"), ("h", "<f4"),
+    ("x_m", "<f4"), ("y_m", "<f4"),
+    ("track_id", "<i4"), ("team", "i1"), ("role", "i1"),
+])
+
+
+class OverlayIndex:
+    """
+    Record di overlay di una sorgente. records / offsets possono essere np.memmap (da file) o array
+    in memoria (da payload cloud). meta: width, height, fps (e sampling con campionamento adattivo),
+    leggibili con get() come sul dict JSON. video_frame: (F,) frame video di ogni campione con
+    campionamento adattivo (-1 = assente), None con passo fisso.
+    """
+
+    def __init__(self, kind: str, records: np.ndarray, offsets: np.ndarray, meta: dict,
+                 video_frame: Optional[np.ndarray] = None):
+        self.kind = kind
+        self.records = records
+        self.offsets = offsets
+        self.meta = meta
+        self.video_frame = video_frame
+        self._times: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get(self, key: str, default=None):
+        return self.meta.get(key, default)
+
+    def frame(self, i: int) -> np.ndarray:
+        """Record del frame in posizione i (vista, nessuna copia)."""
+        return self.records[int(self.offsets[i]):int(self.offsets[i + 1])]
+
+    def has_detections(self) -> bool:
+        return len(self.records) > 0
+
+    def frame_at(self, pos_ms: float, duration_ms: float = 0) -> int:
+        """
+        Campione da mostrare alla posizione pos_ms del video (-1 se l'indice è vuoto).
+        Con campionamento adattivo i campioni non sono equispaziati: ultimo campione con tempo
+        video_frame * 1000 / fps <= pos_ms (searchsorted). Con passo fisso rapporto pos / durata
+        (display e analisi possono avere FPS diversi se uno è preprocessato), o pos * fps senza durata.
+        """
+        n = len(self)
+        if n == 0:
+            return -1
+        times, rows = self._sample_times()
+        if len(rows):
+            k = int(np.searchsorted(times, pos_ms, side="right")) - 1
+            return int(rows[max(0, k)])
+        if duration_ms and duration_ms > 0:
+            ratio = min(1.0, max(0.0, pos_ms / duration_ms))
+            return min(n - 1, int(ratio * n))
+        idx = int(round(pos_ms * float(self.get("fps") or 25.0) / 1000))
+        return max(0, min(n - 1, idx))
+
+    def sample_range(self, start_ms: float, end_ms: float, duration_ms: float = 0) -> Tuple[int, int]:
+        """
+        Campioni [start, end) con tempo video in [start_ms, end_ms], con la stessa corrispondenza
+        tempo ↔ campione di frame_at (video_frame con campionamento adattivo, altrimenti passo fisso).
+        """
+        n = len(self)
+        times, rows = self._sample_times()
+        if len(rows):
+            a = int(np.searchsorted(times, start_ms, side="left"))
+            b = int(np.searchsorted(times, end_ms, side="right"))
+            if a >= b:
+                return (0, 0)
+            return (int(rows[a]), int(rows[b - 1]) + 1)
+        if n == 0:
+            return (0, 0)
+        if duration_ms and duration_ms > 0:
+            ms_per_sample = duration_ms / n
+        else:
+            ms_per_sample = 1000.0 / float(self.get("fps") or 25.0)
+        start = max(0, int(np.ceil(start_ms / ms_per_sample)))
+        end = min(n, int(np.floor(end_ms / ms_per_sample)) + 1)
+        return (start, max(start, end))
+
+    def _sample_times(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(tempi in ms, righe) dei campioni con video_frame; vuoti con passo fisso."""
+        if self._times is None:
+            if self.video_frame is None:
+                self._times = (np.zeros(0), np.zeros(0, dtype=np.int64))
+            else:
+                rows = np.flatnonzero(np.asarray(self.video_frame) >= 0)
+                fps = float(self.get("fps") or 25.0)
+                self._times = (np.asarray(self.video_frame)[rows] * 1000.0 / fps, rows)
+        return self._times
+
+    @staticmethod
+    def _meta(data) -> dict:
+        meta = {k: data.get(k) for k in ("width", "height", "fps")}
+        if data.get("sampling"):
+            meta["sampling"] = data.get("sampling")
+        return meta
+
+    @classmethod
+    def from_store(cls, store: TrackStore, field_coords: Optional[FieldCoords] = None) -> "OverlayIndex":
+        """
+        Indice player dalle colonne dell'archivio track (nessun passaggio per dict). x_m / y_m dalle
+        coordinate campo del progetto dove proiettate, altrimenti dalle colonne dei track (se presenti).
+        """
+        records = np.zeros(len(store), dtype=RECORD_DTYPE)
+        for k in ("x", "y", "w", "h", "track_id", "team", "role"):
+            records[k] = store[k]
+        for k in ("x_m", "y_m"):
+            records[k] = store[k] if store.has(k) else np.nan
+        if field_coords is not None and len(field_coords.player_m) == len(store):
+            valid = ~np.isnan(field_coords.player_m[:, 0])
+            records["x_m"][valid] = field_coords.player_m[valid, 0]
+            records["y_m"][valid] = field_coords.player_m[valid, 1]
+        video_frame = store.frame_fields.get("video_frame") if store.get("sampling") else None
+        return cls("player", records, store.frame_offsets.copy(), cls._meta(store),
+                   None if video_frame is None else video_frame.astype(np.int64))
+
+    @classmethod
+    def from_player_tracks(cls, data: dict) -> "OverlayIndex":
+        return cls.from_store(TrackStore.from_json(data))
+
+    @classmethod
+    def from_ball_tracks(cls, data: dict, field_coords: Optional[FieldCoords] = None) -> "OverlayIndex":
+        """
+        Indice ball: al più una detection per frame ("detection", o la prima di "detections").
+        x_m / y_m dalle coordinate campo del progetto dove proiettate (per campo "frame").
+        """
+        frames = data.get("frames", [])
+        dets = []
+        for fd in frames:
+            det = fd.get("detection")
+            if not isinstance(det, dict):
+                det = (fd.get("detections") or [None])[0]
+            dets.append(det if isinstance(det, dict) and det else None)
+        present = [d for d in dets if d is not None]
+        records = np.zeros(len(present), dtype=RECORD_DTYPE)
+        for k in ("x", "y", "w", "h"):
+            records[k] = [d.get(k, 0) for d in present]
+        for k in ("x_m", "y_m"):
+            records[k] = [d.get(k, np.nan) for d in present]
+        if field_coords is not None and len(field_coords.ball_frame):
+            ball_m = dict(zip(field_coords.ball_frame.tolist(), field_coords.ball_m.tolist()))
+            present_frames = [fd.get("frame") for fd, d in zip(frames, dets) if d is not None]
+            for r, f in enumerate(present_frames):
+                pt = ball_m.get(f)
+                if pt is not None and pt[0] == pt[0]:  # NaN: proiezione non valida
+                    records["x_m"][r], records["y_m"][r] = pt
+        records["track_id"] = [-1 if d.get("track_id") is None else d["track_id"] for d in present]
+        records["team"] = -1
+        records["role"] = ROLE_NAMES.index("ball")
+        offsets = np.zeros(len(frames) + 1, dtype=np.int64)
+        np.cumsum([d is not None for d in dets], out=offsets[1:])
+        video_frame = None
+        if data.get("sampling"):
+            video_frame = np.array([-1 if fd.get("video_frame") is None else fd["video_frame"] for fd in frames],
+                                   dtype=np.int64)
+        return cls("ball", records, offsets, cls._meta(data), video_frame)
+
+    def to_json(self, start: int = 0, end: Optional[int] = None) -> dict:
+        """
+        Dict nel formato di player_tracks.json / ball_tracks.json con i soli campi dell'overlay, per i
+        campioni [start, end) (default tutti): "frame" resta l'indice del campione nell'indice intero.
+        Si leggono solo i record della finestra (tactical board e heatmap JS chiedono finestre).
+        """
+        n = len(self)
+        start = max(0, min(n, int(start)))
+        end = n if end is None else max(start, min(n, int(end)))
+        offsets = self.offsets[start:end + 1].tolist()
+        base = offsets[0]
+        recs = self.records[base:offsets[-1]]
+        cols = {k: recs[k].tolist() for k in ("x", "y", "w", "h", "track_id", "team", "role")}
+        has_m = (~np.isnan(recs["x_m"])).tolist()
+        x_m = np.round(recs["x_m"].astype(np.float64), 2).tolist()
+        y_m = np.round(recs["y_m"].astype(np.float64), 2).tolist()
+        frames = []
+        video_frame = self.video_frame[start:end].tolist() if self.video_frame is not None else None
+        for j, i in enumerate(range(start, end)):
+            dets = []
+            for r in range(offsets[j] - base, offsets[j + 1] - base):
+                d = {k: cols[k][r] for k in ("x", "y", "w", "h", "team", "track_id")}
+                if cols["role"][r] >= 0:
+                    d["role"] = ROLE_NAMES[cols["role"][r]]
+                if has_m[r]:
+                    d["x_m"], d["y_m"] = x_m[r], y_m[r]
+                dets.append(d)
+            if self.kind == "ball":
+                fd = {"frame": i, "detection": dets[0] if dets else None}
+            else:
+                fd = {"frame": i, "detections": dets}
+            if video_frame is not None and video_frame[j] >= 0:
+                fd["video_frame"] = video_frame[j]  # campionamento adattivo: tempo del campione
+            frames.append(fd)
+        out = {"frames": frames}
+        out.update(self.meta)
+        return out
+
+    # --- file memory-mapped ---
+
+    def save(self, directory, stem: str) -> None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        arrays = [("records", self.records), ("offsets", self.offsets)]
+        if self.video_frame is not None:
+            arrays.append(("video_frame", self.video_frame))
+        for name, arr in arrays:
+            path = directory / f"{stem}_{name}.npy"
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, np.asarray(arr))
+            tmp.replace(path)
+
+    @classmethod
+    def open(cls, directory, stem: str, kind: str, meta: dict) -> "OverlayIndex":
+        directory = Path(directory)
+        records = np.load(directory / f"{stem}_records.npy", mmap_mode="r")
+        offsets = np.load(directory / f"{stem}_offsets.npy", mmap_mode="r")
+        if records.dtype != RECORD_DTYPE:
+            raise ValueError("overlay index: formato record non compatibile")
+        video_frame = None
+        if meta.get("sampling"):
+            video_frame = np.load(directory / f"{stem}_video_frame.npy", mmap_mode="r")
+        return cls(kind, records, offsets, meta, video_frame)
+
+
+def get_overlay_index_dir(project_analysis_dir: str) -> Path:
+    from .config import get_analysis_output_path
+    return get_analysis_output_path(project_analysis_dir) / "detections" / OVERLAY_DIR
+
+
+def _remove_stale(directory: Path, kind: str, stem: str) -> None:
+    """Rimuove le versioni precedenti dell'indice; quelle ancora mappate (Windows) restano al prossimo giro."""
+    for path in directory.glob(f"{kind}_*.npy"):
+        if not path.name.startswith(stem + "_"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def load_overlay_index(project_analysis_dir: str) -> Tuple[Optional[OverlayIndex], Optional[OverlayIndex]]:
+    """
+    (ball, player) per l'overlay del progetto, in memory-map. Ogni indice viene (ri)costruito solo se
+    manca o se il JSON d'origine (o mappa squadre / coordinate campo) è cambiato. None per le sorgenti assenti.
+    """
+    from .ball_tracking import get_ball_tracks_path
+    from .player_tracking import get_tracks_path
+
+    directory = get_overlay_index_dir(project_analysis_dir)
+    meta_path = directory / "meta.json"
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    sources = {"player": Path(get_tracks_path(project_analysis_dir)), "ball": Path(get_ball_tracks_path(project_analysis_dir))}
+    # x_m / y_m dalle coordinate campo: dipendono dai track (già nella firma) e dalla calibrazione.
+    # Qui solo l'hash della calibrazione (in cache); l'artefatto si legge / calcola solo per ricostruire.
+    calibration = field_coords_key(project_analysis_dir)["calibration"] or "0"
+    out = {}
+    changed = False
+    for kind in OVERLAY_KINDS:
+        signature = file_signature(sources[kind])
+        entry = meta.get(kind) or {}
+        if signature is None:
+            out[kind] = None
+            continue
+        if kind == "player":
+            # Squadre applicate al caricamento dei track: nuova mappa → nuovo indice
+            signature += file_signature(team_overlay_path(sources[kind])) or [0, 0]
+        signature += [calibration]
+        stem = "_".join([kind] + [str(v) for v in signature])
+        if entry.get("source") == signature and entry.get("format") == OVERLAY_FORMAT:
+            try:
+                out[kind] = OverlayIndex.open(directory, stem, kind, entry.get("meta") or {})
+                continue
+            except (OSError, ValueError):
+                pass
+        if kind == "player":
+            store = load_player_tracks(sources[kind])
+            field_coords = load_field_coords(project_analysis_dir, player_tracks=store) if store is not None else None
+            index = OverlayIndex.from_store(store, field_coords) if store is not None else None
+        else:
+            with open(sources[kind], "r", encoding="utf-8") as f:
+                data = json.load(f)
+            field_coords = load_field_coords(project_analysis_dir, ball_tracks=data)
+            index = OverlayIndex.from_ball_tracks(data, field_coords)
+        if index is None:
+            out[kind] = None
+            continue
+        index.save(directory, stem)
+        _remove_stale(directory, kind, stem)
+        meta[kind] = {"source": signature, "format": OVERLAY_FORMAT, "meta": index.meta}
+        changed = True
+        out[kind] = OverlayIndex.open(directory, stem, kind, index.meta)
+    if changed:
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+    return out["ball"], out["player"]
@@ -210,6 +210,32 @@ class PerFrameCalibrator:
 
         return (x_m, y_m)
 
+    def pixel_to_field_batch(self, points: np.ndarray,
+                             frame_idx=0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Come pixel_to_field su N punti (N, 2). frame_idx: scalare o (N,) per punto; una
+        perspectiveTransform per frame distinto, con la homography di get_homography (cache / fallback,
+        senza ricalcolo). Ritorna (coordinate campo (N, 2), valid (N,)); fuori campo o senza
+        homography → valid False, NaN.
+        """
+        pts = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        out = np.full((len(pts), 2), np.nan)
+        frames = np.broadcast_to(np.asarray(frame_idx), (len(pts),))
+        uniq, inverse = np.unique(frames, return_inverse=True)
+        for k, f in enumerate(uniq.tolist()):
+            H = self.get_homography(f)
+            if H is None:
+                continue
+            rows = np.flatnonzero(inverse == k)
+            out[rows] = cv2.perspectiveTransform(pts[rows].reshape(-1, 1, 2), H).reshape(-1, 2)
+        # Filtra coordinate fuori campo (con margine 10%)
+        x_m, y_m = out[:, 0], out[:, 1]
+        with np.errstate(invalid="ignore"):
+            valid = ((-self.field_w * 0.1 < x_m) & (x_m < self.field_w * 1.1)
+                     & (-self.field_h * 0.1 < y_m) & (y_m < self.field_h * 1.1))
+        out[~valid] = np.nan
+        return out, valid
+
     def get_confidence(self, frame_idx: int) -> float:
         """Ritorna il confidence score della calibrazione per il frame dato."""
         if frame_idx in self._cache:
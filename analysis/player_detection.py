@@ -4,13 +4,18 @@ Usa YOLOX-s custom addestrato su dataset calcio (8 classi).
 Richiede: pip install torch torchvision yolox
 """
 from pathlib import Path
-from typing import Callable, List, Optional, Tuple
+from typing import Callable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass, field
-import json
+import threading
 
 import cv2
 import numpy as np
 
+from .adaptive_sampling import AdaptiveFrameSampler, AdaptiveSampling
+from .checkpoint_log import CheckpointLog
+from .detection_pipeline import SampledFrame
+from .frame_sampler import FrameSampler, frame_step_for
+
 
 def _to_scalar(x) -> float:
     """Converte a scalare Python anche se x è un array numpy (evita WinError scalare)."""
@@ -52,6 +57,67 @@ class BoundingBox:
     role: str = "player" # "player", "goalie", "referee", "ball", "goal"
     team: int = -1  # 0 o 1 dopo team classification, -1 = non assegnato
     jersey_hsv: Optional[Tuple[float, float, float]] = None  # (h,s,v) per clustering globale
+    jersey_hist: Optional[List[int]] = None  # istogramma maglia compatto (team classification differita)
+
+
+# Lookup vettoriale class_id → squadra pre-assegnata (indice = class_id)
+_CLASS_TEAM_LUT = np.array([CLASS_TEAM.get(i, -1) for i in range(len(SOCCER_CLASSES))], dtype=np.int64)
+
+
+@dataclass
+class DetectionBatch:
+    """
+    Detection di un frame in forma colonnare (una riga per box).
+    Coordinate nello spazio dell'immagine passata al modello (crop se presente).
+    I BoundingBox vengono creati solo su richiesta (to_boxes).
+    """
+    xywh: np.ndarray      # (N, 4) float64: left, top, width, height
+    conf: np.ndarray      # (N,) float64: obj_conf * class_conf
+    class_id: np.ndarray  # (N,) int64
+    team: np.ndarray      # (N,) int64: da CLASS_TEAM, -1 = da classificare
+
+    @classmethod
+    def empty(cls) -> "DetectionBatch":
+        return cls(
+            xywh=np.zeros((0, 4), dtype=np.float64),
+            conf=np.zeros(0, dtype=np.float64),
+            class_id=np.zeros(0, dtype=np.int64),
+            team=np.zeros(0, dtype=np.int64),
+        )
+
+    def __len__(self) -> int:
+        return int(self.conf.shape[0])
+
+    def select(self, mask: np.ndarray) -> "DetectionBatch":
+        """Sottoinsieme per maschera booleana o array di indici."""
+        return DetectionBatch(self.xywh[mask], self.conf[mask], self.class_id[mask], self.team[mask])
+
+    def centers(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Centri box (cx, cy)."""
+        return self.xywh[:, 0] + self.xywh[:, 2] / 2, self.xywh[:, 1] + self.xywh[:, 3] / 2
+
+    def roles(self) -> List[str]:
+        return [CLASS_ROLE.get(c, "player") for c in self.class_id.tolist()]
+
+    def to_boxes(self) -> List[BoundingBox]:
+        return [
+            BoundingBox(x=x, y=y, w=w, h=h, confidence=c, class_id=k, role=r, team=t)
+            for (x, y, w, h), c, k, r, t in zip(
+                self.xywh.tolist(), self.conf.tolist(), self.class_id.tolist(), self.roles(), self.team.tolist()
+            )
+        ]
+
+    def to_json(self, dx: float = 0, dy: float = 0) -> List[dict]:
+        """Righe nel formato di player_detections.json (equivalente a _det_to_json su to_boxes())."""
+        return [
+            {
+                "x": x + float(dx), "y": y + float(dy), "w": w, "h": h,
+                "conf": c, "class_id": k, "role": r, "team": t,
+            }
+            for (x, y, w, h), c, k, r, t in zip(
+                self.xywh.tolist(), self.conf.tolist(), self.class_id.tolist(), self.roles(), self.team.tolist()
+            )
+        ]
 
 
 def get_models_dir() -> Path:
@@ -81,48 +147,84 @@ def _get_soccer_exp():
     exp.depth = 0.33
     exp.width = 0.50
     exp.num_classes = 8
+    from .config import INPUT_SIZE
+    if INPUT_SIZE > 0:
+        exp.test_size = (INPUT_SIZE, INPUT_SIZE)  # scelto dal profilo hardware o --input-size
     return exp
 
 
-def _detect_with_yolox(
-    frame: np.ndarray,
-    predictor,
+def _decode_yolox_output(
+    outputs,
+    img_info: dict,
     conf_thresh: float = 0.3,
-) -> List[BoundingBox]:
-    """Esegue detection con YOLOX Predictor su 8 classi soccer.
+) -> DetectionBatch:
+    """Decodifica vettoriale dell'output YOLOX (postprocess, righe x1,y1,x2,y2,obj,cls_conf,cls) di un frame.
     Usa img_info['ratio'] per mappare le coordinate dallo spazio preprocessato a quello del frame originale."""
-    outputs, img_info = predictor.inference(frame)
-    boxes = []
     if outputs is None or len(outputs) == 0:
-        return boxes
+        return DetectionBatch.empty()
     out0 = outputs[0]
     if out0 is None:
-        return boxes
+        return DetectionBatch.empty()
     ratio = float(img_info.get("ratio", 1.0)) or 1.0
-    out_arr = np.asarray(out0) if not isinstance(out0, np.ndarray) else out0
-    if out_arr.ndim == 1:
-        out_arr = out_arr.reshape(1, -1)
-    for i in range(len(out_arr)):
-        out = out_arr[i]
-        if len(out) < 7:
-            continue
-        x1 = _to_scalar(out[0]); y1 = _to_scalar(out[1]); x2 = _to_scalar(out[2]); y2 = _to_scalar(out[3])
-        obj_conf = _to_scalar(out[4])
-        class_conf = _to_scalar(out[5]) if len(out) > 5 else obj_conf
-        class_id = int(_to_scalar(out[6])) if len(out) > 6 else 0
-        conf = obj_conf * class_conf if len(out) > 6 else obj_conf
-        if conf < conf_thresh:
-            continue
-        x1, x2 = min(x1, x2), max(x1, x2)
-        y1, y2 = min(y1, y2), max(y1, y2)
-        w, h = x2 - x1, y2 - y1
-        if w <= 0 or h <= 0:
-            continue
-        x1, y1, w, h = x1 / ratio, y1 / ratio, w / ratio, h / ratio
-        role = CLASS_ROLE.get(class_id, "player")
-        team = CLASS_TEAM.get(class_id, -1)
-        boxes.append(BoundingBox(x=x1, y=y1, w=w, h=h, confidence=conf, class_id=class_id, role=role, team=team))
-    return boxes
+    arr = np.asarray(out0, dtype=np.float64)
+    if arr.ndim == 1:
+        arr = arr.reshape(1, -1)
+    if arr.shape[0] == 0 or arr.shape[1] < 7:
+        return DetectionBatch.empty()
+    conf = arr[:, 4] * arr[:, 5]
+    x1 = np.minimum(arr[:, 0], arr[:, 2])
+    x2 = np.maximum(arr[:, 0], arr[:, 2])
+    y1 = np.minimum(arr[:, 1], arr[:, 3])
+    y2 = np.maximum(arr[:, 1], arr[:, 3])
+    w = x2 - x1
+    h = y2 - y1
+    keep = ~(conf < conf_thresh) & ~(w <= 0) & ~(h <= 0)
+    class_id = arr[keep, 6].astype(np.int64)
+    in_lut = (class_id >= 0) & (class_id < len(_CLASS_TEAM_LUT))
+    team = np.full(class_id.shape, -1, dtype=np.int64)
+    team[in_lut] = _CLASS_TEAM_LUT[class_id[in_lut]]
+    xywh = np.stack([x1[keep] / ratio, y1[keep] / ratio, w[keep] / ratio, h[keep] / ratio], axis=1)
+    return DetectionBatch(xywh=xywh, conf=conf[keep], class_id=class_id, team=team)
+
+
+def _inference_batch(predictor, frames: List[np.ndarray]) -> List[Tuple[list, dict]]:
+    """
+    Inference batch con YOLOX Predictor: un solo forward pass per N frame.
+    Replica il preprocessing di Predictor.inference (letterbox su test_size, ratio per frame)
+    e ritorna per ogni frame (outputs, img_info) nello stesso formato di predictor.inference.
+    I frame possono avere dimensioni diverse: il letterbox porta tutti a test_size.
+    """
+    if not frames:
+        return []
+    if hasattr(predictor, "inference_batch"):
+        return predictor.inference_batch(frames)  # backend con batching nativo (es. ONNX Runtime)
+
+    import torch
+    from yolox.utils import postprocess
+
+    test_size = predictor.test_size
+    tensors = []
+    infos = []
+    for frame in frames:
+        h, w = frame.shape[:2]
+        ratio = min(test_size[0] / h, test_size[1] / w)
+        img, _ = predictor.preproc(frame, None, test_size)
+        tensors.append(img)
+        infos.append({"id": 0, "file_name": None, "height": h, "width": w, "raw_img": frame, "ratio": ratio})
+    batch = torch.from_numpy(np.ascontiguousarray(np.stack(tensors))).float()
+    if predictor.device == "gpu":
+        batch = batch.cuda()
+        if predictor.fp16:
+            batch = batch.half()
+    with torch.no_grad():
+        outputs = predictor.model(batch)
+        if predictor.decoder is not None:
+            outputs = predictor.decoder(outputs, dtype=outputs.type())
+        outputs = postprocess(
+            outputs, predictor.num_classes, predictor.confthre, predictor.nmsthre, class_agnostic=True
+        )
+    # postprocess ritorna una lista con un elemento (tensor o None) per immagine
+    return [([outputs[i]], infos[i]) for i in range(len(frames))]
 
 
 class PlayerDetector:
@@ -185,9 +287,62 @@ class PlayerDetector:
 
     def detect(self, frame: np.ndarray) -> List[BoundingBox]:
         """Rileva persone nel frame. frame: BGR (OpenCV)."""
+        return self.detect_columnar(frame).to_boxes()
+
+    def detect_columnar(self, frame: np.ndarray) -> DetectionBatch:
+        """Come detect, ma ritorna le detection in forma colonnare (DetectionBatch)."""
         if not self._init_predictor():
+            return DetectionBatch.empty()
+        outputs, img_info = self._predictor.inference(frame)
+        return _decode_yolox_output(outputs, img_info, self.conf_thresh)
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[List[BoundingBox]]:
+        """Rileva oggetti in N frame con un solo forward pass. Ritorna una lista di box per frame."""
+        return [b.to_boxes() for b in self.detect_batch_columnar(frames)]
+
+    def detect_batch_columnar(self, frames: List[np.ndarray]) -> List[DetectionBatch]:
+        """Come detect_batch, ma ritorna un DetectionBatch per frame."""
+        if not frames:
             return []
-        return _detect_with_yolox(frame, self._predictor, self.conf_thresh)
+        if not self._init_predictor():
+            return [DetectionBatch.empty() for _ in frames]
+        if len(frames) == 1:
+            return [self.detect_columnar(frames[0])]
+        return [
+            _decode_yolox_output(outputs, img_info, self.conf_thresh)
+            for outputs, img_info in _inference_batch(self._predictor, frames)
+        ]
+
+
+def get_detection_backend() -> Optional[str]:
+    """Backend configurato: "onnx" (anche con FOOTBALL_ANALYZER_ONNX_PRECISION=int8) o FOOTBALL_ANALYZER_DETECTION_BACKEND."""
+    from .config import DETECTION_BACKEND, ONNX_PRECISION
+    return "onnx" if ONNX_PRECISION == "int8" else DETECTION_BACKEND
+
+
+def get_detection_model_path(backend: Optional[str] = None) -> Optional[Path]:
+    """File del modello usato dal backend (checkpoint .pth o modello ONNX), None se assente."""
+    if backend is None:
+        backend = get_detection_backend()
+    if backend == "onnx":
+        from .detection_backends.onnx_runtime import get_onnx_model_path
+        path = get_onnx_model_path()
+        return path if path.exists() else None
+    return _get_soccer_checkpoint()
+
+
+def create_player_detector(conf_thresh: float = 0.5, device: str = "auto", backend: Optional[str] = None) -> PlayerDetector:
+    """
+    Crea il detector per il backend configurato (FOOTBALL_ANALYZER_DETECTION_BACKEND).
+    "onnx" (o FOOTBALL_ANALYZER_ONNX_PRECISION=int8) → OnnxPlayerDetector (ONNX Runtime CPU);
+    altrimenti PlayerDetector (PyTorch YOLOX).
+    """
+    if backend is None:
+        backend = get_detection_backend()
+    if backend == "onnx":
+        from .detection_backends.onnx_runtime import OnnxPlayerDetector
+        return OnnxPlayerDetector(conf_thresh=conf_thresh)
+    return PlayerDetector(conf_thresh=conf_thresh, device=device)
 
 
 def _filter_boxes_to_field(
@@ -230,31 +385,189 @@ def _filter_boxes_to_field(
     return out
 
 
-def _apply_field_crop(
-    frame: np.ndarray,
-    calibration_path: Optional[str],
-) -> Tuple[np.ndarray, Optional[Tuple[int, int, int, int]]]:
-    """
-    Ritaglia frame alla sola area campo se calibration_path valido.
-    Ritorna (frame_crop, (x0,y0,x1,y1)) con offset per mappare coords. Se no crop: (frame, None).
-    """
+def _load_field_bounds(calibration_path: Optional[str]) -> Optional[Tuple[float, float, float, float]]:
+    """Legge una volta i bounds campo (x0, y0, x1, y1) dal file calibrazione; None se assente/invalido."""
     if not calibration_path or not Path(calibration_path).exists():
-        return frame, None
+        return None
     try:
         from .field_calibration import FieldCalibrator
-        bounds = FieldCalibrator.get_field_bounds(Path(calibration_path))
-        if bounds is None:
-            return frame, None
-        h, w = frame.shape[:2]
-        x0 = max(0, int(bounds[0]))
-        y0 = max(0, int(bounds[1]))
-        x1 = min(w, int(bounds[2]))
-        y1 = min(h, int(bounds[3]))
-        if x1 <= x0 or y1 <= y0:
-            return frame, None
-        return frame[y0:y1, x0:x1].copy(), (x0, y0, x1, y1)
+        return FieldCalibrator.get_field_bounds(Path(calibration_path))
     except Exception:
+        return None
+
+
+def _filter_batch_to_field(
+    batch: DetectionBatch,
+    width: int,
+    height: int,
+    crop_bounds: Optional[Tuple[int, int, int, int]],
+) -> DetectionBatch:
+    """Versione vettoriale di _filter_boxes_to_field (stesse regole di zona campo)."""
+    if len(batch) == 0:
+        return batch
+    cx, cy = batch.centers()
+    if crop_bounds is not None:
+        x0, y0, x1, y1 = crop_bounds
+        cw, ch = x1 - x0, y1 - y0
+        mask = (cx >= 0) & (cx <= cw) & (cy >= 0) & (cy <= ch)
+    else:
+        margin_x = 0.08
+        margin_top = 0.12
+        margin_bottom = 0.05
+        mask = (
+            (cx >= width * margin_x) & (cx <= width * (1 - margin_x))
+            & (cy >= height * margin_top) & (cy <= height * (1 - margin_bottom))
+        )
+    return batch.select(mask)
+
+
+def _crop_to_bounds(
+    frame: np.ndarray,
+    bounds: Optional[Tuple[float, float, float, float]],
+) -> Tuple[np.ndarray, Optional[Tuple[int, int, int, int]]]:
+    """Ritaglia frame ai bounds campo (clippati al frame). Se bounds None/degeneri: (frame, None)."""
+    if bounds is None:
+        return frame, None
+    h, w = frame.shape[:2]
+    x0 = max(0, int(bounds[0]))
+    y0 = max(0, int(bounds[1]))
+    x1 = min(w, int(bounds[2]))
+    y1 = min(h, int(bounds[3]))
+    if x1 <= x0 or y1 <= y0:
         return frame, None
+    return frame[y0:y1, x0:x1].copy(), (x0, y0, x1, y1)
+
+
+def _iter_sampled_frames(
+    cap,
+    frame_step: int,
+    calibration_path: Optional[str],
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+    adaptive: Optional[AdaptiveSampling] = None,
+) -> Iterator[SampledFrame]:
+    """
+    Legge il video in [start_frame, end_frame) e produce solo i frame campionati (frame_idx % frame_step == 0),
+    già ritagliati. I frame scartati non vengono convertiti né ritagliati (FrameSampler: grab/retrieve).
+    adaptive: campionamento adattivo al movimento (analysis/adaptive_sampling.py); frame_step è ignorato
+    e ogni SampledFrame porta step/motion della decisione.
+    """
+    bounds = _load_field_bounds(calibration_path)
+    if adaptive is None:
+        for vf in FrameSampler(cap, step=frame_step, start_frame=start_frame, end_frame=end_frame):
+            image, crop = _crop_to_bounds(vf.image, bounds)
+            yield SampledFrame(vf.index, image, crop, (int(vf.image.shape[1]), int(vf.image.shape[0])))
+        return
+    video_fps = _to_scalar(cap.get(cv2.CAP_PROP_FPS)) or 25.0
+    for vf, step, motion in AdaptiveFrameSampler(cap, video_fps, adaptive, start_frame, end_frame):
+        image, crop = _crop_to_bounds(vf.image, bounds)
+        yield SampledFrame(vf.index, image, crop, (int(vf.image.shape[1]), int(vf.image.shape[0])), step, motion)
+
+
+def _sampling_fields(sf: SampledFrame) -> dict:
+    """Decisione di campionamento adattivo da salvare nella riga del frame ({} con passo fisso)."""
+    if sf.step is None:
+        return {}
+    return {"step": sf.step, "motion": sf.motion}
+
+
+def _progress_count(sf: SampledFrame, processed: int, frame_step: int, frame_range=None) -> int:
+    """
+    Frame da contare nel progress. Con passo fisso sono i frame processati; con campionamento
+    adattivo è la posizione nel video (in frame al passo base), perché i frame saltati non arrivano.
+    """
+    if sf.step is None:
+        return processed
+    return _sampled_count(sf.index + 1, frame_step, frame_range)
+
+
+def _make_infer_fn(detector: "PlayerDetector", batch_size: int) -> Callable[[List[np.ndarray]], List[DetectionBatch]]:
+    """Funzione di inference per la pipeline: forward batch se batch_size > 1, altrimenti frame per frame."""
+    if batch_size > 1:
+        return detector.detect_batch_columnar
+    return lambda frames: [detector.detect_columnar(f) for f in frames]
+
+
+def _set_frame_meta(results: dict, sf: SampledFrame, video_fps: float) -> None:
+    """Al frame 0 registra dimensioni, fps e crop_bounds nel JSON di output."""
+    if sf.index != 0:
+        return
+    results["width"], results["height"] = sf.full_size
+    results["fps"] = video_fps
+    if sf.crop_bounds is not None:
+        x0, y0, x1, y1 = sf.crop_bounds
+        results["crop_bounds"] = {"x0": x0, "y0": y0, "x1": x1, "y1": y1}
+
+
+def _det_to_json(b: BoundingBox, dx: float = 0, dy: float = 0) -> dict:
+    """Serializza un BoundingBox nel formato di player_detections.json (coords frame completo)."""
+    d = {
+        "x": float(b.x) + float(dx),
+        "y": float(b.y) + float(dy),
+        "w": float(b.w),
+        "h": float(b.h),
+        "conf": float(b.confidence),
+        "class_id": int(b.class_id),
+        "role": b.role,
+        "team": int(b.team),
+    }
+    if getattr(b, "jersey_hsv", None):
+        d["jersey_hsv"] = [float(x) for x in b.jersey_hsv]
+    if getattr(b, "jersey_hist", None):
+        d["jersey_hist"] = list(b.jersey_hist)
+    return d
+
+
+def _team_fn(classify_teams: bool, defer_teams: bool = False) -> Optional[Callable]:
+    """Funzione per frame sui BoundingBox: classify_teams, describe_jerseys (defer_teams) o None."""
+    if not classify_teams:
+        return None
+    try:
+        from .team_classifier import classify_teams as do_classify_teams, describe_jerseys
+    except ImportError:
+        return None
+    return describe_jerseys if defer_teams else do_classify_teams
+
+
+def _frame_detections_json(
+    batch: DetectionBatch,
+    frame_to_detect: np.ndarray,
+    bounds: Optional[Tuple[int, int, int, int]],
+    classify_fn: Optional[Callable] = None,
+) -> List[dict]:
+    """
+    Righe JSON del frame (coords frame completo). Con classify_fn e >= 2 box materializza i
+    BoundingBox per la team classification (che scrive team/jersey_hsv); altrimenti serializza
+    direttamente dalle colonne.
+    """
+    dx, dy = (bounds[0], bounds[1]) if bounds is not None else (0, 0)
+    if classify_fn and len(batch) >= 2:
+        boxes = batch.to_boxes()
+        classify_fn(frame_to_detect, boxes)
+        return [_det_to_json(b, dx, dy) for b in boxes]
+    return batch.to_json(dx, dy)
+
+
+def _sampled_count(total: int, frame_step: int, frame_range: Optional[Tuple[int, Optional[int]]] = None) -> int:
+    """Numero di frame campionati (indice multiplo di frame_step) nel video o nell'intervallo frame_range."""
+    if total <= 0:
+        return 0
+    first, end = frame_range or (0, None)
+    end = total if end is None else min(total, end)
+    first = ((max(0, first) + frame_step - 1) // frame_step) * frame_step
+    return max(0, (end - first + frame_step - 1) // frame_step)
+
+
+def _should_save_checkpoint(n: int, checkpoint_interval: int, first_checkpoint: int) -> bool:
+    """True se dopo n frame processati va scritto un checkpoint (primo a first_checkpoint, poi ogni interval)."""
+    return (
+        checkpoint_interval > 0
+        and n > 0
+        and (
+            n == first_checkpoint
+            or (n > first_checkpoint and (n - first_checkpoint) % checkpoint_interval == 0)
+        )
+    )
 
 
 def run_player_detection(
@@ -269,136 +582,116 @@ def run_player_detection(
     first_checkpoint: int = 500,
     start_frame: int = 0,
     initial_results: Optional[dict] = None,
+    batch_size: int = 1,
+    prefetch: int = 0,
+    cancel_event: Optional[threading.Event] = None,
+    stats_callback: Optional[Callable[[dict], None]] = None,
+    frame_range: Optional[Tuple[int, Optional[int]]] = None,
+    adaptive: Optional[AdaptiveSampling] = None,
+    resume: bool = False,
+    defer_teams: bool = False,
+    frame_callback: Optional[Callable[[dict, dict], None]] = None,
 ) -> Tuple[bool, str]:
     """
-    Esegue player detection su tutto il video.
+    Esegue player detection su tutto il video (o sull'intervallo frame_range).
     Ritorna (True, "") se ok, (False, messaggio_errore) altrimenti.
     Se classify_teams=True, assegna squadra 0/1 con KMeans su colori maglia.
     Salva risultati in JSON: lista di frame, ognuno con lista di bbox (x,y,w,h,conf,team).
     target_fps: FPS target per sampling (10-12 consigliato per CPU). 0 = legacy (1 ogni 2 frame).
     calibration_path: se valido, ritaglia frame all'area campo (boost prestazioni).
-    checkpoint_interval: salva ogni N frame dopo il primo (0=off). first_checkpoint: primo salvataggio.
-    start_frame, initial_results: ripresa da checkpoint (frame successivo e risultati parziali).
+    checkpoint_interval: flush del log di checkpoint ogni N frame dopo il primo (0=off). first_checkpoint: primo flush.
+    start_frame, initial_results: ripresa da risultati parziali (es. voce parziale della cache detection).
+    resume: riprende dal log di checkpoint di output_path (analysis/checkpoint_log.py) se presente.
+    batch_size: frame campionati per forward pass (1 = un frame alla volta). Output JSON identico.
+    prefetch: dimensione code della pipeline threaded decode/inference/post (0 = seriale).
+    cancel_event: se impostato durante l'esecuzione, la detection si ferma e ritorna (False, ...).
+    stats_callback: riceve i tempi per stadio (PipelineStats.as_dict()) a fine detection.
+    frame_range: (primo, fine esclusa o None) frame del video da analizzare, per la detection a shard
+    (analysis/sharded_detection.py). Indici frame e crop_bounds restano quelli del video intero.
+    adaptive: campionamento adattivo al movimento (AdaptiveSampling, passo tra floor_fps e ceiling_fps al
+    posto di target_fps). Il JSON riporta "sampling" e, per frame, "step" e "motion".
+    defer_teams: con classify_teams, niente clustering per frame: ogni box riceve solo jersey_hsv e
+    jersey_hist (istogramma compatto) e le squadre vengono assegnate una volta sola da
+    run_global_team_clustering sulle feature aggregate per track.
+    frame_callback: chiamata dopo ogni frame accodato con (frame, results), nell'ordine dei frame; es.
+    PlayerTracker.feed per il tracking in streaming senza rileggere il JSON.
     """
+    from .detection_pipeline import PipelineCancelled, run_detection_pipeline
+
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         return False, "Impossibile aprire il video. Verifica che il percorso sia corretto e il file non sia corrotto."
 
-    detector = PlayerDetector(conf_thresh=conf_thresh)
+    detector = create_player_detector(conf_thresh=conf_thresh)
     if not detector._init_predictor():
         init_err = detector.get_init_error() or "YOLOX non disponibile"
         cap.release()
         return False, f"YOLOX non inizializzato: {init_err}"
-    prev_boxes = []
-    try:
-        from .team_classifier import classify_teams as do_classify_teams
-    except ImportError:
-        do_classify_teams = None
+    team_fn = _team_fn(classify_teams, defer_teams)
 
+    batch_size = max(1, int(batch_size or 1))
     total = int(_to_scalar(cap.get(cv2.CAP_PROP_FRAME_COUNT))) or 0
     video_fps = _to_scalar(cap.get(cv2.CAP_PROP_FPS)) or 25.0
-    if target_fps > 0 and video_fps > 0:
-        frame_step = max(1, int(round(video_fps / target_fps)))
-    else:
-        frame_step = 2  # legacy
-    total_to_process = (total + frame_step - 1) // frame_step if total > 0 else 0
-    crop_bounds = None
-    if initial_results and start_frame > 0:
+    frame_step = frame_step_for(video_fps, target_fps)  # target_fps <= 0 → legacy (1 ogni 2)
+    if adaptive is not None:
+        frame_step = adaptive.steps(video_fps)[0]
+    total_to_process = _sampled_count(total, frame_step, frame_range)
+    range_start, range_end = frame_range or (0, None)
+    if initial_results and start_frame > 0 and not resume:
         results = initial_results
-        frame_idx = start_frame
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-        if results.get("frames"):
-            last_fd = results["frames"][-1]
-            prev_boxes = [BoundingBox(x=d["x"], y=d["y"], w=d["w"], h=d["h"], confidence=d.get("conf", 0.5), class_id=d.get("class_id", -1), role=d.get("role", "player"), team=d.get("team", -1)) for d in last_fd.get("detections", [])]
-        else:
-            prev_boxes = []
     else:
         results = {"frames": [], "width": 0, "height": 0, "fps": video_fps, "frame_step": frame_step, "target_fps": target_fps if target_fps > 0 else None, "crop_bounds": None}
-        frame_idx = 0
-        prev_boxes = []
-    last_pct = -1
-    processed_count = len(results.get("frames", []))
+        if adaptive is not None:
+            results["sampling"] = adaptive.as_dict(video_fps)
+        start_frame = 0
+    log = CheckpointLog(output_path, results, checkpoint_interval, first_checkpoint, resume=resume)
+    if log.start_frame is not None:
+        start_frame = log.start_frame
+    start_frame = max(start_frame, range_start)
+    state = {"last_pct": -1, "processed": log.count}
+
+    def _emit(sf, batch: DetectionBatch) -> None:
+        """Filtra, classifica e accoda al JSON un frame già processato (ordine di frame preservato)."""
+        _set_frame_meta(results, sf, video_fps)
+        fidx, frame_to_detect, bounds = sf.index, sf.image, sf.crop_bounds
+        h_det, w_det = frame_to_detect.shape[:2]
+        batch = _filter_batch_to_field(batch, w_det, h_det, bounds)
+        boxes_for_json = _frame_detections_json(batch, frame_to_detect, bounds, team_fn)
+        frame = {"frame": fidx, "detections": boxes_for_json, **_sampling_fields(sf)}
+        log.append(frame)
+        if frame_callback:
+            frame_callback(frame, results)
+        state["processed"] += 1
+        processed_count = _progress_count(sf, state["processed"], frame_step, frame_range)
+
+        if total_to_process > 0 and progress_callback:
+            pct = int(100 * processed_count / total_to_process)
+            if pct != state["last_pct"] and (pct % 5 == 0 or pct >= 100):
+                progress_callback(processed_count, total_to_process, f"Frame {processed_count}/{total_to_process}")
+                state["last_pct"] = pct
 
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret or frame is None or frame.size == 0:
-                break
-
-            if frame_idx == 0:
-                results["width"] = int(frame.shape[1])
-                results["height"] = int(frame.shape[0])
-                results["fps"] = video_fps
-
-            frame_to_detect, crop_bounds = _apply_field_crop(frame, calibration_path)
-            if frame_idx == 0 and crop_bounds is not None:
-                results["crop_bounds"] = {"x0": crop_bounds[0], "y0": crop_bounds[1], "x1": crop_bounds[2], "y1": crop_bounds[3]}
-
-            if frame_idx % frame_step == 0:
-                boxes = detector.detect(frame_to_detect)
-                h_det, w_det = frame_to_detect.shape[:2]
-                boxes = _filter_boxes_to_field(boxes, w_det, h_det, crop_bounds)
-                prev_boxes = boxes
-                if classify_teams and do_classify_teams and len(boxes) >= 2:
-                    do_classify_teams(frame_to_detect, boxes)
-            else:
-                boxes = prev_boxes if frame_idx > 0 else []
-
-            if frame_idx % frame_step == 0:
-                def _det_to_json(b, dx=0, dy=0):
-                    d = {
-                        "x": float(b.x) + float(dx),
-                        "y": float(b.y) + float(dy),
-                        "w": float(b.w),
-                        "h": float(b.h),
-                        "conf": float(b.confidence),
-                        "class_id": int(b.class_id),
-                        "role": b.role,
-                        "team": int(b.team),
-                    }
-                    if getattr(b, "jersey_hsv", None):
-                        d["jersey_hsv"] = [float(x) for x in b.jersey_hsv]
-                    return d
-                if crop_bounds is not None:
-                    x0, y0 = crop_bounds[0], crop_bounds[1]
-                    boxes_for_json = [_det_to_json(b, x0, y0) for b in boxes]
-                else:
-                    boxes_for_json = [_det_to_json(b) for b in boxes]
-                frame_data = {"frame": frame_idx, "detections": boxes_for_json}
-                results["frames"].append(frame_data)
-                processed_count += 1
-
-                n = len(results["frames"])
-                _should_save = (
-                    checkpoint_interval > 0
-                    and n > 0
-                    and (
-                        n == first_checkpoint
-                        or (n > first_checkpoint and (n - first_checkpoint) % checkpoint_interval == 0)
-                    )
-                )
-                if _should_save:
-                    ckpt_path = str(Path(output_path).with_suffix("")) + f"_checkpoint_{frame_idx}.json"
-                    with open(ckpt_path, "w", encoding="utf-8") as f:
-                        json.dump(results, f, indent=2)
-
-                if total_to_process > 0 and progress_callback:
-                    pct = int(100 * processed_count / total_to_process)
-                    if pct != last_pct and (pct % 5 == 0 or pct >= 100):
-                        progress_callback(processed_count, total_to_process, f"Frame {processed_count}/{total_to_process}")
-                        last_pct = pct
-
-            frame_idx += 1
-
+        stats = run_detection_pipeline(
+            _iter_sampled_frames(cap, frame_step, calibration_path, start_frame, range_end, adaptive),
+            _make_infer_fn(detector, batch_size),
+            _emit,
+            batch_size=batch_size,
+            threaded=prefetch > 0,
+            queue_size=prefetch,
+            cancel_event=cancel_event,
+        )
         cap.release()
+        if stats_callback:
+            stats_callback(stats.as_dict())
 
-        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2)
+        log.finish()
 
         if progress_callback and total_to_process > 0:
             progress_callback(total_to_process, total_to_process, "Completato")
         return True, ""
+    except PipelineCancelled:
+        cap.release()
+        return False, "Analisi interrotta."
     except Exception as e:
         if cap.isOpened():
             cap.release()
@@ -3,18 +3,26 @@ Player tracking per analisi automatica.
 Associa le stesse persone tra frame consecutivi (track_id stabile).
 Usa ByteTrack-style: due passaggi di associazione (alta conf poi bassa conf)
 per ridurre ID switch in occlusioni, + IoU + Hungarian.
+L'associazione avviene sui box previsti da un filtro di Kalman a velocità costante per track
+(analysis/kalman_filter.py), così regge anche campionamenti radi (frame_step alto, target_fps basso).
 """
 import json
 from collections import Counter
 from pathlib import Path
 from typing import Callable, Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 import numpy as np
 from scipy.optimize import linear_sum_assignment
 
+from . import kalman_filter
+from .adaptive_sampling import sample_age_step, sample_fields
+from .track_store import TrackStore, write_player_tracks
+
 TRACKING_DIR = "detections"
 TRACKING_FILE = "player_tracks.json"
+# Feature maglia copiate dalle detection ai track (clustering globale squadre)
+_JERSEY_KEYS = ("jersey_hsv", "jersey_hist")
 
 
 @dataclass
@@ -27,158 +35,221 @@ class Track:
     team: int
     age: int  # frame da ultimo match
     hits: int  # volte matchato
+    # Stato Kalman (cx, cy, w, h, vcx, vcy, vw, vh) e covarianza; None con motion_model=False
+    mean: Optional[np.ndarray] = field(default=None, repr=False)
+    cov: Optional[np.ndarray] = field(default=None, repr=False)
 
 
-def _iou_box(box1: Tuple[float, float, float, float], box2: Tuple[float, float, float, float]) -> float:
-    """IoU tra due box (x1, y1, x2, y2)."""
-    x1 = max(box1[0], box2[0])
-    y1 = max(box1[1], box2[1])
-    x2 = min(box1[2], box2[2])
-    y2 = min(box1[3], box2[3])
-    inter = max(0, x2 - x1) * max(0, y2 - y1)
-    a1 = (box1[2] - box1[0]) * (box1[3] - box1[1])
-    a2 = (box2[2] - box2[0]) * (box2[3] - box2[1])
-    union = a1 + a2 - inter
-    return inter / union if union > 0 else 0
+def _xywh_to_xyxy(boxes: np.ndarray) -> np.ndarray:
+    """(N, 4) x, y, w, h → (N, 4) x1, y1, x2, y2."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return np.concatenate([boxes[:, :2], boxes[:, :2] + boxes[:, 2:]], axis=1)
 
 
-def _box_xywh_to_x1y1x2y2(x: float, y: float, w: float, h: float) -> Tuple[float, float, float, float]:
-    return (x, y, x + w, y + h)
+def _iou_matrix(a: np.ndarray, b: np.ndarray, pad: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    IoU tra tutte le coppie di box (x1, y1, x2, y2): a (N, 4), b (M, 4) → (N, M), in broadcast.
+    pad (M, 2): margine (px, py) della colonna j applicato a entrambi i box della coppia (IoU "bufferizzata":
+    tollera lo scarto tra box previsto e detection quando la predizione è incerta). Unione nulla → IoU 0.
+    """
+    if pad is None:
+        ax1, ay1, ax2, ay2 = (a[:, None, k] for k in range(4))
+        bx1, by1, bx2, by2 = (b[None, :, k] for k in range(4))
+    else:
+        px, py = pad[None, :, 0], pad[None, :, 1]
+        ax1, ay1, ax2, ay2 = a[:, None, 0] - px, a[:, None, 1] - py, a[:, None, 2] + px, a[:, None, 3] + py
+        bx1, by1, bx2, by2 = b[None, :, 0] - px, b[None, :, 1] - py, b[None, :, 2] + px, b[None, :, 3] + py
+    ix1 = np.maximum(ax1, bx1)
+    iy1 = np.maximum(ay1, by1)
+    ix2 = np.minimum(ax2, bx2)
+    iy2 = np.minimum(ay2, by2)
+    inter = np.maximum(0.0, ix2 - ix1) * np.maximum(0.0, iy2 - iy1)
+    a1 = (ax2 - ax1) * (ay2 - ay1)
+    a2 = (bx2 - bx1) * (by2 - by1)
+    union = a1 + a2 - inter
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(union > 0, inter / union, 0.0)
 
 
 def _match_detections_to_tracks(
-    detections: List[dict],
-    tracks: List[Track],
+    det_xyxy: np.ndarray,
+    trk_xyxy: np.ndarray,
     iou_thresh: float = 0.3,
-    det_indices: Optional[List[int]] = None,
-    track_indices: Optional[List[int]] = None,
-) -> Tuple[List[int], List[int], List[int]]:
+    det_indices: Optional[np.ndarray] = None,
+    track_indices: Optional[np.ndarray] = None,
+    trk_pad: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Associa detection -> track tramite IoU (Hungarian).
-    Se det_indices/track_indices sono dati, usa solo quei sottoinsiemi.
-    Ritorna: (matched_det_idx, matched_track_idx, unmatched_det_idx) in termini di det_indices.
+    Associa detection -> track tramite IoU (Hungarian) sui box (x1, y1, x2, y2).
+    Se det_indices/track_indices sono dati, usa solo quei sottoinsiemi. trk_pad (M, 2): vedi _iou_matrix.
+    Ritorna: (matched_det_idx, matched_track_idx) in termini di det_indices/track_indices.
     """
     if det_indices is None:
-        det_indices = list(range(len(detections)))
+        det_indices = np.arange(len(det_xyxy))
     if track_indices is None:
-        track_indices = list(range(len(tracks)))
-    if not det_indices or not track_indices:
-        return [], [], list(det_indices)
-
-    cost = np.ones((len(det_indices), len(track_indices)))
-    for ii, i in enumerate(det_indices):
-        d = detections[i]
-        b1 = _box_xywh_to_x1y1x2y2(d["x"], d["y"], d["w"], d["h"])
-        for jj, j in enumerate(track_indices):
-            t = tracks[j]
-            b2 = _box_xywh_to_x1y1x2y2(t.x, t.y, t.w, t.h)
-            iou = _iou_box(b1, b2)
-            cost[ii, jj] = 1 - iou
+        track_indices = np.arange(len(trk_xyxy))
+    if not len(det_indices) or not len(track_indices):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
 
+    pad = trk_pad[track_indices] if trk_pad is not None else None
+    cost = 1 - _iou_matrix(det_xyxy[det_indices], trk_xyxy[track_indices], pad)
     row_ind, col_ind = linear_sum_assignment(cost)
-    matched_det = []
-    matched_trk = []
-    for ii, jj in zip(row_ind, col_ind):
-        if cost[ii, jj] < (1 - iou_thresh):
-            matched_det.append(det_indices[ii])
-            matched_trk.append(track_indices[jj])
-    unmatched_det = [i for i in det_indices if i not in matched_det]
-    return matched_det, matched_trk, unmatched_det
+    keep = cost[row_ind, col_ind] < (1 - iou_thresh)
+    return det_indices[row_ind[keep]], track_indices[col_ind[keep]]
 
 
 def _bytetrack_match(
-    dets: List[dict],
-    active_tracks: List[Track],
+    det_xyxy: np.ndarray,
+    confs: np.ndarray,
+    trk_xyxy: np.ndarray,
     iou_thresh: float = 0.3,
     high_thresh: float = 0.5,
     low_thresh: float = 0.2,
+    trk_pad: Optional[np.ndarray] = None,
 ) -> Tuple[List[int], List[int], List[int], List[int]]:
     """
     ByteTrack-style: prima associa detection ad alta conf, poi le rimanenti
     a bassa conf ai track ancora non matchati. Riduce ID switch in occlusioni.
+    Box (x1, y1, x2, y2) di detection (N, 4) e track (M, 4); confs (N,); trk_pad (M, 2) opzionale.
     Ritorna: (matched_det_idx, matched_track_idx, unmatched_det_idx, unmatched_track_idx).
     """
-    if not dets:
-        return [], [], [], list(range(len(active_tracks)))
-    if not active_tracks:
-        return [], [], list(range(len(dets))), []
+    n_det, n_trk = len(det_xyxy), len(trk_xyxy)
+    if not n_det:
+        return [], [], [], list(range(n_trk))
+    if not n_trk:
+        return [], [], list(range(n_det)), []
 
-    confs = [d.get("conf", 0.5) for d in dets]
-    high_idx = [i for i in range(len(dets)) if confs[i] >= high_thresh]
-    low_idx = [i for i in range(len(dets)) if low_thresh <= confs[i] < high_thresh]
+    high_idx = np.flatnonzero(confs >= high_thresh)
+    low_idx = np.flatnonzero((confs >= low_thresh) & (confs < high_thresh))
 
-    matched_det, matched_trk, unmatched_det = _match_detections_to_tracks(
-        dets, active_tracks, iou_thresh, det_indices=high_idx, track_indices=list(range(len(active_tracks)))
+    matched_det, matched_trk = _match_detections_to_tracks(
+        det_xyxy, trk_xyxy, iou_thresh, det_indices=high_idx, trk_pad=trk_pad
     )
-    unmatched_trk_idx = [j for j in range(len(active_tracks)) if j not in matched_trk]
-
-    if low_idx and unmatched_trk_idx:
-        remaining_low = [i for i in low_idx if i not in matched_det]
-        if remaining_low and unmatched_trk_idx:
-            m2_det, m2_trk, _ = _match_detections_to_tracks(
-                dets, active_tracks, iou_thresh,
-                det_indices=remaining_low,
-                track_indices=unmatched_trk_idx,
-            )
-            matched_det.extend(m2_det)
-            matched_trk.extend(m2_trk)
-            for j in m2_trk:
-                unmatched_trk_idx.remove(j)
+    trk_free = np.ones(n_trk, dtype=bool)
+    trk_free[matched_trk] = False
+
+    if len(low_idx) and trk_free.any():
+        # Le detection a bassa conf non sono mai nel primo passaggio: tutte ancora libere
+        m2_det, m2_trk = _match_detections_to_tracks(
+            det_xyxy, trk_xyxy, iou_thresh,
+            det_indices=low_idx,
+            track_indices=np.flatnonzero(trk_free),
+            trk_pad=trk_pad,
+        )
+        matched_det = np.concatenate([matched_det, m2_det])
+        matched_trk = np.concatenate([matched_trk, m2_trk])
+        trk_free[m2_trk] = False
 
-    unmatched_det = [i for i in range(len(dets)) if i not in matched_det]
-    return matched_det, matched_trk, unmatched_det, unmatched_trk_idx
+    det_free = np.ones(n_det, dtype=bool)
+    det_free[matched_det] = False
+    return matched_det.tolist(), matched_trk.tolist(), np.flatnonzero(det_free).tolist(), np.flatnonzero(trk_free).tolist()
 
 
-def run_player_tracking(
-    detections_path: str,
-    output_path: str,
-    max_age: int = 30,
-    iou_thresh: float = 0.3,
-    progress_callback: Optional[Callable[[int, int, str], None]] = None,
-) -> bool:
+class PlayerTracker:
     """
-    Esegue tracking sulle detection. Legge player_detections.json,
-    associa track_id e salva in player_tracks.json.
+    Tracker ByteTrack incrementale: un campione alla volta con update(), così può girare dentro il loop di
+    detection (feed come frame_callback di run_player_detection / run_unified_detection) senza rileggere
+    player_detections.json. frames / tracks contengono i track parziali già durante la detection.
+    sampling, frame_step: come nel JSON delle detection (campionamento adattivo, passo fisso).
     """
-    if not Path(detections_path).exists():
-        return False
-
-    with open(detections_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    frames_data = data.get("frames", [])
-    if not frames_data:
-        return False
-
-    width = data.get("width", 0)
-    height = data.get("height", 0)
-    fps = data.get("fps", 25.0)
-    total = len(frames_data)
-    next_track_id = 0
-    active_tracks: List[Track] = []
-
-    results = {"frames": [], "width": width, "height": height, "fps": fps, "tracks": {}}
-    last_pct = -1
-
-    for frame_idx, frame_data in enumerate(frames_data):
-        detections = frame_data.get("detections", [])
 
-        # Converti detection in formato con x,y,w,h,team,conf (e jersey_hsv se presente)
+    def __init__(
+        self,
+        max_age: int = 30,
+        iou_thresh: float = 0.3,
+        sampling: Optional[dict] = None,
+        frame_step: int = 1,
+        motion_model: bool = True,
+    ):
+        self.max_age = max_age
+        self.iou_thresh = iou_thresh
+        self.sampling = sampling
+        self.frame_step = max(1, int(frame_step or 1))
+        self.motion_model = motion_model
+        self.frames: List[dict] = []
+        self.tracks: Dict[str, dict] = {}
+        self.meta: dict = {}  # width, height, fps (da feed o assegnati da chi chiama)
+        self._active: List[Track] = []
+        self._next_track_id = 0
+        self._prev_video_frame: Optional[int] = None
+        # Confidenza e ruolo per riga (non riportati nel JSON, colonne di player_tracks.npz)
+        self._conf: List[float] = []
+        self._role: List[Optional[str]] = []
+
+    def feed(self, frame: dict, results: Optional[dict] = None) -> dict:
+        """
+        Aggiunge un frame nel formato di player_detections.json. results: JSON di detection in costruzione
+        (width, height, fps, frame_step, sampling), letto al primo frame e a ogni chiamata per i meta.
+        """
+        if results is not None:
+            if not self.frames:
+                self.sampling = results.get("sampling")
+                self.frame_step = max(1, int(results.get("frame_step") or 1))
+            self.meta = {k: results.get(k) for k in ("width", "height", "fps")}
+        return self.update(len(self.frames), frame.get("detections", []), frame.get("frame"), frame.get("step"))
+
+    def update(
+        self,
+        frame_idx: int,
+        detections: List[dict],
+        video_frame: Optional[int] = None,
+        step: Optional[int] = None,
+    ) -> dict:
+        """
+        Associa le detection di un campione ai track attivi e ritorna il frame di player_tracks.json
+        ({"frame": frame_idx, "detections": [... con track_id]}, + video_frame/step col campionamento adattivo).
+        video_frame: frame del video (dt della predizione Kalman); step: passo del campione (adattivo).
+        """
+        frame_data = {"frame": video_frame, "step": step}
+        active_tracks = self._active
+
+        # Converti detection in formato con x,y,w,h,team,conf (e feature maglia se presenti)
         dets = []
         for d in detections:
             det = {"x": d["x"], "y": d["y"], "w": d["w"], "h": d["h"], "team": d.get("team", -1), "conf": d.get("conf", 0.5)}
-            if d.get("jersey_hsv"):
-                det["jersey_hsv"] = d["jersey_hsv"]
+            for key in _JERSEY_KEYS:
+                if d.get(key):
+                    det[key] = d[key]
             dets.append(det)
 
+        det_xywh = np.array([(d["x"], d["y"], d["w"], d["h"]) for d in dets], dtype=np.float64).reshape(-1, 4)
+        age_step = sample_age_step(frame_data, self.sampling)
+        if self.motion_model and active_tracks:
+            # Predizione in blocco di tutti i track al campione corrente (dt in frame video)
+            prev = self._prev_video_frame
+            dt = video_frame - prev if video_frame is not None and prev is not None else 0
+            if dt <= 0:
+                dt = self.frame_step
+            means, covs = kalman_filter.predict(
+                np.stack([t.mean for t in active_tracks]), np.stack([t.cov for t in active_tracks]), dt
+            )
+            for t, m, c in zip(active_tracks, means, covs):
+                t.mean, t.cov = m, c
+            trk_xyxy = _xywh_to_xyxy(kalman_filter.state_to_xywh(means))
+            # Margine = incertezza (1 sigma) sul centro previsto: ampio per track nuovi (velocità ignota)
+            # o non visti da tempo, trascurabile per track stabili
+            trk_pad = kalman_filter.position_std(covs)
+        else:
+            trk_xyxy = _xywh_to_xyxy([(t.x, t.y, t.w, t.h) for t in active_tracks])
+            trk_pad = None
+
         # ByteTrack-style: prima alta conf, poi bassa conf per recuperare occlusioni
+        det_xyxy = _xywh_to_xyxy(det_xywh)
+        confs = np.array([d["conf"] for d in dets], dtype=np.float64)
         matched_det_idx, matched_trk_idx, unmatched_det_idx, unmatched_trk_idx = _bytetrack_match(
-            dets, active_tracks, iou_thresh=iou_thresh, high_thresh=0.5, low_thresh=0.2
+            det_xyxy, confs, trk_xyxy, iou_thresh=self.iou_thresh, high_thresh=0.5, low_thresh=0.2, trk_pad=trk_pad
         )
 
         new_active: List[Track] = []
         out_detections = [None] * len(detections)
 
+        if self.motion_model and matched_det_idx:
+            means, covs = kalman_filter.update(
+                means[matched_trk_idx], covs[matched_trk_idx], det_xywh[matched_det_idx]
+            )
+            for ti, m, c in zip(matched_trk_idx, means, covs):
+                active_tracks[ti].mean, active_tracks[ti].cov = m, c
+
         for di, ti in zip(matched_det_idx, matched_trk_idx):
             t = active_tracks[ti]
             d = dets[di]
@@ -191,44 +262,140 @@ def run_player_tracking(
                 "team": d["team"],
                 "track_id": t.track_id,
             }
-            if d.get("jersey_hsv"):
-                out_detections[di]["jersey_hsv"] = d["jersey_hsv"]
-            results["tracks"][str(t.track_id)] = {"team": d["team"], "hits": t.hits}
+            for key in _JERSEY_KEYS:
+                if d.get(key):
+                    out_detections[di][key] = d[key]
+            self.tracks[str(t.track_id)] = {"team": d["team"], "hits": t.hits}
 
-        # Track non matched: invecchiano (solo quelli davvero non associati)
+        # Track non matched: invecchiano (solo quelli davvero non associati); con motion_model
+        # proseguono sulla traiettoria prevista
         for ti in unmatched_trk_idx:
             t = active_tracks[ti]
-            t.age += 1
-            if t.age <= max_age:
+            t.age += age_step
+            if t.age <= self.max_age:
                 new_active.append(t)
 
         # Nuovi track per detection non matched
-        for di in unmatched_det_idx:
+        if self.motion_model and unmatched_det_idx:
+            new_means, new_covs = kalman_filter.initiate(det_xywh[unmatched_det_idx])
+        for k, di in enumerate(unmatched_det_idx):
             d = dets[di]
             t = Track(
-                track_id=next_track_id,
+                track_id=self._next_track_id,
                 x=d["x"], y=d["y"], w=d["w"], h=d["h"],
                 team=d["team"],
                 age=0,
                 hits=1,
             )
-            next_track_id += 1
+            if self.motion_model:
+                t.mean, t.cov = new_means[k], new_covs[k]
+            self._next_track_id += 1
             new_active.append(t)
             out_detections[di] = {
                 "x": d["x"], "y": d["y"], "w": d["w"], "h": d["h"],
                 "team": d["team"],
                 "track_id": t.track_id,
             }
-            if d.get("jersey_hsv"):
-                out_detections[di]["jersey_hsv"] = d["jersey_hsv"]
-            results["tracks"][str(t.track_id)] = {"team": d["team"], "hits": 1}
+            for key in _JERSEY_KEYS:
+                if d.get(key):
+                    out_detections[di][key] = d[key]
+            self.tracks[str(t.track_id)] = {"team": d["team"], "hits": 1}
 
-        active_tracks = new_active
+        self._active = new_active
+        self._prev_video_frame = video_frame
 
         # Ordina output (alcune detection potrebbero essere None se matched ma ordine diverso)
         final_dets = [o for o in out_detections if o is not None]
+        self._conf.extend(d["conf"] for d in dets)
+        self._role.extend(d.get("role") for d in detections)
+        out = {"frame": frame_idx, "detections": final_dets, **sample_fields(frame_data, self.sampling)}
+        self.frames.append(out)
+        return out
+
+    def result(self) -> dict:
+        """
+        JSON completo di player_tracks.json, con team stabilizzato per track_id (moda su tutti i frame).
+        Da chiamare a fine sequenza: modifica in place le detection dei frame già emessi.
+        """
+        results = {
+            "frames": self.frames,
+            "width": self.meta.get("width", 0),
+            "height": self.meta.get("height", 0),
+            "fps": self.meta.get("fps", 25.0),
+            "tracks": self.tracks,
+        }
+        if self.sampling:
+            results["sampling"] = self.sampling
+
+        # Stabilizza team per track_id: usa la moda (team più frequente) su tutti i frame
+        track_teams: Dict[int, List[int]] = {}
+        for fd in results["frames"]:
+            for d in fd.get("detections", []):
+                tid = d.get("track_id", -1)
+                t = d.get("team", -1)
+                if tid not in track_teams:
+                    track_teams[tid] = []
+                track_teams[tid].append(t)
+        track_mode: Dict[int, int] = {}
+        for tid, teams in track_teams.items():
+            cnt = Counter(teams)
+            track_mode[tid] = cnt.most_common(1)[0][0]
+
+        for fd in results["frames"]:
+            for d in fd.get("detections", []):
+                tid = d.get("track_id", -1)
+                if tid in track_mode:
+                    d["team"] = track_mode[tid]
+        return results
+
+    def store(self, results: Optional[dict] = None) -> TrackStore:
+        """Archivio colonnare (analysis/track_store.py) di result(), con conf e ruolo per riga."""
+        return TrackStore.from_json(results or self.result(), conf=self._conf, role=self._role)
+
+    def save(self, output_path: str) -> None:
+        """Scrive player_tracks.json (result()) e l'archivio colonnare player_tracks.npz."""
+        results = self.result()
+        write_player_tracks(output_path, self.store(results), results)
 
-        results["frames"].append({"frame": frame_idx, "detections": final_dets})
+
+def run_player_tracking(
+    detections_path: str,
+    output_path: str,
+    max_age: int = 30,
+    iou_thresh: float = 0.3,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    motion_model: bool = True,
+) -> bool:
+    """
+    Esegue tracking sulle detection. Legge player_detections.json,
+    associa track_id e salva in player_tracks.json.
+    motion_model: associa sui box previsti dal filtro di Kalman (predizione fino al frame video del campione);
+    False = associa sull'ultimo box di ogni track (comportamento precedente).
+    I box in output restano sempre quelli delle detection. Per il tracking durante la detection: PlayerTracker.
+    """
+    if not Path(detections_path).exists():
+        return False
+
+    with open(detections_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    frames_data = data.get("frames", [])
+    if not frames_data:
+        return False
+
+    tracker = PlayerTracker(
+        max_age=max_age,
+        iou_thresh=iou_thresh,
+        sampling=data.get("sampling"),  # campionamento adattivo: passo variabile tra i frame
+        frame_step=data.get("frame_step") or 1,
+        motion_model=motion_model,
+    )
+    tracker.meta = {"width": data.get("width", 0), "height": data.get("height", 0), "fps": data.get("fps", 25.0)}
+    total = len(frames_data)
+    last_pct = -1
+
+    for frame_idx, frame_data in enumerate(frames_data):
+        tracker.update(frame_idx, frame_data.get("detections", []), frame_data.get("frame"), frame_data.get("step"))
 
         if progress_callback and total > 0:
             pct = int(100 * (frame_idx + 1) / total)
@@ -236,29 +403,7 @@ def run_player_tracking(
                 progress_callback(frame_idx + 1, total, f"Frame {frame_idx + 1}/{total}")
                 last_pct = pct
 
-    # Stabilizza team per track_id: usa la moda (team più frequente) su tutti i frame
-    track_teams: Dict[int, List[int]] = {}
-    for fd in results["frames"]:
-        for d in fd.get("detections", []):
-            tid = d.get("track_id", -1)
-            t = d.get("team", -1)
-            if tid not in track_teams:
-                track_teams[tid] = []
-            track_teams[tid].append(t)
-    track_mode: Dict[int, int] = {}
-    for tid, teams in track_teams.items():
-        cnt = Counter(teams)
-        track_mode[tid] = cnt.most_common(1)[0][0]
-
-    for fd in results["frames"]:
-        for d in fd.get("detections", []):
-            tid = d.get("track_id", -1)
-            if tid in track_mode:
-                d["team"] = track_mode[tid]
-
-    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2)
+    tracker.save(output_path)
 
     if progress_callback:
         progress_callback(total, total, "Completato")
@@ -11,6 +11,7 @@ from typing import Any, Dict, List, Optional
 
 from .config import get_analysis_output_path, get_calibration_path
 from .player_tracking import get_tracks_path
+from .track_store import load_player_tracks
 from .ball_tracking import get_ball_tracks_path
 
 
@@ -54,9 +55,9 @@ def build_full_result(
     # Tracking
     pt_path = get_tracks_path(project_analysis_dir)
     bt_path = get_ball_tracks_path(project_analysis_dir)
-    if pt_path.exists():
-        with open(pt_path, "r", encoding="utf-8") as f:
-            result["tracking"]["player_tracks"] = json.load(f)
+    player_tracks = load_player_tracks(pt_path)
+    if player_tracks is not None:
+        result["tracking"]["player_tracks"] = player_tracks.to_json()
     if bt_path.exists():
         with open(bt_path, "r", encoding="utf-8") as f:
             result["tracking"]["ball_tracks"] = json.load(f)
@@ -0,0 +1,253 @@
+"""
+Detection multi-processo a shard temporali.
+
+Il video viene diviso in N intervalli contigui di frame, con confini allineati a frame_step
+(ogni shard campiona esattamente gli stessi frame dell'analisi a processo singolo).
+Ogni worker è un processo separato con il proprio cv2.VideoCapture e il proprio modello
+ed esegue run_unified_detection / run_player_detection / run_ball_detection sul suo intervallo.
+I risultati parziali vengono uniti in ordine di frame in un unico player_detections.json /
+ball_detections.json: indici frame e crop_bounds sono quelli del video intero.
+
+Il progresso dei worker arriva al processo principale su una coda ed è aggregato
+(somma dei frame processati / somma dei frame da processare) nel progress_callback.
+"""
+import multiprocessing as mp
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+import json
+
+import cv2
+
+from .adaptive_sampling import AdaptiveSampling
+from .frame_sampler import frame_step_for
+from .hardware_profile import limit_threads
+
+SHARD_MODES = ("unified", "player", "ball")
+_POLL_S = 0.2
+
+
+def shard_ranges(total_frames: int, frame_step: int, workers: int) -> List[Tuple[int, Optional[int]]]:
+    """
+    Divide [0, total_frames) in al più `workers` intervalli contigui (inizio, fine esclusa).
+    Gli inizi sono multipli di frame_step e i frame campionati sono ripartiti in modo uniforme;
+    l'ultimo intervallo ha fine None (fino a fine video, anche se CAP_PROP_FRAME_COUNT è impreciso).
+    """
+    frame_step = max(1, int(frame_step))
+    sampled = (total_frames + frame_step - 1) // frame_step if total_frames > 0 else 0
+    workers = max(1, min(int(workers), sampled or 1))
+    bounds = [(sampled * i // workers) * frame_step for i in range(workers)]
+    return [(bounds[i], bounds[i + 1] if i + 1 < workers else None) for i in range(workers)]
+
+
+def merge_detection_results(parts: List[dict]) -> dict:
+    """Unisce i JSON di detection degli shard: frame concatenati in ordine, metadati dal primo shard valorizzato."""
+    parts = [p for p in parts if p]
+    if not parts:
+        return {"frames": []}
+    merged = {k: v for k, v in parts[0].items() if k != "frames"}
+    for part in parts:
+        for key in ("width", "height", "crop_bounds"):
+            if not merged.get(key) and part.get(key):
+                merged[key] = part[key]
+    frames = [fr for part in parts for fr in part.get("frames", [])]
+    frames.sort(key=lambda fr: fr.get("frame", 0))
+    if merged.get("sampling"):
+        # Campionamento adattivo: ogni shard riparte dal passo base, il passo vero è la distanza dal frame precedente
+        for prev, fr in zip(frames, frames[1:]):
+            if "step" in fr:
+                fr["step"] = fr["frame"] - prev["frame"]
+    merged["frames"] = frames
+    return merged
+
+
+def _shard_path(output_path: str, index: int) -> str:
+    return str(Path(output_path).with_suffix("")) + f"_shard_{index}.json"
+
+
+def _detect_shard(job: dict, events: "mp.Queue", cancel_event) -> None:
+    """Processo worker: detection su job['frame_range'], risultato parziale su file, stato su `events`."""
+    index = job["index"]
+    try:
+        limit_threads(job["threads"])
+
+        def on_progress(cur: int, total: int, msg: str):
+            events.put(("progress", index, cur, total))
+
+        common = dict(
+            progress_callback=on_progress,
+            target_fps=job["target_fps"],
+            calibration_path=job["calibration_path"],
+            checkpoint_interval=0,
+            prefetch=job["prefetch"],
+            cancel_event=cancel_event,
+            stats_callback=lambda st: events.put(("stats", index, st)),
+            frame_range=job["frame_range"],
+            adaptive=job["adaptive"],
+        )
+        mode = job["mode"]
+        if mode == "unified":
+            from .unified_detection import run_unified_detection
+            ok, err = run_unified_detection(
+                job["video_path"], job["player_path"], job["ball_path"],
+                conf_thresh=job["conf_thresh"], ball_conf_thresh=job["ball_conf_thresh"],
+                classify_teams=job["classify_teams"], defer_teams=job["defer_teams"], batch_size=job["batch_size"], **common,
+            )
+        elif mode == "player":
+            from .player_detection import run_player_detection
+            ok, err = run_player_detection(
+                job["video_path"], job["player_path"], conf_thresh=job["conf_thresh"],
+                classify_teams=job["classify_teams"], defer_teams=job["defer_teams"], batch_size=job["batch_size"], **common,
+            )
+        else:
+            from .ball_detection import run_ball_detection
+            ok, err = run_ball_detection(
+                job["video_path"], job["ball_path"], conf_thresh=job["ball_conf_thresh"], roi_mode=job["ball_roi"], **common,
+            )
+        events.put(("done", index, ok, err))
+    except BaseException as e:
+        events.put(("done", index, False, str(e)))
+
+
+def run_sharded_detection(
+    video_path: str,
+    mode: str = "unified",
+    player_output_path: Optional[str] = None,
+    ball_output_path: Optional[str] = None,
+    workers: int = 2,
+    conf_thresh: float = 0.20,
+    ball_conf_thresh: float = 0.12,
+    classify_teams: bool = True,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    target_fps: float = 10.0,
+    calibration_path: Optional[str] = None,
+    batch_size: int = 1,
+    prefetch: int = 0,
+    cancel_event: Optional[threading.Event] = None,
+    stats_callback: Optional[Callable[[dict], None]] = None,
+    ball_roi: bool = False,
+    adaptive: Optional[AdaptiveSampling] = None,
+    defer_teams: bool = False,
+) -> Tuple[bool, str]:
+    """
+    Esegue la detection con `workers` processi su intervalli contigui del video e unisce i risultati.
+    mode: "unified" (player + ball, entrambi i path), "player" o "ball".
+    Ritorna (True, "") se ok, (False, messaggio_errore) altrimenti; in caso di errore o cancel
+    i file finali non vengono scritti. I checkpoint non sono usati (shard brevi, niente --resume).
+    ball_roi: in mode "ball", inference palla su ROI (vedi run_ball_detection roi_mode).
+    adaptive: campionamento adattivo (AdaptiveSampling); gli shard sono allineati al suo passo base.
+    defer_teams: solo feature maglia per box, squadre assegnate dopo (vedi run_player_detection).
+    """
+    if mode not in SHARD_MODES:
+        return False, f"Modalità non valida: {mode}"
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return False, "Impossibile aprire il video. Verifica che il percorso sia corretto e il file non sia corrotto."
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    video_fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0) or 25.0
+    cap.release()
+    frame_step = adaptive.steps(video_fps)[0] if adaptive is not None else frame_step_for(video_fps, target_fps)
+    ranges = shard_ranges(total, frame_step, workers)
+    threads = max(1, (os.cpu_count() or 1) // len(ranges))
+
+    outputs = {"player": player_output_path if mode in ("unified", "player") else None,
+               "ball": ball_output_path if mode in ("unified", "ball") else None}
+    ctx = mp.get_context("spawn")  # spawn: niente fork di thread/handle del processo principale
+    events = ctx.Queue()
+    worker_cancel = ctx.Event()
+    procs = []
+    for i, frame_range in enumerate(ranges):
+        job = {
+            "index": i,
+            "mode": mode,
+            "video_path": video_path,
+            "player_path": _shard_path(outputs["player"], i) if outputs["player"] else None,
+            "ball_path": _shard_path(outputs["ball"], i) if outputs["ball"] else None,
+            "frame_range": frame_range,
+            "conf_thresh": conf_thresh,
+            "ball_conf_thresh": ball_conf_thresh,
+            "classify_teams": classify_teams,
+            "defer_teams": defer_teams,
+            "target_fps": target_fps,
+            "calibration_path": calibration_path,
+            "batch_size": batch_size,
+            "prefetch": prefetch,
+            "threads": threads,
+            "ball_roi": ball_roi,
+            "adaptive": adaptive,
+        }
+        p = ctx.Process(target=_detect_shard, args=(job, events, worker_cancel), name=f"detection-shard-{i}", daemon=True)
+        p.start()
+        procs.append((p, job))
+
+    progress = {i: (0, 0) for i in range(len(procs))}
+    shard_stats = {}
+    errors = []
+    pending = set(range(len(procs)))
+    last_pct = -1
+    try:
+        while pending:
+            if cancel_event is not None and cancel_event.is_set():
+                worker_cancel.set()
+            try:
+                event = events.get(timeout=_POLL_S)
+            except queue.Empty:
+                # Worker terminato senza "done" (crash del processo)
+                for i in list(pending):
+                    p = procs[i][0]
+                    if not p.is_alive() and p.exitcode not in (0, None):
+                        pending.discard(i)
+                        errors.append(f"Shard {i}: processo terminato (exit code {p.exitcode})")
+                        worker_cancel.set()
+                continue
+            kind, i = event[0], event[1]
+            if kind == "progress":
+                progress[i] = (event[2], event[3])
+                cur = sum(c for c, _ in progress.values())
+                tot = sum(t for _, t in progress.values())
+                pct = int(100 * cur / tot) if tot else 0
+                if progress_callback and tot and pct != last_pct:
+                    progress_callback(cur, tot, f"Frame {cur}/{tot} ({len(procs)} worker)")
+                    last_pct = pct
+            elif kind == "stats":
+                shard_stats[f"shard_{i}"] = event[2]
+            elif kind == "done":
+                pending.discard(i)
+                if not event[2]:
+                    errors.append(event[3] or f"Shard {i} fallito")
+                    worker_cancel.set()  # un errore ferma anche gli altri shard
+    finally:
+        for p, _ in procs:
+            p.join()
+
+    try:
+        if errors or (cancel_event is not None and cancel_event.is_set()):
+            if cancel_event is not None and cancel_event.is_set():
+                return False, "Analisi interrotta."
+            return False, errors[0]
+        for key in ("player", "ball"):
+            if not outputs[key]:
+                continue
+            parts = []
+            for _, job in procs:
+                with open(job[f"{key}_path"], "r", encoding="utf-8") as f:
+                    parts.append(json.load(f))
+            merged = merge_detection_results(parts)
+            Path(outputs[key]).parent.mkdir(parents=True, exist_ok=True)
+            with open(outputs[key], "w", encoding="utf-8") as f:
+                json.dump(merged, f, indent=2)
+        if stats_callback:
+            stats_callback({"workers": len(procs), "frame_ranges": [list(r) for r in ranges], **shard_stats})
+        if progress_callback:
+            tot = sum(t for _, t in progress.values())
+            progress_callback(tot, tot, "Completato")
+        return True, ""
+    except (OSError, json.JSONDecodeError) as e:
+        return False, f"Unione risultati shard fallita: {e}"
+    finally:
+        for _, job in procs:
+            for key in ("player_path", "ball_path"):
+                if job[key] and Path(job[key]).exists():
+                    Path(job[key]).unlink()
@@ -1,7 +1,11 @@
 """
 Team classification per analisi automatica.
-Classifica giocatori in 2 squadre tramite KMeans sui colori maglia (HSV).
+Classifica giocatori in 2 squadre tramite clustering sui colori maglia (HSV).
 Usa la metà superiore del bbox come regione maglia.
+
+Il descrittore maglia è calcolato per tutti i box del frame insieme (jersey_descriptors): una sola
+conversione HSV, regioni campionate su una griglia fissa, colore medio dei pixel più saturi.
+La divisione in squadre usa un k-means NumPy deterministico su 2/3 centroidi (_fit_centroids).
 """
 from typing import List, Tuple
 import cv2
@@ -61,6 +65,195 @@ def extract_dominant_colors_hsv(
         return [(0, 0, 0)]
 
 
+def _jersey_bounds(boxes: List[BoundingBox], w_img: int, h_img: int, margin_ratio: float = 0.1) -> np.ndarray:
+    """Regioni maglia (x1, y1, x2, y2) di tutti i box, come extract_jersey_region. Shape (N, 4) int."""
+    xywh = np.array([[b.x, b.y, b.w, b.h] for b in boxes], dtype=np.float64).reshape(-1, 4)
+    x = np.maximum(0, xywh[:, 0].astype(np.int64))
+    y = np.maximum(0, xywh[:, 1].astype(np.int64))
+    w = np.maximum(1, xywh[:, 2].astype(np.int64))
+    h = np.maximum(1, xywh[:, 3].astype(np.int64))
+    h_top = np.maximum(1, h // 2)
+    mw = np.maximum(1, (w * margin_ratio).astype(np.int64))
+    mh = np.maximum(1, (h_top * margin_ratio).astype(np.int64))
+    return np.stack([
+        np.maximum(0, x - mw),
+        np.maximum(0, y - mh),
+        np.minimum(w_img, x + w + mw),
+        np.minimum(h_img, y + h_top + mh),
+    ], axis=1)
+
+
+def _sample_jersey_pixels(
+    frame: np.ndarray,
+    boxes: List[BoundingBox],
+    grid: int = 16,
+    margin_ratio: float = 0.1,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pixel HSV delle regioni maglia campionati su una griglia grid×grid, con una sola conversione HSV
+    per tutti i box. Ritorna (valid (N,) bool, px (M, grid*grid, 3) float32) con M = valid.sum().
+    """
+    n = len(boxes)
+    empty = (np.zeros(n, dtype=bool), np.zeros((0, grid * grid, 3), dtype=np.float32))
+    if n == 0 or frame.size == 0:
+        return empty
+    h_img, w_img = frame.shape[:2]
+    bounds = _jersey_bounds(boxes, w_img, h_img, margin_ratio)
+    valid = (bounds[:, 2] > bounds[:, 0]) & (bounds[:, 3] > bounds[:, 1])
+    if not valid.any():
+        return empty
+    b = bounds[valid]
+    # Griglia di campionamento (centri delle celle) per ogni regione: (M, grid) righe e colonne
+    t = (np.arange(grid, dtype=np.float64) + 0.5) / grid
+    ys = (b[:, 1:2] + t[None, :] * (b[:, 3:4] - b[:, 1:2])).astype(np.int64)
+    xs = (b[:, 0:1] + t[None, :] * (b[:, 2:3] - b[:, 0:1])).astype(np.int64)
+    bgr = frame[ys[:, :, None], xs[:, None, :]].reshape(len(b) * grid, grid, 3)
+    hsv = cv2.cvtColor(np.ascontiguousarray(bgr), cv2.COLOR_BGR2HSV)
+    return valid, hsv.reshape(len(b), grid * grid, 3).astype(np.float32)
+
+
+def _descriptors_from_pixels(px: np.ndarray) -> np.ndarray:
+    """Colore medio (H circolare, S, V) dei pixel con saturazione sopra la mediana, per regione. (M, 3)."""
+    sat = px[:, :, 1]
+    mask = sat >= np.median(sat, axis=1, keepdims=True)
+    cnt = mask.sum(axis=1)
+    ang = px[:, :, 0] * (np.pi / 90.0)  # H 0-180 → 0-2π
+    hue = np.degrees(np.arctan2((np.sin(ang) * mask).sum(axis=1), (np.cos(ang) * mask).sum(axis=1))) / 2.0
+    return np.stack([np.mod(hue, 180.0), (sat * mask).sum(axis=1) / cnt, (px[:, :, 2] * mask).sum(axis=1) / cnt], axis=1)
+
+
+def jersey_descriptors(
+    frame: np.ndarray,
+    boxes: List[BoundingBox],
+    grid: int = 16,
+    margin_ratio: float = 0.1,
+) -> np.ndarray:
+    """
+    Colore maglia (H, S, V) per ogni box, calcolato in blocco con NumPy. Shape (N, 3) float32.
+    Ogni regione è campionata su una griglia grid×grid e i pixel campionati di tutti i box passano in
+    una sola conversione HSV; il colore è la media dei pixel con saturazione sopra la mediana della
+    regione (H con media circolare, il rosso resta vicino a 0/180).
+    Approssima il centroide più saturo di extract_dominant_colors_hsv(n_colors=2), ma non è lo stesso
+    valore: i pixel sono quelli della griglia (non fino a 2000 pixel casuali della regione) e la
+    separazione è la soglia sulla mediana della saturazione, non un KMeans sui pixel. Anche il
+    clustering fra box su questi descrittori usa _fit_centroids (init farthest-point + iterazioni di
+    Lloyd), non il KMeans di scikit-learn.
+    Regione vuota → (0, 0, 0).
+    """
+    out = np.zeros((len(boxes), 3), dtype=np.float32)
+    valid, px = _sample_jersey_pixels(frame, boxes, grid, margin_ratio)
+    if len(px):
+        out[valid] = _descriptors_from_pixels(px)
+    return out
+
+
+# Istogramma maglia compatto: JERSEY_HUE_BINS bin di tonalità per i pixel colorati + scuro, grigio, bianco
+JERSEY_HUE_BINS = 12
+JERSEY_HIST_BINS = JERSEY_HUE_BINS + 3
+_CHROMA_MIN_S = 60
+_DARK_MAX_V = 60
+_WHITE_MIN_V = 180
+
+
+def _histograms_from_pixels(px: np.ndarray) -> np.ndarray:
+    """Istogrammi quantizzati (M, JERSEY_HIST_BINS) in percentuale intera dei pixel della regione."""
+    h, s, v = px[:, :, 0], px[:, :, 1], px[:, :, 2]
+    hue_bin = np.minimum((h * JERSEY_HUE_BINS / 180.0).astype(np.int64), JERSEY_HUE_BINS - 1)
+    dark = v < _DARK_MAX_V
+    chroma = ~dark & (s >= _CHROMA_MIN_S)
+    white = ~dark & ~chroma & (v >= _WHITE_MIN_V)
+    bins = np.where(chroma, hue_bin, np.where(dark, JERSEY_HUE_BINS, np.where(white, JERSEY_HUE_BINS + 2, JERSEY_HUE_BINS + 1)))
+    m = len(px)
+    hist = np.zeros((m, JERSEY_HIST_BINS), dtype=np.int64)
+    np.add.at(hist, (np.repeat(np.arange(m), bins.shape[1]), bins.ravel()), 1)
+    return np.rint(100.0 * hist / bins.shape[1]).astype(np.int64)
+
+
+def jersey_histograms(
+    frame: np.ndarray,
+    boxes: List[BoundingBox],
+    grid: int = 16,
+    margin_ratio: float = 0.1,
+) -> np.ndarray:
+    """
+    Istogramma colore compatto della maglia per ogni box. Shape (N, JERSEY_HIST_BINS) int, valori in
+    percentuale dei pixel campionati: JERSEY_HUE_BINS bin di tonalità (pixel con S >= 60), poi
+    scuro (V < 60), grigio e bianco (V >= 180). Regione vuota → tutti zero.
+    """
+    out = np.zeros((len(boxes), JERSEY_HIST_BINS), dtype=np.int64)
+    valid, px = _sample_jersey_pixels(frame, boxes, grid, margin_ratio)
+    if len(px):
+        out[valid] = _histograms_from_pixels(px)
+    return out
+
+
+def describe_jerseys(
+    frame: np.ndarray,
+    boxes: List[BoundingBox],
+) -> List[BoundingBox]:
+    """
+    Solo feature maglia, senza clustering per frame (team classification differita): scrive
+    jersey_hsv e jersey_hist su ogni bbox, team invariato. Le squadre vengono assegnate una volta
+    sola da run_global_team_clustering. Stessa firma di classify_teams; modifica boxes in-place.
+    """
+    valid, px = _sample_jersey_pixels(frame, boxes)
+    if not len(px):
+        return boxes
+    hsv = _descriptors_from_pixels(px)
+    hist = _histograms_from_pixels(px)
+    for j, i in enumerate(np.flatnonzero(valid).tolist()):
+        boxes[i].jersey_hsv = tuple(float(x) for x in hsv[j])
+        boxes[i].jersey_hist = [int(x) for x in hist[j]]
+    return boxes
+
+
+def _hsv_embedding(X: np.ndarray) -> np.ndarray:
+    """
+    HSV → spazio per il clustering: tonalità sul cerchio pesata dalla saturazione, più V.
+    Il rosso vicino a 0 e a 180 resta unito e la tonalità (rumorosa) di bianco/nero pesa poco.
+    """
+    ang = X[:, 0] * (np.pi / 90.0)
+    chroma = X[:, 1] / 255.0
+    return np.stack([chroma * np.cos(ang), chroma * np.sin(ang), X[:, 2] / 255.0], axis=1)
+
+
+def _hsv_mean(X: np.ndarray) -> Tuple[float, float, float]:
+    """Colore medio di un gruppo HSV (H con media circolare). Gruppo vuoto → (0, 0, 0)."""
+    if len(X) == 0:
+        return (0.0, 0.0, 0.0)
+    ang = X[:, 0] * (np.pi / 90.0)
+    h = float(np.mod(np.degrees(np.arctan2(np.sin(ang).sum(), np.cos(ang).sum())) / 2.0, 180.0))
+    return (h, float(X[:, 1].mean()), float(X[:, 2].mean()))
+
+
+def _fit_centroids(X: np.ndarray, k: int, max_iter: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    K-means leggero e deterministico per pochi punti (i box di un frame): inizializzazione
+    farthest-point dal punto più vicino alla media, poi iterazioni di Lloyd fino a convergenza.
+    Ritorna (labels (N,), centers (k, D)).
+    """
+    X = np.asarray(X, dtype=np.float64)
+    first = int(np.argmin(((X - X.mean(axis=0)) ** 2).sum(axis=1)))
+    centers = [X[first]]
+    d2 = ((X - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        nxt = int(np.argmax(d2))
+        centers.append(X[nxt])
+        d2 = np.minimum(d2, ((X - X[nxt]) ** 2).sum(axis=1))
+    centers = np.array(centers)
+    labels = np.full(len(X), -1, dtype=np.int64)
+    for _ in range(max_iter):
+        new_labels = np.argmin(((X[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2), axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = X[labels == c]
+            if len(members):
+                centers[c] = members.mean(axis=0)
+    return labels, centers
+
+
 def _is_referee_jersey_hsv(h: float, s: float, v: float) -> bool:
     """Indica se il colore è tipico maglia arbitro (giallo, giallo-verde lime, giallo/nero).
     Range H ampliato per gialli classici e lime; S/V sufficienti per escludere bianco/scuro."""
@@ -110,23 +303,15 @@ def classify_teams(
             b.team = 0
         return boxes
 
-    features = []
-    valid_idx = []
-    for i, b in enumerate(boxes):
-        reg = extract_jersey_region(frame, b)
-        colors = extract_dominant_colors_hsv(reg, n_colors=2)
-        best = max(colors, key=lambda c: c[1])
-        features.append(best)
-        valid_idx.append(i)
-
-    X = np.array(features)
+    X = jersey_descriptors(frame, boxes).astype(np.float64)
+    features = [tuple(c) for c in X.tolist()]
+    valid_idx = list(range(len(boxes)))
     n = len(features)
 
     if n >= 3:
         # K=3: due squadre + arbitro; etichettiamo i cluster in modo coerente
-        kmeans = KMeans(n_clusters=3, random_state=42, n_init=15)
-        labels_raw = kmeans.fit_predict(X)
-        centers = [tuple(c) for c in kmeans.cluster_centers_]
+        labels_raw, _ = _fit_centroids(_hsv_embedding(X), 3)
+        centers = [_hsv_mean(X[labels_raw == c]) for c in range(3)]
 
         # Quale cluster è arbitro? Il cui centro è più vicino al riferimento giallo-verde
         d_ref = [_hsv_distance(c, _REF_REFEREE_HSV) for c in centers]
@@ -172,9 +357,8 @@ def classify_teams(
                 boxes[valid_idx[j]].team = 0
             return boxes
         sub_X = X[non_ref]
-        kmeans = KMeans(n_clusters=2, random_state=42, n_init=10)
-        labels_raw = kmeans.fit_predict(sub_X)
-        centers = [tuple(c) for c in kmeans.cluster_centers_]
+        labels_raw, _ = _fit_centroids(_hsv_embedding(sub_X), 2)
+        centers = [_hsv_mean(sub_X[labels_raw == c]) for c in range(2)]
         d0_white = _hsv_distance(centers[0], _REF_WHITE_HSV)
         d1_white = _hsv_distance(centers[1], _REF_WHITE_HSV)
         d0_red = _distance_to_red(centers[0])
@@ -0,0 +1,366 @@
+"""
+Archivio colonnare dei track giocatori (player_tracks.npz accanto a player_tracks.json).
+
+Al posto di un dict per detection, una colonna NumPy per campo su tutte le righe della partita e un
+indice per frame:
+
+  frame_index (F,)       campo "frame" di ogni frame (indice campione)
+  frame_offsets (F + 1,) righe del frame i = [frame_offsets[i], frame_offsets[i + 1])
+  video_frame, step (F,) solo con campionamento adattivo (-1 = assente)
+  colonne (N,)           frame, track_id, team, role, x, y, w, h, conf; opzionali x_m, y_m (metri,
+                         se presenti nel JSON; quelle calcolate sono in field_coords.npz), jersey_hsv (N, 3) e jersey_hist (N, K) se presenti
+  tracks                 tabella {track_id: team, hits} di player_tracks.json
+
+player_tracks.json resta scritto per compatibilità (cloud, export) e to_json() lo ricostruisce
+identico (campi di detection fuori da questo schema non vengono conservati); gli stadi di analisi
+leggono l'archivio con load_player_tracks, che ricade sul JSON (e crea l'archivio) se l'npz manca o
+è più vecchio del JSON (es. track scaricati dal cloud).
+
+Le squadre assegnate dopo il tracking (clustering globale, "Ricalcola squadre") non riscrivono i
+track: vanno in player_tracks.teams.json, una mappa track_id → team con numero di revisione e firma
+del player_tracks.json a cui si riferisce. load_player_tracks la applica alla colonna team; se i track
+vengono rigenerati (firma diversa) la mappa è ignorata.
+"""
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+TRACK_STORE_SUFFIX = ".npz"
+TEAM_OVERLAY_SUFFIX = ".teams.json"
+TEAM_OVERLAY_VERSION = 1
+ROLE_NAMES = ("player", "goalie", "referee", "ball", "goal")
+_ROLE_CODES = {name: i for i, name in enumerate(ROLE_NAMES)}
+
+_FLOAT_COLUMNS = ("x", "y", "w", "h")
+
+
+def track_store_path(tracks_json_path) -> Path:
+    """Archivio colonnare per un file di track (player_tracks.json → player_tracks.npz)."""
+    return Path(tracks_json_path).with_suffix(TRACK_STORE_SUFFIX)
+
+
+def team_overlay_path(tracks_json_path) -> Path:
+    """player_tracks.json → player_tracks.teams.json."""
+    p = Path(tracks_json_path)
+    return p.with_name(p.stem + TEAM_OVERLAY_SUFFIX)
+
+
+def file_signature(path) -> Optional[List[int]]:
+    """[mtime_ns, dimensione] del file, None se non esiste."""
+    try:
+        st = Path(path).stat()
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class TrackStore:
+    """
+    Track giocatori in colonne NumPy. meta: campi di primo livello del JSON (width, height, fps,
+    sampling, ...), leggibili anche con get() come sul dict del JSON.
+    """
+
+    def __init__(
+        self,
+        meta: dict,
+        frame_index: np.ndarray,
+        frame_offsets: np.ndarray,
+        columns: Dict[str, np.ndarray],
+        frame_fields: Optional[Dict[str, np.ndarray]] = None,
+        tracks: Optional[Dict[str, np.ndarray]] = None,
+    ):
+        self.meta = meta
+        self.frame_index = frame_index
+        self.frame_offsets = frame_offsets
+        self.columns = columns
+        self.frame_fields = frame_fields or {}
+        self.tracks = tracks or {}
+
+    def __len__(self) -> int:
+        return int(self.frame_offsets[-1])
+
+    @property
+    def n_frames(self) -> int:
+        return len(self.frame_index)
+
+    def get(self, key: str, default=None):
+        """Campo di primo livello come sul dict di player_tracks.json (frames/tracks esclusi)."""
+        return self.meta.get(key, default)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def has(self, column: str) -> bool:
+        return column in self.columns
+
+    def rows(self, i: int) -> slice:
+        """Righe del frame in posizione i."""
+        return slice(int(self.frame_offsets[i]), int(self.frame_offsets[i + 1]))
+
+    def apply_teams(self, track_team: Dict[int, int]) -> None:
+        """Team per track_id su tutte le righe (e nella tabella tracks); track assenti invariati."""
+        if not track_team:
+            return
+        tids = np.fromiter(track_team.keys(), dtype=np.int64)
+        teams = np.fromiter(track_team.values(), dtype=np.int64)
+        order = np.argsort(tids)
+        tids, teams = tids[order], teams[order]
+        for ids, col in ((self.columns["track_id"], self.columns["team"]), (self.tracks.get("id"), self.tracks.get("team"))):
+            if ids is None or not len(ids):
+                continue
+            pos = np.clip(np.searchsorted(tids, ids), 0, len(tids) - 1)
+            hit = tids[pos] == ids
+            col[hit] = teams[pos[hit]]
+
+    def row_frame_pos(self) -> np.ndarray:
+        """Posizione del frame (0..F-1) di ogni riga."""
+        return np.repeat(np.arange(self.n_frames), np.diff(self.frame_offsets))
+
+    def iter_frames(self) -> Iterator[tuple]:
+        """(frame, slice delle righe) per ogni frame, in ordine."""
+        off = self.frame_offsets.tolist()
+        for i, f in enumerate(self.frame_index.tolist()):
+            yield f, slice(off[i], off[i + 1])
+
+    # --- conversione da / verso player_tracks.json ---
+
+    @classmethod
+    def from_json(
+        cls,
+        data: dict,
+        conf: Optional[List[float]] = None,
+        role: Optional[List[Optional[str]]] = None,
+    ) -> "TrackStore":
+        """
+        Archivio dal dict di player_tracks.json. conf, role: valori per riga (in ordine di frame e di
+        detection) quando il chiamante li conosce (il JSON dei track non li riporta).
+        """
+        frames = data.get("frames", [])
+        meta = {k: v for k, v in data.items() if k not in ("frames", "tracks")}
+        dets = [d for fd in frames for d in fd.get("detections", [])]
+        counts = np.array([len(fd.get("detections", [])) for fd in frames], dtype=np.int64)
+        offsets = np.zeros(len(frames) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        frame_index = np.array([fd.get("frame", i) for i, fd in enumerate(frames)], dtype=np.int64)
+        n = len(dets)
+
+        columns: Dict[str, np.ndarray] = {
+            "frame": np.repeat(frame_index, counts).astype(np.int32),
+            "track_id": np.array([d.get("track_id", -1) for d in dets], dtype=np.int32),
+            "team": np.array([d.get("team", -1) for d in dets], dtype=np.int8),
+        }
+        roles = role if role is not None else [d.get("role") for d in dets]
+        columns["role"] = np.array([_ROLE_CODES.get(r, -1) for r in roles], dtype=np.int8)
+        box = np.array([[d.get(k, 0.0) for k in _FLOAT_COLUMNS] for d in dets], dtype=np.float64).reshape(n, 4)
+        for j, k in enumerate(_FLOAT_COLUMNS):
+            columns[k] = np.ascontiguousarray(box[:, j])
+        confs = conf if conf is not None else [d.get("conf") for d in dets]
+        columns["conf"] = np.array([np.nan if c is None else c for c in confs], dtype=np.float32)
+        if any("x_m" in d for d in dets):
+            columns["x_m"] = np.array([d.get("x_m", np.nan) for d in dets], dtype=np.float64)
+            columns["y_m"] = np.array([d.get("y_m", np.nan) for d in dets], dtype=np.float64)
+        if any(d.get("jersey_hsv") for d in dets):
+            hsv = np.full((n, 3), np.nan)
+            for i, d in enumerate(dets):
+                if d.get("jersey_hsv"):
+                    hsv[i] = d["jersey_hsv"][:3]
+            columns["jersey_hsv"] = hsv
+        if any(d.get("jersey_hist") for d in dets):
+            k = max(len(d["jersey_hist"]) for d in dets if d.get("jersey_hist"))
+            hist = np.full((n, k), -1, dtype=np.int16)
+            for i, d in enumerate(dets):
+                if d.get("jersey_hist"):
+                    hist[i, :len(d["jersey_hist"])] = d["jersey_hist"]
+            columns["jersey_hist"] = hist
+
+        frame_fields = {}
+        if meta.get("sampling"):
+            for key in ("video_frame", "step"):
+                frame_fields[key] = np.array(
+                    [-1 if fd.get(key) is None else fd[key] for fd in frames], dtype=np.int64
+                )
+        table = data.get("tracks") or {}
+        tracks = {
+            "id": np.array([int(t) for t in table], dtype=np.int64),
+            "team": np.array([v.get("team", -1) for v in table.values()], dtype=np.int8),
+            "hits": np.array([v.get("hits", 0) for v in table.values()], dtype=np.int64),
+        }
+        return cls(meta, frame_index, offsets, columns, frame_fields, tracks)
+
+    def to_json(self) -> dict:
+        """Dict nel formato di player_tracks.json (stesso contenuto e ordine delle chiavi)."""
+        cols = {k: self.columns[k].tolist() for k in ("x", "y", "w", "h", "team", "track_id")}
+        hsv = self.columns.get("jersey_hsv")
+        hist = self.columns.get("jersey_hist")
+        has_hsv = (~np.isnan(hsv).any(axis=1)).tolist() if hsv is not None else None
+        has_hist = (hist[:, 0] >= 0).tolist() if hist is not None else None
+        x_m = self.columns.get("x_m")
+        has_m = (~np.isnan(x_m)).tolist() if x_m is not None else None
+        xy_m = np.column_stack([x_m, self.columns["y_m"]]).tolist() if x_m is not None else None
+        hsv_l = hsv.tolist() if hsv is not None else None
+        hist_l = hist.tolist() if hist is not None else None
+        frame_fields = {k: v.tolist() for k, v in self.frame_fields.items()}
+
+        frames = []
+        for i, (f, sl) in enumerate(self.iter_frames()):
+            dets = []
+            for r in range(sl.start, sl.stop):
+                d = {
+                    "x": cols["x"][r], "y": cols["y"][r], "w": cols["w"][r], "h": cols["h"][r],
+                    "team": cols["team"][r],
+                    "track_id": cols["track_id"][r],
+                }
+                if has_hsv is not None and has_hsv[r]:
+                    d["jersey_hsv"] = hsv_l[r]
+                if has_hist is not None and has_hist[r]:
+                    d["jersey_hist"] = [v for v in hist_l[r] if v >= 0]
+                if has_m is not None and has_m[r]:
+                    d["x_m"], d["y_m"] = xy_m[r]
+                dets.append(d)
+            fd = {"frame": f, "detections": dets}
+            for key, values in frame_fields.items():
+                fd[key] = None if values[i] < 0 else values[i]
+            frames.append(fd)
+
+        out = {"frames": frames}
+        meta = dict(self.meta)
+        sampling = meta.pop("sampling", None)
+        out.update(meta)
+        out["tracks"] = {
+            str(t): {"team": team, "hits": hits}
+            for t, team, hits in zip(
+                self.tracks.get("id", np.zeros(0)).tolist(),
+                self.tracks.get("team", np.zeros(0)).tolist(),
+                self.tracks.get("hits", np.zeros(0)).tolist(),
+            )
+        }
+        if sampling:
+            out["sampling"] = sampling
+        return out
+
+    # --- file .npz ---
+
+    def save(self, path) -> None:
+        """Scrive l'archivio (.npz non compresso: caricamento senza decompressione)."""
+        arrays = {"frame_index": self.frame_index, "frame_offsets": self.frame_offsets}
+        arrays.update({f"col_{k}": v for k, v in self.columns.items()})
+        arrays.update({f"ff_{k}": v for k, v in self.frame_fields.items()})
+        arrays.update({f"trk_{k}": v for k, v in self.tracks.items()})
+        arrays["meta"] = np.array(json.dumps(self.meta))
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path) -> "TrackStore":
+        with np.load(path, allow_pickle=False) as z:
+            arrays = {k: z[k] for k in z.files}
+        columns = {k[4:]: v for k, v in arrays.items() if k.startswith("col_")}
+        frame_fields = {k[3:]: v for k, v in arrays.items() if k.startswith("ff_")}
+        tracks = {k[4:]: v for k, v in arrays.items() if k.startswith("trk_")}
+        meta = json.loads(str(arrays["meta"]))
+        return cls(meta, arrays["frame_index"], arrays["frame_offsets"], columns, frame_fields, tracks)
+
+
+def stabilize_teams(track_id: np.ndarray, team: np.ndarray) -> np.ndarray:
+    """
+    Team per riga sostituito dalla moda del suo track_id (a parità, il team visto per primo, come
+    Counter.most_common). Vettoriale su tutte le righe.
+    """
+    if not len(track_id):
+        return team.copy()
+    pairs = np.stack([track_id.astype(np.int64), team.astype(np.int64)], axis=1)
+    uniq, first, inverse, counts = np.unique(pairs, axis=0, return_index=True, return_inverse=True, return_counts=True)
+    order = np.lexsort((first, -counts, uniq[:, 0]))
+    tids = uniq[order, 0]
+    best = order[np.r_[True, tids[1:] != tids[:-1]]]
+    mode = dict(zip(uniq[best, 0].tolist(), uniq[best, 1].tolist()))
+    return np.array([mode[t] for t in uniq[:, 0].tolist()], dtype=team.dtype)[inverse.reshape(-1)]
+
+
+def write_player_tracks(tracks_json_path, store: TrackStore, data: Optional[dict] = None) -> None:
+    """
+    Scrive player_tracks.npz e l'export player_tracks.json. data: dict JSON già disponibile
+    (evita to_json), deve corrispondere a store. Track nuovi: la mappa squadre precedente è rimossa.
+    """
+    if data is None:
+        data = store.to_json()
+    Path(tracks_json_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(tracks_json_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    store.save(track_store_path(tracks_json_path))  # dopo il JSON: mtime non più vecchio
+    try:
+        team_overlay_path(tracks_json_path).unlink()
+    except OSError:
+        pass
+
+
+def read_team_overlay(tracks_json_path) -> Optional[dict]:
+    """
+    Mappa squadre valida per i track attuali: {"revision": int, "teams": {track_id: team}}.
+    None se assente, di un'altra versione o riferita a un player_tracks.json diverso.
+    """
+    try:
+        with open(team_overlay_path(tracks_json_path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != TEAM_OVERLAY_VERSION or data.get("tracks") != file_signature(tracks_json_path):
+        return None
+    return {"revision": data.get("revision", 0), "teams": {int(t): int(v) for t, v in (data.get("teams") or {}).items()}}
+
+
+def write_team_overlay(tracks_json_path, track_team: Dict[int, int]) -> int:
+    """Scrive la mappa track_id → team per i track attuali (revisione successiva). Ritorna la revisione."""
+    previous = read_team_overlay(tracks_json_path)
+    revision = (previous["revision"] + 1) if previous else 1
+    data = {
+        "version": TEAM_OVERLAY_VERSION,
+        "revision": revision,
+        "tracks": file_signature(tracks_json_path),
+        "teams": {str(t): int(v) for t, v in sorted(track_team.items())},
+    }
+    path = team_overlay_path(tracks_json_path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    tmp.replace(path)
+    return revision
+
+
+def _load_base_tracks(json_path: Path) -> Optional[TrackStore]:
+    npz_path = track_store_path(json_path)
+    if npz_path.exists() and (not json_path.exists() or npz_path.stat().st_mtime >= json_path.stat().st_mtime):
+        try:
+            return TrackStore.load(npz_path)
+        except (OSError, ValueError, KeyError):
+            pass
+    if not json_path.exists():
+        return None
+    with open(json_path, "r", encoding="utf-8") as f:
+        store = TrackStore.from_json(json.load(f))
+    try:
+        store.save(npz_path)
+    except OSError:
+        pass
+    return store
+
+
+def load_player_tracks(tracks_json_path, apply_teams: bool = True) -> Optional[TrackStore]:
+    """
+    Track giocatori di un progetto: dall'archivio .npz se aggiornato, altrimenti da player_tracks.json
+    (l'archivio viene creato per le letture successive), con la mappa squadre applicata se valida
+    (apply_teams=False: team del tracking). None se non esiste nessuno dei due.
+    """
+    json_path = Path(tracks_json_path)
+    store = _load_base_tracks(json_path)
+    if store is not None and apply_teams:
+        overlay = read_team_overlay(json_path)
+        if overlay:
+            store.apply_teams(overlay["teams"])
+    return store
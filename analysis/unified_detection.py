@@ -0,0 +1,174 @@
+"""
+Detection unificata giocatori + palla in un solo passaggio sul video.
+Ogni frame campionato viene decodificato una volta sola e passa una sola volta
+nel modello soccer (8 classi): dalle stesse detection si ricavano
+player_detections.json (tutte le classi, come run_player_detection) e
+ball_detections.json (miglior candidato Ball/football per frame, come run_ball_detection).
+"""
+from typing import Callable, Optional, Tuple
+import threading
+
+import cv2
+
+from .adaptive_sampling import AdaptiveSampling
+from .ball_detection import _ball_to_json, _best_ball
+from .checkpoint_log import CheckpointLog, read_checkpoint_tail
+from .detection_pipeline import PipelineCancelled, run_detection_pipeline
+from .frame_sampler import frame_step_for
+from .player_detection import (
+    DetectionBatch,
+    create_player_detector,
+    _filter_batch_to_field,
+    _frame_detections_json,
+    _iter_sampled_frames,
+    _make_infer_fn,
+    _progress_count,
+    _sampled_count,
+    _sampling_fields,
+    _set_frame_meta,
+    _team_fn,
+    _to_scalar,
+)
+
+
+def run_unified_detection(
+    video_path: str,
+    player_output_path: str,
+    ball_output_path: str,
+    conf_thresh: float = 0.20,
+    ball_conf_thresh: float = 0.12,
+    classify_teams: bool = True,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    target_fps: float = 10.0,
+    calibration_path: Optional[str] = None,
+    checkpoint_interval: int = 0,
+    first_checkpoint: int = 500,
+    start_frame: int = 0,
+    initial_player_results: Optional[dict] = None,
+    initial_ball_results: Optional[dict] = None,
+    batch_size: int = 1,
+    prefetch: int = 0,
+    cancel_event: Optional[threading.Event] = None,
+    stats_callback: Optional[Callable[[dict], None]] = None,
+    frame_range: Optional[Tuple[int, Optional[int]]] = None,
+    adaptive: Optional[AdaptiveSampling] = None,
+    resume: bool = False,
+    defer_teams: bool = False,
+    frame_callback: Optional[Callable[[dict, dict], None]] = None,
+) -> Tuple[bool, str]:
+    """
+    Esegue player + ball detection con una sola decodifica e un solo forward pass per frame.
+    Ritorna (True, "") se ok, (False, messaggio_errore) altrimenti.
+    conf_thresh: soglia per le detection in player_detections.json.
+    ball_conf_thresh: soglia per il candidato palla in ball_detections.json.
+    Gli altri parametri (batch_size, prefetch, cancel_event, stats_callback, frame_range, adaptive, defer_teams,
+    frame_callback, ...) hanno lo stesso significato di run_player_detection (frame_callback riceve i frame
+    giocatori); i log di checkpoint dei due file vengono scritti agli stessi frame, così la ripresa è
+    allineata (resume: solo se i due log finiscono allo stesso frame).
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return False, "Impossibile aprire il video. Verifica che il percorso sia corretto e il file non sia corrotto."
+
+    # Un'unica inference alla soglia più bassa; le due uscite filtrano poi con la propria soglia
+    detector = create_player_detector(conf_thresh=min(conf_thresh, ball_conf_thresh))
+    if not detector._init_predictor():
+        init_err = detector.get_init_error() or "YOLOX non disponibile"
+        cap.release()
+        return False, f"YOLOX non inizializzato: {init_err}"
+    team_fn = _team_fn(classify_teams, defer_teams)
+
+    batch_size = max(1, int(batch_size or 1))
+    total = int(_to_scalar(cap.get(cv2.CAP_PROP_FRAME_COUNT))) or 0
+    video_fps = _to_scalar(cap.get(cv2.CAP_PROP_FPS)) or 25.0
+    frame_step = frame_step_for(video_fps, target_fps)  # target_fps <= 0 → legacy (1 ogni 2)
+    if adaptive is not None:
+        frame_step = adaptive.steps(video_fps)[0]
+    total_to_process = _sampled_count(total, frame_step, frame_range)
+    range_start, range_end = frame_range or (0, None)
+
+    def _empty_results() -> dict:
+        res = {"frames": [], "width": 0, "height": 0, "fps": video_fps, "frame_step": frame_step, "target_fps": target_fps if target_fps > 0 else None, "crop_bounds": None}
+        if adaptive is not None:
+            res["sampling"] = adaptive.as_dict(video_fps)
+        return res
+
+    resuming = (
+        start_frame > 0
+        and not resume
+        and initial_player_results is not None
+        and initial_ball_results is not None
+        and len(initial_player_results.get("frames", [])) == len(initial_ball_results.get("frames", []))
+    )
+    if resuming:
+        player_results = initial_player_results
+        ball_results = initial_ball_results
+    else:
+        player_results = _empty_results()
+        ball_results = _empty_results()
+        start_frame = 0
+    if resume:
+        tail_p = read_checkpoint_tail(player_output_path)
+        resume = tail_p is not None and tail_p == read_checkpoint_tail(ball_output_path)
+    player_log = CheckpointLog(player_output_path, player_results, checkpoint_interval, first_checkpoint, resume=resume)
+    ball_log = CheckpointLog(ball_output_path, ball_results, checkpoint_interval, first_checkpoint, resume=resume)
+    if player_log.start_frame is not None:
+        start_frame = player_log.start_frame
+    start_frame = max(start_frame, range_start)
+    state = {"last_pct": -1, "processed": player_log.count}
+
+    def _emit(sf, batch: DetectionBatch) -> None:
+        """Divide le detection del frame tra output giocatori e palla e gestisce checkpoint/progress."""
+        _set_frame_meta(player_results, sf, video_fps)
+        _set_frame_meta(ball_results, sf, video_fps)
+        fidx, frame_to_detect, bounds = sf.index, sf.image, sf.crop_bounds
+        best = _best_ball(batch, ball_conf_thresh)
+        ball_log.append({"frame": fidx, "detection": _ball_to_json(best, bounds), **_sampling_fields(sf)})
+
+        player_batch = batch.select(batch.conf >= conf_thresh)
+        h_det, w_det = frame_to_detect.shape[:2]
+        player_batch = _filter_batch_to_field(player_batch, w_det, h_det, bounds)
+        player_frame = {
+            "frame": fidx,
+            "detections": _frame_detections_json(player_batch, frame_to_detect, bounds, team_fn),
+            **_sampling_fields(sf),
+        }
+        player_log.append(player_frame)
+        if frame_callback:
+            frame_callback(player_frame, player_results)
+        state["processed"] += 1
+        processed_count = _progress_count(sf, state["processed"], frame_step, frame_range)
+
+        if total_to_process > 0 and progress_callback:
+            pct = int(100 * processed_count / total_to_process)
+            if pct != state["last_pct"] and (pct % 5 == 0 or pct >= 100):
+                progress_callback(processed_count, total_to_process, f"Frame {processed_count}/{total_to_process}")
+                state["last_pct"] = pct
+
+    try:
+        stats = run_detection_pipeline(
+            _iter_sampled_frames(cap, frame_step, calibration_path, start_frame, range_end, adaptive),
+            _make_infer_fn(detector, batch_size),
+            _emit,
+            batch_size=batch_size,
+            threaded=prefetch > 0,
+            queue_size=prefetch,
+            cancel_event=cancel_event,
+        )
+        cap.release()
+        if stats_callback:
+            stats_callback(stats.as_dict())
+
+        player_log.finish()
+        ball_log.finish()
+
+        if progress_callback and total_to_process > 0:
+            progress_callback(total_to_process, total_to_process, "Completato")
+        return True, ""
+    except PipelineCancelled:
+        cap.release()
+        return False, "Analisi interrotta."
+    except Exception as e:
+        if cap.isOpened():
+            cap.release()
+        return False, str(e)
@@ -4,18 +4,27 @@ Analysis Engine - Motore di analisi in processo separato.
 
 Esegue player detection, player tracking, ball detection, ball tracking
 su video di partite. Può essere lanciato da Football Analyzer (Qt) o da CLI.
+In modalità full la detection player + ball avviene in un solo passaggio sul video
+(--separate-passes per il comportamento legacy a due passaggi).
 
 Uso:
   python analysis_engine.py --video path/to/video.mp4 --output path/to/project_analysis_dir --mode full
   python analysis_engine.py --video video.mp4 --output ./out --mode player
   python analysis_engine.py --video video.mp4 --output ./out --mode ball
+  python analysis_engine.py --video video.mp4 --output ./out --mode full --batch-size 8
+  python analysis_engine.py --video video.mp4 --output ./out --mode full --workers 4
+  python analysis_engine.py --video video.mp4 --output ./out --mode full --adaptive-sampling --min-fps 2
+  python analysis_engine.py --video video.mp4 --output ./out --mode full --auto-tune
 
 Output: progress.json e finished.json nella cartella output per monitoraggio.
 """
 import argparse
 import json
 import os
+import signal
 import sys
+import threading
+import time
 from pathlib import Path
 
 # Aggiungi la root del progetto al path
@@ -24,6 +33,24 @@ if str(_SCRIPT_DIR) not in sys.path:
     sys.path.insert(0, str(_SCRIPT_DIR))
 
 
+# Impostato da SIGTERM/SIGINT: la pipeline di detection si ferma in modo pulito
+_CANCEL_EVENT = threading.Event()
+
+
+def _install_cancel_handler():
+    """Su SIGTERM/SIGINT imposta _CANCEL_EVENT invece di terminare a metà scrittura (no-op dove non supportato)."""
+    def _on_signal(signum, frame):
+        _CANCEL_EVENT.set()
+    for name in ("SIGTERM", "SIGINT"):
+        sig = getattr(signal, name, None)
+        if sig is None:
+            continue
+        try:
+            signal.signal(sig, _on_signal)
+        except (ValueError, OSError):
+            pass
+
+
 def _set_low_priority():
     """Imposta priorità bassa del processo (PC utilizzabile durante analisi)."""
     try:
@@ -72,36 +99,136 @@ def _write_finished(output_dir: Path, success: bool, outputs: list, error_msg: s
         pass
 
 
-def _find_latest_checkpoint(output_path: Path) -> tuple[int, dict] | None:
+def _write_pipeline_stats(output_dir: Path, phase: str, stats: dict):
+    """Aggiunge a pipeline_stats.json i tempi per stadio (decode/inference/post) della fase."""
+    p = output_dir / "pipeline_stats.json"
+    data = {}
+    try:
+        if p.exists():
+            with open(p, "r", encoding="utf-8") as f:
+                data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        data = {}
+    data[phase] = stats
+    try:
+        with open(p, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+    except OSError:
+        pass
+
+
+def _find_latest_checkpoint(output_path: Path, since: float = 0.0) -> tuple[int, dict] | None:
     """
-    Trova l'ultimo checkpoint per output_path (es. .../player_detections.json).
+    Risultati parziali dal log di checkpoint di output_path (es. .../player_detections.json).
     Ritorna (start_frame, results) dove start_frame è il primo frame da processare,
-    o None se nessun checkpoint valido.
+    o None se nessun checkpoint valido. since: ignora un log modificato prima (timestamp).
     """
-    import re
-    parent = Path(output_path).parent
-    stem = Path(output_path).stem
-    matches = list(parent.glob(f"{stem}_checkpoint_*.json"))
-    if not matches:
+    from analysis.checkpoint_log import checkpoint_log_path, read_checkpoint
+
+    log_path = checkpoint_log_path(output_path)
+    try:
+        if not log_path.exists() or (since and log_path.stat().st_mtime < since):
+            return None
+        data = read_checkpoint(output_path)
+    except (OSError, json.JSONDecodeError):
         return None
-    frame_nums = []
-    for m in matches:
-        mobj = re.search(r"_checkpoint_(\d+)\.json$", m.name)
-        if mobj:
-            frame_nums.append((int(mobj.group(1)), m))
-    if not frame_nums:
+    if not data:
         return None
-    _, best_path = max(frame_nums, key=lambda x: x[0])
+    return (data["frames"][-1].get("frame", -1) + 1, data)
+
+
+def _cache_key(cache, kind: str, video_path: str, mode: str, fps: float, calibration_path: str, adaptive, **params) -> str | None:
+    """Chiave della cache detection per player/ball_detections.json (None se cache disattivata o modello assente)."""
+    if cache is None:
+        return None
+    from dataclasses import asdict
+    from analysis import config
+    from analysis.detection_cache import cache_key
+    from analysis.player_detection import _load_field_bounds
+
+    bounds = _load_field_bounds(calibration_path)
+    params.update(
+        input_size=config.INPUT_SIZE,
+        mode=mode,
+        target_fps=fps,
+        crop_bounds=[int(b) for b in bounds] if bounds else None,
+        adaptive=asdict(adaptive) if adaptive is not None else None,
+    )
     try:
-        with open(best_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except (OSError, json.JSONDecodeError):
+        return cache_key(kind, video_path, params)
+    except OSError:
         return None
-    frames = data.get("frames", [])
-    if not frames:
+
+
+def _cache_lookup(cache, key: str | None, output_path: Path):
+    """CacheHit per la chiave (voce completa già copiata in output_path) o None."""
+    if cache is None or key is None:
+        return None
+    try:
+        return cache.lookup(key, str(output_path))
+    except OSError:
         return None
-    last_frame = frames[-1].get("frame", -1)
-    return (last_frame + 1, data)
+
+
+def _cache_store(cache, key: str | None, output_path: Path, ok: bool, since: float) -> None:
+    """Detection completata → voce completa; interrotta o fallita → voce parziale dall'ultimo checkpoint di questa esecuzione."""
+    if cache is None or key is None:
+        return
+    try:
+        if ok:
+            cache.store(key, source_path=str(output_path))
+            return
+        ckpt = _find_latest_checkpoint(output_path, since=since)
+        if ckpt:
+            cache.store(key, data=ckpt[1], complete=False, next_frame=ckpt[0])
+    except OSError:
+        pass
+
+
+def _run_sharded(
+    video_path: str,
+    output_dir: Path,
+    mode: str,
+    phase: str,
+    fps: float,
+    calibration_path: str,
+    workers: int,
+    batch_size: int = 1,
+    prefetch: int = 0,
+    ball_roi: bool = False,
+    adaptive=None,
+    defer_teams: bool = False,
+) -> tuple[bool, str]:
+    """Detection con `workers` processi su shard temporali (--workers N), risultati uniti nei JSON standard."""
+    from analysis.sharded_detection import run_sharded_detection
+    from analysis.player_detection import get_detections_path
+    from analysis.ball_detection import get_ball_detections_path
+
+    project_dir = str(output_dir.parent)
+
+    def on_progress(cur: int, total: int, msg: str):
+        _write_progress(output_dir, phase, cur, total, msg)
+
+    return run_sharded_detection(
+        video_path,
+        mode=mode,
+        player_output_path=str(get_detections_path(project_dir)),
+        ball_output_path=str(get_ball_detections_path(project_dir)),
+        workers=workers,
+        conf_thresh=0.20,
+        ball_conf_thresh=0.12,
+        classify_teams=True,
+        progress_callback=on_progress,
+        target_fps=fps,
+        calibration_path=calibration_path,
+        batch_size=batch_size,
+        prefetch=prefetch,
+        cancel_event=_CANCEL_EVENT,
+        stats_callback=lambda st: _write_pipeline_stats(output_dir, phase, st),
+        ball_roi=ball_roi,
+        adaptive=adaptive,
+        defer_teams=defer_teams,
+    )
 
 
 def _run_player_pipeline(
@@ -112,10 +239,23 @@ def _run_player_pipeline(
     checkpoint_interval: int,
     first_checkpoint: int,
     resume: bool = False,
+    batch_size: int = 1,
+    prefetch: int = 0,
+    workers: int = 1,
+    adaptive=None,
+    cache=None,
+    defer_teams: bool = False,
+    stream_tracking: bool = False,
 ) -> tuple[bool, str]:
-    """Esegue player detection + player tracking."""
+    """
+    Esegue player detection + player tracking. adaptive: AdaptiveSampling (--adaptive-sampling) o None.
+    cache: DetectionCache o None; voce completa → niente detection, voce parziale → ripresa a metà video.
+    defer_teams: solo feature maglia in detection, squadre dal clustering globale (--defer-teams).
+    stream_tracking: tracking dentro il loop di detection (--stream-tracking), vedi _stream_tracker.
+    """
+    from analysis.checkpoint_log import read_checkpoint_tail
     from analysis.player_detection import run_player_detection, get_detections_path
-    from analysis.player_tracking import run_player_tracking, get_tracks_path
+    from analysis.player_tracking import get_tracks_path
 
     project_dir = str(output_dir.parent)
     detections_path = Path(get_detections_path(project_dir))
@@ -123,41 +263,87 @@ def _run_player_pipeline(
 
     start_frame = 0
     initial_results = None
-    if resume and checkpoint_interval > 0:
-        ckpt = _find_latest_checkpoint(detections_path)
-        if ckpt:
-            start_frame, initial_results = ckpt
+    resume = resume and checkpoint_interval > 0 and read_checkpoint_tail(detections_path) is not None
+    params = dict(conf_thresh=0.20, classify_teams=True)
+    if defer_teams:
+        params["defer_teams"] = True
+    key = _cache_key(cache, "player", video_path, "player", fps, calibration_path, adaptive, **params)
+    hit = _cache_lookup(cache, key, detections_path)
+    if hit is not None and not hit.complete and workers <= 1 and not resume:
+        start_frame, initial_results = hit.next_frame, hit.data
+    started = time.time()
+    tracker = _stream_tracker(stream_tracking, hit is None or not hit.complete, workers, start_frame, resume)
 
     def on_progress(cur: int, total: int, msg: str):
         _write_progress(output_dir, "player_detection", cur, total, msg)
 
-    ok, err_msg = run_player_detection(
-        video_path,
-        str(detections_path),
-        conf_thresh=0.20,
-        classify_teams=True,
-        progress_callback=on_progress,
-        target_fps=fps,
-        calibration_path=calibration_path,
-        checkpoint_interval=checkpoint_interval,
-        first_checkpoint=first_checkpoint,
-        start_frame=start_frame,
-        initial_results=initial_results,
-    )
+    if hit is not None and hit.complete:
+        ok, err_msg = True, ""
+        _write_progress(output_dir, "player_detection", 1, 1, "Detection da cache")
+    elif workers > 1:
+        ok, err_msg = _run_sharded(
+            video_path, output_dir, "player", "player_detection", fps, calibration_path, workers, batch_size, prefetch,
+            adaptive=adaptive, defer_teams=defer_teams,
+        )
+    else:
+        ok, err_msg = run_player_detection(
+            video_path,
+            str(detections_path),
+            conf_thresh=0.20,
+            classify_teams=True,
+            progress_callback=on_progress,
+            target_fps=fps,
+            calibration_path=calibration_path,
+            checkpoint_interval=checkpoint_interval,
+            first_checkpoint=first_checkpoint,
+            start_frame=start_frame,
+            initial_results=initial_results,
+            batch_size=batch_size,
+            prefetch=prefetch,
+            cancel_event=_CANCEL_EVENT,
+            stats_callback=lambda st: _write_pipeline_stats(output_dir, "player_detection", st),
+            adaptive=adaptive,
+            resume=resume,
+            defer_teams=defer_teams,
+            frame_callback=tracker.feed if tracker is not None else None,
+        )
+    if hit is None or not hit.complete:
+        _cache_store(cache, key, detections_path, ok, started)
     if not ok:
         return False, err_msg or "Player detection fallita."
 
+    if not _finish_player_tracking(tracker, detections_path, tracks_path, output_dir):
+        return False, "Player tracking fallito."
+    return True, ""
+
+
+def _stream_tracker(stream_tracking: bool, detect: bool, workers: int, start_frame: int, resume: bool):
+    """
+    PlayerTracker da passare come frame_callback alla detection (--stream-tracking), o None.
+    Solo se la detection parte da zero in un solo processo: con cache, shard o ripresa i frame non
+    passano tutti dal loop e il tracking resta il passaggio separato su player_detections.json.
+    """
+    if not stream_tracking or not detect or workers > 1 or start_frame > 0 or resume:
+        return None
+    from analysis.player_tracking import PlayerTracker
+    return PlayerTracker()
+
+
+def _finish_player_tracking(tracker, detections_path: Path, tracks_path: str, output_dir: Path) -> bool:
+    """Scrive player_tracks.json: dal tracker in streaming se presente, altrimenti run_player_tracking."""
+    from analysis.player_tracking import run_player_tracking
+
+    if tracker is not None:
+        if not tracker.frames:
+            return False
+        tracker.save(tracks_path)
+        _write_progress(output_dir, "player_tracking", 1, 1, "Tracking in streaming completato")
+        return True
+
     def on_progress_trk(cur: int, total: int, msg: str):
         _write_progress(output_dir, "player_tracking", cur, total, msg)
 
-    ok = run_player_tracking(
-        detections_path,
-        tracks_path,
-        progress_callback=on_progress_trk,
-    )
-    if not ok:
-        return False, "Player tracking fallito."
-    return True, ""
+    return run_player_tracking(detections_path, tracks_path, progress_callback=on_progress_trk)
 
 
 def _run_ball_pipeline(
@@ -168,8 +354,19 @@ def _run_ball_pipeline(
     checkpoint_interval: int,
     first_checkpoint: int,
     resume: bool = False,
+    prefetch: int = 0,
+    workers: int = 1,
+    roi: bool = False,
+    adaptive=None,
+    cache=None,
+    ball_max_gap: int = 10,
 ) -> tuple[bool, str]:
-    """Esegue ball detection + ball tracking."""
+    """
+    Esegue ball detection + ball tracking. roi: inference palla su ROI attorno alla posizione prevista.
+    adaptive: AdaptiveSampling (--adaptive-sampling) o None. cache: come in _run_player_pipeline.
+    ball_max_gap: buchi (campioni) riempiti dall'interpolazione della traiettoria palla (0 = off).
+    """
+    from analysis.checkpoint_log import read_checkpoint_tail
     from analysis.ball_detection import run_ball_detection, get_ball_detections_path, _get_yolox_predictor
     from analysis.ball_tracking import run_ball_tracking, get_ball_tracks_path
 
@@ -177,33 +374,56 @@ def _run_ball_pipeline(
     detections_path = Path(get_ball_detections_path(project_dir))
     tracks_path = str(get_ball_tracks_path(project_dir))
 
-    predictor, err = _get_yolox_predictor()
-    if predictor is None:
-        return False, err or "YOLOX non inizializzato."
+    key = _cache_key(cache, "ball", video_path, "ball", fps, calibration_path, adaptive, conf_thresh=0.12, roi=roi)
+    hit = _cache_lookup(cache, key, detections_path)
+    cached = hit is not None and hit.complete
+
+    predictor = None
+    if workers <= 1 and not cached:  # con --workers ogni processo carica il proprio modello
+        predictor, err = _get_yolox_predictor()
+        if predictor is None:
+            return False, err or "YOLOX non inizializzato."
 
     start_frame = 0
     initial_results = None
-    if resume and checkpoint_interval > 0:
-        ckpt = _find_latest_checkpoint(detections_path)
-        if ckpt:
-            start_frame, initial_results = ckpt
+    resume = resume and checkpoint_interval > 0 and read_checkpoint_tail(detections_path) is not None
+    if hit is not None and not cached and workers <= 1 and not resume:
+        start_frame, initial_results = hit.next_frame, hit.data
+    started = time.time()
 
     def on_progress(cur: int, total: int, msg: str):
         _write_progress(output_dir, "ball_detection", cur, total, msg)
 
-    ok, err_msg = run_ball_detection(
-        video_path,
-        str(detections_path),
-        conf_thresh=0.12,
-        progress_callback=on_progress,
-        predictor=predictor,
-        target_fps=fps,
-        calibration_path=calibration_path,
-        checkpoint_interval=checkpoint_interval,
-        first_checkpoint=first_checkpoint,
-        start_frame=start_frame,
-        initial_results=initial_results,
-    )
+    if cached:
+        ok, err_msg = True, ""
+        _write_progress(output_dir, "ball_detection", 1, 1, "Detection da cache")
+    elif workers > 1:
+        ok, err_msg = _run_sharded(
+            video_path, output_dir, "ball", "ball_detection", fps, calibration_path, workers, prefetch=prefetch, ball_roi=roi,
+            adaptive=adaptive,
+        )
+    else:
+        ok, err_msg = run_ball_detection(
+            video_path,
+            str(detections_path),
+            conf_thresh=0.12,
+            progress_callback=on_progress,
+            predictor=predictor,
+            target_fps=fps,
+            calibration_path=calibration_path,
+            checkpoint_interval=checkpoint_interval,
+            first_checkpoint=first_checkpoint,
+            start_frame=start_frame,
+            initial_results=initial_results,
+            prefetch=prefetch,
+            cancel_event=_CANCEL_EVENT,
+            stats_callback=lambda st: _write_pipeline_stats(output_dir, "ball_detection", st),
+            roi_mode=roi,
+            adaptive=adaptive,
+            resume=resume,
+        )
+    if not cached:
+        _cache_store(cache, key, detections_path, ok, started)
     if not ok:
         return False, err_msg or "Ball detection fallita."
 
@@ -214,12 +434,156 @@ def _run_ball_pipeline(
         detections_path,
         tracks_path,
         progress_callback=on_progress_trk,
+        max_gap=ball_max_gap,
     )
     if not ok:
         return False, "Ball tracking fallito."
     return True, ""
 
 
+def _run_unified_pipeline(
+    video_path: str,
+    output_dir: Path,
+    fps: float,
+    calibration_path: str,
+    checkpoint_interval: int,
+    first_checkpoint: int,
+    resume: bool = False,
+    batch_size: int = 1,
+    prefetch: int = 0,
+    workers: int = 1,
+    adaptive=None,
+    cache=None,
+    defer_teams: bool = False,
+    stream_tracking: bool = False,
+    ball_max_gap: int = 10,
+) -> tuple[bool, str]:
+    """
+    Esegue detection unificata (player + ball, una sola decodifica) + player/ball tracking.
+    adaptive: AdaptiveSampling (--adaptive-sampling) o None. defer_teams, stream_tracking: come in
+    _run_player_pipeline. ball_max_gap: come in _run_ball_pipeline.
+    cache: DetectionCache o None; serve una voce per ciascuno dei due file (ripresa solo se allineate).
+    """
+    from analysis.checkpoint_log import read_checkpoint_tail
+    from analysis.unified_detection import run_unified_detection
+    from analysis.player_detection import get_detections_path
+    from analysis.ball_detection import get_ball_detections_path
+    from analysis.player_tracking import get_tracks_path
+    from analysis.ball_tracking import run_ball_tracking, get_ball_tracks_path
+
+    project_dir = str(output_dir.parent)
+    player_det_path = Path(get_detections_path(project_dir))
+    ball_det_path = Path(get_ball_detections_path(project_dir))
+
+    start_frame = 0
+    initial_player = None
+    initial_ball = None
+    if resume and checkpoint_interval > 0:
+        # Ripresa solo se i due log di checkpoint sono allineati allo stesso frame
+        tail_p = read_checkpoint_tail(player_det_path)
+        resume = tail_p is not None and tail_p == read_checkpoint_tail(ball_det_path)
+    else:
+        resume = False
+    params = dict(conf_thresh=0.20, ball_conf_thresh=0.12, classify_teams=True)
+    if defer_teams:
+        params["defer_teams"] = True
+    key_p = _cache_key(cache, "player", video_path, "unified", fps, calibration_path, adaptive, **params)
+    key_b = _cache_key(cache, "ball", video_path, "unified", fps, calibration_path, adaptive, **params)
+    hit_p = _cache_lookup(cache, key_p, player_det_path)
+    hit_b = _cache_lookup(cache, key_b, ball_det_path)
+    cached = hit_p is not None and hit_b is not None and hit_p.complete and hit_b.complete
+    if (
+        not cached and hit_p is not None and hit_b is not None and workers <= 1 and not resume
+        and not hit_p.complete and not hit_b.complete and hit_p.next_frame == hit_b.next_frame
+    ):
+        start_frame, initial_player, initial_ball = hit_p.next_frame, hit_p.data, hit_b.data
+    started = time.time()
+    tracker = _stream_tracker(stream_tracking, not cached, workers, start_frame, resume)
+
+    def on_progress(cur: int, total: int, msg: str):
+        _write_progress(output_dir, "detection", cur, total, msg)
+
+    if cached:
+        ok, err_msg = True, ""
+        _write_progress(output_dir, "detection", 1, 1, "Detection da cache")
+    elif workers > 1:
+        ok, err_msg = _run_sharded(
+            video_path, output_dir, "unified", "detection", fps, calibration_path, workers, batch_size, prefetch,
+            adaptive=adaptive, defer_teams=defer_teams,
+        )
+    else:
+        ok, err_msg = run_unified_detection(
+            video_path,
+            str(player_det_path),
+            str(ball_det_path),
+            conf_thresh=0.20,
+            ball_conf_thresh=0.12,
+            classify_teams=True,
+            progress_callback=on_progress,
+            target_fps=fps,
+            calibration_path=calibration_path,
+            checkpoint_interval=checkpoint_interval,
+            first_checkpoint=first_checkpoint,
+            start_frame=start_frame,
+            initial_player_results=initial_player,
+            initial_ball_results=initial_ball,
+            batch_size=batch_size,
+            prefetch=prefetch,
+            cancel_event=_CANCEL_EVENT,
+            stats_callback=lambda st: _write_pipeline_stats(output_dir, "detection", st),
+            adaptive=adaptive,
+            resume=resume,
+            defer_teams=defer_teams,
+            frame_callback=tracker.feed if tracker is not None else None,
+        )
+    if not cached:
+        _cache_store(cache, key_p, player_det_path, ok, started)
+        _cache_store(cache, key_b, ball_det_path, ok, started)
+    if not ok:
+        return False, err_msg or "Detection fallita."
+
+    if not _finish_player_tracking(tracker, player_det_path, str(get_tracks_path(project_dir)), output_dir):
+        return False, "Player tracking fallito."
+
+    def on_progress_ball_trk(cur: int, total: int, msg: str):
+        _write_progress(output_dir, "ball_tracking", cur, total, msg)
+
+    if not run_ball_tracking(
+        ball_det_path, str(get_ball_tracks_path(project_dir)), progress_callback=on_progress_ball_trk, max_gap=ball_max_gap,
+    ):
+        return False, "Ball tracking fallito."
+    return True, ""
+
+
+def _apply_hardware_profile(args, video_path: str, output_dir: Path) -> int:
+    """
+    Applica thread e lato input (argomenti espliciti, altrimenti profilo hardware) e ritorna il batch size.
+    Con --auto-tune e nessun profilo valido esegue prima il micro-benchmark (una tantum).
+    """
+    from analysis import config
+    from analysis.hardware_profile import limit_threads, load_profile, run_benchmark, save_profile
+
+    profile = None if args.no_profile else load_profile()
+    if profile is None and args.auto_tune and not args.no_profile:
+        def on_progress(cur: int, total: int, msg: str):
+            _write_progress(output_dir, "hardware_profile", cur, total, msg)
+        try:
+            profile = run_benchmark(video_path, target_fps=args.fps, progress_callback=on_progress)
+            save_profile(profile)
+        except (RuntimeError, OSError) as e:
+            print(f"Profilo hardware non creato: {e}", file=sys.stderr)
+    rec = (profile or {}).get("recommended") or {}
+    threads = args.threads or rec.get("threads") or 0
+    input_size = args.input_size or rec.get("input_size") or 0
+    if input_size:
+        # Anche per i worker di --workers (processi spawn: rileggono l'ambiente)
+        os.environ["FOOTBALL_ANALYZER_INPUT_SIZE"] = str(input_size)
+        config.INPUT_SIZE = input_size
+    if threads and args.workers <= 1:  # con --workers i thread sono ripartiti tra gli shard
+        limit_threads(threads)
+    return args.batch_size or rec.get("batch_size") or 1
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(
         description="Football Analyzer - Motore analisi (player/ball detection + tracking)"
@@ -237,10 +601,29 @@ def main() -> int:
     parser.add_argument("--checkpoint-interval", type=int, default=1000, help="Salva checkpoint ogni N frame dopo il primo (0=off, default: 1000)")
     parser.add_argument("--checkpoint-first", type=int, default=500, help="Primo checkpoint a N frame (default: 500)")
     parser.add_argument("--resume", action="store_true", help="Riprende da ultimo checkpoint se presente")
+    parser.add_argument("--batch-size", type=int, default=None, help="Frame per forward pass YOLOX (default: profilo hardware, altrimenti 1 = nessun batch)")
     parser.add_argument("--run-preprocess", action="store_true", help="Esegue preprocessing video (720p) prima dell'analisi se assente")
+    parser.add_argument("--prefetch", type=int, default=8, help="Coda frame della pipeline threaded decode/inference/post (0=seriale, default: 8)")
+    parser.add_argument("--separate-passes", action="store_true", help="Modalità full: detection player e ball in due passaggi separati (legacy)")
+    parser.add_argument("--workers", type=int, default=1, help="Processi di detection su shard temporali del video (default: 1; con N > 1 --resume non si applica alla detection)")
+    parser.add_argument("--ball-roi", action="store_true", help="Ball detection su ROI attorno alla posizione prevista (mode ball o --separate-passes)")
+    parser.add_argument("--ball-max-gap", type=int, default=10, help="Campioni consecutivi senza palla riempiti interpolando la traiettoria (0=off, default: 10)")
+    parser.add_argument("--adaptive-sampling", action="store_true", help="Campionamento adattivo al movimento: da --min-fps (scena ferma) a --fps (gioco veloce)")
+    parser.add_argument("--min-fps", type=float, default=2.0, help="FPS minimo del campionamento adattivo (default: 2)")
+    parser.add_argument("--threads", type=int, default=None, help="Thread di inference (default: profilo hardware, altrimenti default torch/ONNX Runtime)")
+    parser.add_argument("--input-size", type=int, default=None, help="Lato input del modello torch (default: profilo hardware, altrimenti 640)")
+    parser.add_argument("--auto-tune", action="store_true", help="Se manca il profilo hardware, esegue il micro-benchmark e lo salva")
+    parser.add_argument("--no-profile", action="store_true", help="Ignora il profilo hardware (impostazioni di default)")
+    parser.add_argument("--defer-teams", action="store_true", help="Detection senza clustering squadre per frame: solo feature maglia, squadre assegnate per track dal clustering globale")
+    parser.add_argument("--stream-tracking", action="store_true", help="Player tracking dentro il loop di detection: player_tracks.json senza rileggere player_detections.json")
+    parser.add_argument("--team-clustering-per-track", action="store_true", help="Clustering globale squadre sulle feature maglia aggregate per track_id (MiniBatchKMeans) invece che su ogni detection")
+    parser.add_argument("--no-cache", action="store_true", help="Non usare la cache delle detection (ricalcola sempre)")
     parser.add_argument("--no-priority", action="store_true", help="Non impostare priorità bassa")
 
     args = parser.parse_args()
+    if args.ball_roi and not (args.mode == "ball" or args.separate_passes):
+        # Il passaggio unificato (mode full) fa una sola inference per frame: la ROI palla non si applica
+        parser.error("--ball-roi richiede --mode ball o --separate-passes (ignorato nel passaggio unificato)")
     video_path = str(Path(args.video).resolve())
     output_base = Path(args.output).resolve()
 
@@ -260,10 +643,19 @@ def main() -> int:
             calibration_path = str(cal)
 
     checkpoint = args.checkpoint_interval if args.checkpoint_interval > 0 else 0
+    adaptive = None
+    if args.adaptive_sampling:
+        from analysis.adaptive_sampling import AdaptiveSampling
+        adaptive = AdaptiveSampling(floor_fps=args.min_fps, ceiling_fps=args.fps)
+    cache = None
+    if not args.no_cache:
+        from analysis.detection_cache import DetectionCache
+        cache = DetectionCache()
     first_checkpoint = args.checkpoint_first if checkpoint > 0 else 0
 
     if not args.no_priority:
         _set_low_priority()
+    _install_cancel_handler()
 
     _write_progress(analysis_output, "start", 0, 1, "Avvio analisi...")
 
@@ -280,13 +672,31 @@ def main() -> int:
         _write_progress(analysis_output, "preprocess", 100, 100, "Preprocessing completato")
     video_input = str(preprocessed) if preprocessed.exists() else video_path
 
+    batch_size = _apply_hardware_profile(args, video_input, analysis_output)
+
     outputs = []
     error_msg = ""
 
     try:
-        if args.mode in ("player", "full"):
+        if args.mode == "full" and not args.separate_passes:
+            ok, err = _run_unified_pipeline(
+                video_input, analysis_output, args.fps, calibration_path, checkpoint, first_checkpoint,
+                resume=args.resume, batch_size=batch_size, prefetch=args.prefetch, workers=args.workers,
+                adaptive=adaptive, cache=cache, defer_teams=args.defer_teams,
+                stream_tracking=args.stream_tracking, ball_max_gap=args.ball_max_gap,
+            )
+            if not ok:
+                _write_finished(analysis_output, False, outputs, err)
+                print(err, file=sys.stderr)
+                return 1
+            outputs.extend(["player_detections.json", "player_tracks.json", "ball_detections.json", "ball_tracks.json"])
+
+        if args.mode == "player" or (args.mode == "full" and args.separate_passes):
             ok, err = _run_player_pipeline(
-                video_input, analysis_output, args.fps, calibration_path, checkpoint, first_checkpoint, resume=args.resume
+                video_input, analysis_output, args.fps, calibration_path, checkpoint, first_checkpoint,
+                resume=args.resume, batch_size=batch_size, prefetch=args.prefetch, workers=args.workers,
+                adaptive=adaptive, cache=cache, defer_teams=args.defer_teams,
+                stream_tracking=args.stream_tracking,
             )
             if not ok:
                 _write_finished(analysis_output, False, outputs, err)
@@ -294,9 +704,11 @@ def main() -> int:
                 return 1
             outputs.extend(["player_detections.json", "player_tracks.json"])
 
-        if args.mode in ("ball", "full"):
+        if args.mode == "ball" or (args.mode == "full" and args.separate_passes):
             ok, err = _run_ball_pipeline(
-                video_input, analysis_output, args.fps, calibration_path, checkpoint, first_checkpoint, resume=args.resume
+                video_input, analysis_output, args.fps, calibration_path, checkpoint, first_checkpoint,
+                resume=args.resume, prefetch=args.prefetch, workers=args.workers, roi=args.ball_roi,
+                adaptive=adaptive, cache=cache, ball_max_gap=args.ball_max_gap,
             )
             if not ok:
                 _write_finished(analysis_output, False, outputs, err)
@@ -309,7 +721,9 @@ def main() -> int:
             from analysis.global_team_clustering import run_global_team_clustering
             def _on_cluster(c, t, msg):
                 _write_progress(analysis_output, "global_team_clustering", c, max(1, t), msg or "Clustering globale squadre...")
-            if not run_global_team_clustering(str(output_base), progress_callback=_on_cluster):
+            if not run_global_team_clustering(
+                str(output_base), progress_callback=_on_cluster, per_track=args.team_clustering_per_track,
+            ):
                 _write_finished(analysis_output, False, outputs, "Clustering globale fallito.")
                 return 1
 
@@ -344,4 +758,6 @@ def main() -> int:
 
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()  # --workers nell'exe PyInstaller
     sys.exit(main())
@@ -839,20 +839,10 @@ class BackendBridge(QObject):
             )
             return False
 
-        def _has_any_detection(tracks, key_frame="frames", key_det="detections", key_single="detection"):
-            if not tracks:
-                return False
-            frames = tracks.get(key_frame, [])
-            for f in frames:
-                if key_single and key_single in f:
-                    if f.get(key_single):
-                        return True
-                if key_det and f.get(key_det):
-                    return True
-            return False
-
-        has_ball_det = _has_any_detection(getattr(self.video_player, "_ball_tracks", None), key_det=None, key_single="detection")
-        has_player_det = _has_any_detection(getattr(self.video_player, "_player_tracks", None), key_single=None, key_det="detections")
+        ball_index = getattr(self.video_player, "_ball_tracks", None)
+        player_index = getattr(self.video_player, "_player_tracks", None)
+        has_ball_det = bool(ball_index) and ball_index.has_detections()
+        has_player_det = bool(player_index) and player_index.has_detections()
         if not has_ball_det and not has_player_det:
             QMessageBox.information(
                 self.parent_window or QApplication.activeWindow(),
@@ -1329,21 +1319,41 @@ class BackendBridge(QObject):
             return int(getattr(self.video_player, '_position_ms', 0) or 0)
         return 0
 
-    @pyqtSlot(result=str)
-    def getPlayerTracksJson(self):
-        if self.video_player:
-            tracks = getattr(self.video_player, '_player_tracks', None)
-            if tracks:
-                return json.dumps(tracks)
-        return '{}'
-
-    @pyqtSlot(result=str)
-    def getBallTracksJson(self):
-        if self.video_player:
-            tracks = getattr(self.video_player, '_ball_tracks', None)
-            if tracks:
-                return json.dumps(tracks)
-        return '{}'
+    def _overlay_tracks(self, kind: str):
+        """Indice overlay caricato nel video player ('player' o 'ball'), None se assente."""
+        if not self.video_player or kind not in ("player", "ball"):
+            return None
+        return getattr(self.video_player, f'_{kind}_tracks', None)
+
+    @pyqtSlot(str, float, result=int)
+    def getTrackSampleAt(self, kind, pos_ms):
+        """Campione mostrato a pos_ms, come nell'overlay del video (OverlayIndex.frame_at); -1 senza track."""
+        tracks = self._overlay_tracks(kind)
+        if tracks is None:
+            return -1
+        return tracks.frame_at(pos_ms, getattr(self.video_player, '_duration_ms', 0))
+
+    @pyqtSlot(str, float, float, result=str)
+    def getTrackSampleRange(self, kind, start_ms, end_ms):
+        """[start, end) dei campioni con tempo video in [start_ms, end_ms] (JSON)."""
+        tracks = self._overlay_tracks(kind)
+        if tracks is None:
+            return '[0, 0]'
+        return json.dumps(tracks.sample_range(start_ms, end_ms, getattr(self.video_player, '_duration_ms', 0)))
+
+    @pyqtSlot(str, int, int, result=str)
+    def getTracksWindowJson(self, kind, start, end):
+        """
+        Campioni [start, end) dell'indice overlay nel formato di player_tracks.json / ball_tracks.json,
+        letti dai record in memory-map: la pagina chiede solo la finestra che disegna, mai la partita
+        intera. "samples" è il numero totale di campioni.
+        """
+        tracks = self._overlay_tracks(kind)
+        if tracks is None:
+            return '{}'
+        out = tracks.to_json(start, end)
+        out["samples"] = len(tracks)
+        return json.dumps(out)
 
     def _check_video_integrity(self, path: str):
         """
@@ -1395,7 +1405,7 @@ class BackendBridge(QObject):
 
         try:
             tracks = getattr(self.video_player, '_player_tracks', None) if self.video_player else None
-            if not tracks or not tracks.get("frames"):
+            if not tracks:
                 return json.dumps({
                     "grid_all": empty_grid(), "grid_a": empty_grid(), "grid_b": empty_grid(),
                     "track_grids": {}, "track_ids": [],
@@ -1403,10 +1413,33 @@ class BackendBridge(QObject):
                     "has_pressing": False, "cols": COLS, "rows": ROWS,
                 })
 
-            frames = tracks.get("frames", [])
+            from analysis.config import FIELD_LENGTH_M, FIELD_WIDTH_M
+            from analysis.track_store import ROLE_NAMES
+            skip_roles = {ROLE_NAMES.index(r) for r in ("ball", "goal", "referee")}
+            n_frames = len(tracks)
             w = max(1, int(tracks.get("width", 1) or 1))
             h = max(1, int(tracks.get("height", 1) or 1))
 
+            def frame_cells(fi):
+                """
+                (row, col, team, track_id) dei giocatori del frame fi, dai record dell'indice overlay:
+                coordinate campo (x_m, y_m) se proiettate, altrimenti posizione nell'immagine.
+                """
+                cells = []
+                for x, y, dw, dh, x_m, y_m, tid, team, role in tracks.frame(fi).tolist():
+                    if role in skip_roles:
+                        continue
+                    if x_m == x_m:  # non NaN
+                        cx = x_m / FIELD_LENGTH_M
+                        cy = y_m / FIELD_WIDTH_M
+                    else:
+                        cx = (x + dw * 0.5) / w
+                        cy = (y + dh * 0.5) / h
+                    col = max(0, min(COLS - 1, int(cx * COLS)))
+                    row = max(0, min(ROWS - 1, int(cy * ROWS)))
+                    cells.append((row, col, team, tid))
+                return cells
+
             grid_all = empty_grid()
             grid_a   = empty_grid()
             grid_b   = empty_grid()
@@ -1414,19 +1447,8 @@ class BackendBridge(QObject):
             track_ids = set()
 
             # Sample every 5th frame for performance
-            for fi, frame_data in enumerate(frames):
-                if fi % 5 != 0:
-                    continue
-                for det in frame_data.get("detections", []):
-                    if det.get("role") in ("ball", "goal", "referee"):
-                        continue
-                    cx = (det.get("x", 0) + det.get("w", 0) * 0.5) / w
-                    cy = (det.get("y", 0) + det.get("h", 0) * 0.5) / h
-                    col = max(0, min(COLS - 1, int(cx * COLS)))
-                    row = max(0, min(ROWS - 1, int(cy * ROWS)))
-                    team = det.get("team", -1)
-                    tid  = det.get("track_id", -1)
-
+            for fi in range(0, n_frames, 5):
+                for row, col, team, tid in frame_cells(fi):
                     grid_all[row][col] += 1
                     if team == 0:
                         grid_a[row][col] += 1
@@ -1447,19 +1469,16 @@ class BackendBridge(QObject):
             if pressing_evts:
                 fps = 25.0
                 for pe in pressing_evts:
-                    fi_center = int(pe.get("timestamp_ms", 0) * fps / 1000)
+                    if tracks.video_frame is not None:
+                        # Campionamento adattivo: campione dal tempo video, non equispaziato
+                        fi_center = tracks.frame_at(pe.get("timestamp_ms", 0))
+                    else:
+                        fi_center = int(pe.get("timestamp_ms", 0) * fps / 1000)
                     for offset in range(-25, 26, 5):
                         fii = fi_center + offset
-                        if not (0 <= fii < len(frames)):
+                        if not (0 <= fii < n_frames):
                             continue
-                        for det in frames[fii].get("detections", []):
-                            if det.get("role") in ("ball", "goal", "referee"):
-                                continue
-                            cx = (det.get("x", 0) + det.get("w", 0) * 0.5) / w
-                            cy = (det.get("y", 0) + det.get("h", 0) * 0.5) / h
-                            col = max(0, min(COLS - 1, int(cx * COLS)))
-                            row = max(0, min(ROWS - 1, int(cy * ROWS)))
-                            team = det.get("team", -1)
+                        for row, col, team, _ in frame_cells(fii):
                             pressing_all[row][col] += 1
                             if team == 0:
                                 pressing_a[row][col] += 1
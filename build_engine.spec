@@ -40,6 +40,7 @@ hiddenimports = [
     "analysis.ball_detection",
     "analysis.ball_tracking",
     "analysis.team_classifier",
+    "analysis.detection_backends.onnx_runtime",  # import lazy (FOOTBALL_ANALYZER_DETECTION_BACKEND=onnx)
 ]
 
 # Dati da includere: cartella models (vuota o con yolox_s.pth opzionale)
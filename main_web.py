@@ -847,17 +847,10 @@ class WorkspacePage(QWidget):
             return
         if project_dir:
             try:
-                from analysis.ball_tracking import get_ball_tracks_path
-                from analysis.player_tracking import get_tracks_path
                 from analysis.config import get_analysis_output_path
-                ball_path = Path(get_ball_tracks_path(project_dir)).resolve()
-                pt_path = Path(get_tracks_path(project_dir)).resolve()
-                if ball_path.exists():
-                    with open(ball_path, "r", encoding="utf-8") as f:
-                        ball_tracks = json.load(f)
-                if pt_path.exists():
-                    with open(pt_path, "r", encoding="utf-8") as f:
-                        player_tracks = json.load(f)
+                from analysis.overlay_index import load_overlay_index
+                # Indice overlay in memory-map (costruito una volta per analisi)
+                ball_tracks, player_tracks = load_overlay_index(project_dir)
                 # Fase 8: carica eventi automatici (event engine) per timeline
                 if getattr(self, "backend", None):
                     events_engine_path = Path(get_analysis_output_path(project_dir)) / "detections" / "events_engine.json"
@@ -1361,7 +1354,6 @@ class WorkspacePage(QWidget):
     def _try_auto_calibration(self, video_path, project_dir):
         """Tenta calibrazione automatica silenziosamente. Se fallisce mostra dialog minimo.
         Ritorna il Path del file calibrazione se salvato, None altrimenti."""
-        import cv2 as _cv2
         import json as _json
         import numpy as _np
         from pathlib import Path as _Path
@@ -1371,11 +1363,10 @@ class WorkspacePage(QWidget):
         # Estrai un frame rappresentativo (10% del video)
         frame_bgr = None
         try:
-            cap = _cv2.VideoCapture(video_path)
-            total = int(cap.get(_cv2.CAP_PROP_FRAME_COUNT))
-            cap.set(_cv2.CAP_PROP_POS_FRAMES, max(0, total // 10))
-            ok, frame_bgr = cap.read()
-            cap.release()
+            from analysis.frame_sampler import FrameSampler
+            with FrameSampler(video_path) as sampler:
+                vf = sampler.read_frame(max(0, sampler.frame_count // 10))
+            frame_bgr = vf.image if vf is not None else None
         except Exception:
             frame_bgr = None
 
@@ -1395,7 +1386,7 @@ class WorkspacePage(QWidget):
                             "homography": _np.array(result.homography).tolist(),
                             "source": "auto",
                         }, f, indent=2)
-                    clear_calibrator_cache()
+                    clear_calibrator_cache(str(cal_path))
                     auto_ok = True
                     return cal_path
             except Exception:
@@ -1459,7 +1450,7 @@ class WorkspacePage(QWidget):
                     "field_points": [],
                     "homography": _np.array(matrix).tolist(),
                 }, f, indent=2)
-            clear_calibrator_cache()
+            clear_calibrator_cache(str(cal_path))
 
         dlg.calibration_saved.connect(
             lambda cal_id: _persist_to_project(
@@ -1884,42 +1875,18 @@ class WorkspacePage(QWidget):
     def _run_cloud_postprocessing(self, project_dir: str, payload: dict):
         """
         Post-processing locale dopo analisi cloud:
-        - Applica homography per aggiungere coordinate in metri ai tracks
+        - Proietta i tracks in coordinate campo (metri), riusate da event engine, metriche e overlay
         - Esegue event engine (se ball_tracks disponibili)
         - Esegue metrics engine (se events disponibili)
         Tutto silenzioso: fallimenti non bloccano il caricamento risultati.
         """
-        import json as _json
-        from pathlib import Path
-
-        # 2a. Applica coordinate in metri al player_tracks salvato
+        # 2a. Coordinate in metri: proiettate una volta in detections/field_coords.npz (stesse ancore
+        #     di event engine, metriche e overlay), senza riscrivere player_tracks.json
         try:
-            from analysis.config import get_calibration_path
-            from analysis.homography import get_calibrator
-            from analysis.player_tracking import get_tracks_path
-
-            cal_path = get_calibration_path(project_dir)
-            calibrator = get_calibrator(str(cal_path)) if cal_path.exists() else None
-
-            if calibrator:
-                tracks_path = get_tracks_path(project_dir)
-                if tracks_path.exists():
-                    with open(tracks_path, "r", encoding="utf-8") as f:
-                        tracks = _json.load(f)
-
-                    # Aggiunge x_m, y_m a ogni detection
-                    for frame in tracks.get("frames", []):
-                        for det in frame.get("detections", []):
-                            cx = det.get("x", 0) + det.get("w", 0) / 2
-                            cy = det.get("y", 0) + det.get("h", 0)  # base del bbox
-                            pt = calibrator.pixel_to_field(cx, cy)
-                            if pt:
-                                det["x_m"] = round(pt[0], 2)
-                                det["y_m"] = round(pt[1], 2)
+            from analysis.field_coords import load_field_coords
 
-                    with open(tracks_path, "w", encoding="utf-8") as f:
-                        _json.dump(tracks, f)
-                    logging.info("Coordinate in metri aggiunte ai tracks cloud")
+            if load_field_coords(project_dir) is not None:
+                logging.info("Coordinate in metri calcolate per i tracks cloud")
         except Exception as e:
             logging.warning("Coordinate mapping cloud fallito: %s", e)
 
@@ -152,6 +152,8 @@ def handler(job):
         tmp_tracks = tmp_video.replace(".mp4", "_tracks.json")
         LOG.info("Starting player tracking...")
         from analysis.player_tracking import run_player_tracking
+        from analysis.track_store import track_store_path
+        tmp_store = str(track_store_path(tmp_tracks))  # archivio colonnare scritto accanto al JSON
         tracking_ok = run_player_tracking(
             detections_path=tmp_result,
             output_path=tmp_tracks,
@@ -205,7 +207,8 @@ def handler(job):
 
     finally:
         tmp_tracks_local = locals().get("tmp_tracks")
-        for p in [tmp_video, tmp_result, tmp_tracks_local]:
+        tmp_store_local = locals().get("tmp_store")
+        for p in [tmp_video, tmp_result, tmp_tracks_local, tmp_store_local]:
             if p and Path(p).exists():
                 try:
                     Path(p).unlink()
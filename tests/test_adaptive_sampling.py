@@ -0,0 +1,62 @@
+"""
+Test per il campionamento adattivo (analysis/adaptive_sampling.py) su un video sintetico:
+prima metà ferma, seconda metà con un oggetto in movimento veloce.
+python -m unittest tests.test_adaptive_sampling -v
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+class TestAdaptiveSampling(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.video_path = str(Path(cls._tmp.name) / "adaptive.avi")
+        writer = cv2.VideoWriter(cls.video_path, cv2.VideoWriter_fourcc(*"MJPG"), 25, (320, 240))
+        for i in range(150):
+            frame = np.full((240, 320, 3), (40, 150, 40), dtype=np.uint8)  # campo verde
+            x = 20 if i < 75 else 20 + ((i - 75) * 12) % 220
+            cv2.rectangle(frame, (x, 60), (x + 80, 180), (255, 255, 255), -1)
+            writer.write(frame)
+        writer.release()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp.cleanup()
+
+    def test_floor_when_static_ceiling_when_moving(self):
+        from analysis.adaptive_sampling import AdaptiveFrameSampler, AdaptiveSampling
+
+        sampler = AdaptiveFrameSampler(self.video_path, 25.0, AdaptiveSampling(floor_fps=2.0, ceiling_fps=10.0))
+        self.assertEqual((sampler.base_step, sampler.max_step), (2, 12))
+        got = [(vf.index, step) for vf, step, _ in sampler]
+        indices = [i for i, _ in got]
+        self.assertTrue(all(i % 2 == 0 for i in indices))
+        self.assertEqual([i2 - i1 for i1, i2 in zip(indices, indices[1:])], [s for _, s in got[1:]])
+        static = [s for i, s in got[1:] if i < 75]
+        moving = [s for i, s in got if i >= 90]
+        self.assertTrue(static and all(s == 12 for s in static))
+        self.assertTrue(moving and all(s == 2 for s in moving))
+
+    def test_event_timestamps_follow_video_frame(self):
+        from analysis.adaptive_sampling import sample_times_ms
+        from analysis.event_engine import _timestamp_ms
+
+        tracks = {
+            "fps": 25.0,
+            "sampling": {"mode": "adaptive", "base_step": 2},
+            "frames": [{"frame": 0, "video_frame": 0}, {"frame": 1, "video_frame": 12}, {"frame": 2, "video_frame": 14}],
+        }
+        times = sample_times_ms(tracks)
+        self.assertEqual([_timestamp_ms(f, 25.0, times) for f in range(3)], [0, 480, 560])
+        self.assertIsNone(sample_times_ms({"fps": 25.0, "frames": [{"frame": 0}]}))
+        self.assertEqual(_timestamp_ms(5, 25.0, None), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -61,6 +61,7 @@ class TestAnalysisPipeline(unittest.TestCase):
         """run_global_team_clustering con almeno 3 campioni jersey_hsv aggiorna il campo team."""
         from analysis.config import get_analysis_output_path
         from analysis.global_team_clustering import run_global_team_clustering
+        from analysis.track_store import load_player_tracks
 
         with tempfile.TemporaryDirectory() as tmp:
             out = Path(get_analysis_output_path(tmp))
@@ -82,8 +83,57 @@ class TestAnalysisPipeline(unittest.TestCase):
             tracks_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
             ok = run_global_team_clustering(tmp)
             self.assertTrue(ok)
-            with open(tracks_path, "r", encoding="utf-8") as f:
-                updated = json.load(f)
+            updated = load_player_tracks(tracks_path).to_json()
             teams = [d["team"] for d in updated["frames"][0]["detections"]]
             self.assertLessEqual(set(teams), {0, 1, -1})
             self.assertIn(-1, teams)
+
+    def test_global_team_clustering_track_histograms(self):
+        """Con jersey_hist (team differiti) il team è assegnato per track_id, uguale su tutti i frame."""
+        from analysis.config import get_analysis_output_path
+        from analysis.global_team_clustering import run_global_team_clustering
+        from analysis.track_store import load_player_tracks
+
+        white = {"jersey_hsv": [20, 40, 230], "jersey_hist": [0] * 14 + [100]}
+        red = {"jersey_hsv": [1, 220, 200], "jersey_hist": [100] + [0] * 14}
+        yellow = {"jersey_hsv": [30, 240, 220], "jersey_hist": [0, 0, 100] + [0] * 12}
+        frames = [
+            {"frame": i, "detections": [
+                {"track_id": 1, "team": -1, **white}, {"track_id": 2, "team": -1, **white},
+                {"track_id": 3, "team": -1, **red}, {"track_id": 4, "team": -1, **red},
+                {"track_id": 5, "team": -1, **yellow},
+            ]}
+            for i in range(4)
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            det_dir = Path(get_analysis_output_path(tmp)) / "detections"
+            det_dir.mkdir(parents=True)
+            tracks_path = det_dir / "player_tracks.json"
+            tracks_path.write_text(json.dumps({"frames": frames}), encoding="utf-8")
+            self.assertTrue(run_global_team_clustering(tmp))
+            updated = load_player_tracks(tracks_path).to_json()
+        teams = {(d["track_id"], d["team"]) for fd in updated["frames"] for d in fd["detections"]}
+        self.assertEqual(teams, {(1, 0), (2, 0), (3, 1), (4, 1), (5, -1)})
+
+    def test_global_team_clustering_per_track_hsv(self):
+        """per_track=True: jersey_hsv aggregati per track (H del rosso a cavallo di 0/180), un team per track."""
+        from analysis.config import get_analysis_output_path
+        from analysis.global_team_clustering import run_global_team_clustering
+        from analysis.track_store import load_player_tracks
+
+        hsv = {1: [20, 40, 230], 2: [24, 50, 225], 3: [178, 220, 200], 4: [2, 215, 190], 5: [40, 230, 220]}
+        frames = []
+        for i in range(6):
+            dets = [{"track_id": t, "team": -1, "jersey_hsv": [c[0], c[1] + i, c[2] - i]} for t, c in hsv.items()]
+            if i == 2:
+                dets[0]["jersey_hsv"] = hsv[3]  # occlusione: un campione rosso nel track bianco
+            frames.append({"frame": i, "detections": dets})
+        with tempfile.TemporaryDirectory() as tmp:
+            det_dir = Path(get_analysis_output_path(tmp)) / "detections"
+            det_dir.mkdir(parents=True)
+            tracks_path = det_dir / "player_tracks.json"
+            tracks_path.write_text(json.dumps({"frames": frames}), encoding="utf-8")
+            self.assertTrue(run_global_team_clustering(tmp, per_track=True))
+            updated = load_player_tracks(tracks_path).to_json()
+        teams = {(d["track_id"], d["team"]) for fd in updated["frames"] for d in fd["detections"]}
+        self.assertEqual(teams, {(1, 0), (2, 0), (3, 1), (4, 1), (5, -1)})
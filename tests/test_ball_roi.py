@@ -0,0 +1,54 @@
+"""
+Test per la ball detection su ROI (analysis/ball_detection.py: BallRoiTracker, _detect_balls_roi).
+python -m unittest tests.test_ball_roi -v
+"""
+import unittest
+
+import numpy as np
+
+
+class _WhiteBlobPredictor:
+    """Predictor finto: una detection Ball (classe 0) sul blob bianco, registra le dimensioni dei frame."""
+
+    def __init__(self):
+        self.shapes = []
+
+    def inference(self, frame):
+        self.shapes.append(frame.shape[:2])
+        ratio = min(640 / frame.shape[0], 640 / frame.shape[1])
+        ys, xs = np.nonzero(frame.min(axis=2) > 200)
+        if len(xs) == 0:
+            return [None], {"ratio": ratio}
+        row = [xs.min() * ratio, ys.min() * ratio, (xs.max() + 1) * ratio, (ys.max() + 1) * ratio, 0.9, 0.9, 0]
+        return [np.array([row], dtype=np.float32)], {"ratio": ratio}
+
+
+def _frame(ball_x=None, ball_y=100):
+    img = np.zeros((720, 1280, 3), dtype=np.uint8)
+    if ball_x is not None:
+        img[ball_y: ball_y + 8, ball_x: ball_x + 8] = 255
+    return img
+
+
+class TestBallRoi(unittest.TestCase):
+    """ROI attorno alla posizione prevista, coordinate nel frame intero, fallback full-frame."""
+
+    def test_roi_tracking_and_fallback(self):
+        from analysis.ball_detection import BallRoiTracker, _detect_balls_roi
+
+        pred = _WhiteBlobPredictor()
+        tracker = BallRoiTracker(roi_size=320, full_every=3)
+        xs = [100, 130, 160, 190, 220]
+        for x in xs:
+            boxes = _detect_balls_roi(_frame(x), pred, tracker, 0.15)
+            self.assertEqual(len(boxes), 1)
+            self.assertAlmostEqual(boxes[0].x, x, places=3)
+            self.assertAlmostEqual(boxes[0].y, 100, places=3)
+        # frame intero, ROI, ROI, ROI, frame intero (full_every=3)
+        self.assertEqual(pred.shapes, [(720, 1280), (320, 320), (320, 320), (320, 320), (720, 1280)])
+
+        # Palla sparita: ROI vuota → ricerca sul frame intero, poi tracker non più agganciato
+        pred.shapes.clear()
+        self.assertEqual(_detect_balls_roi(_frame(), pred, tracker, 0.15), [])
+        self.assertFalse(tracker.alive)
+        self.assertEqual(pred.shapes, [(320, 320), (720, 1280)])
@@ -0,0 +1,73 @@
+"""
+Test per il post-pass sulla traiettoria palla (analysis/ball_tracking.py): outlier e riempimento dei buchi.
+python -m unittest tests.test_ball_tracking -v
+"""
+import unittest
+
+import numpy as np
+
+
+def _frames(centers, missing=(), outliers=None):
+    outliers = outliers or {}
+    frames = []
+    for i, (cx, cy) in enumerate(centers):
+        if i in missing:
+            frames.append({"frame": i, "detection": None})
+            continue
+        cx, cy = outliers.get(i, (cx, cy))
+        frames.append({"frame": i, "detection": {"x": cx - 5, "y": cy - 5, "w": 10.0, "h": 10.0, "track_id": i // 20}})
+    return frames
+
+
+class TestBallTracking(unittest.TestCase):
+
+    def test_fills_gap_along_parabola(self):
+        from analysis.ball_tracking import interpolate_ball_frames
+
+        t = np.arange(30, dtype=np.float64)
+        centers = np.column_stack([100 + 8 * t, 300 - 12 * t + 0.4 * t ** 2])
+        frames = _frames(centers, missing=range(10, 16))
+        self.assertEqual(interpolate_ball_frames(frames, max_gap=6), (6, 0))
+        for i in range(10, 16):
+            d = frames[i]["detection"]
+            self.assertTrue(d["interpolated"])
+            self.assertEqual(d["track_id"], 0)
+            self.assertAlmostEqual(d["x"] + 5, centers[i, 0], places=6)
+            self.assertAlmostEqual(d["y"] + 5, centers[i, 1], places=6)
+        self.assertNotIn("interpolated", frames[9]["detection"])
+
+    def test_gap_longer_than_max_gap_is_kept(self):
+        from analysis.ball_tracking import interpolate_ball_frames
+
+        centers = [(100.0 + 5 * i, 200.0) for i in range(30)]
+        frames = _frames(centers, missing=range(5, 12))
+        self.assertEqual(interpolate_ball_frames(frames, max_gap=6), (0, 0))
+        self.assertTrue(all(frames[i]["detection"] is None for i in range(5, 12)))
+        self.assertEqual(interpolate_ball_frames(frames, max_gap=0), (0, 0))
+
+    def test_rejects_outlier_and_refills(self):
+        from analysis.ball_tracking import interpolate_ball_frames
+
+        centers = [(100.0 + 5 * i, 200.0 + 2 * i) for i in range(30)]
+        frames = _frames(centers, missing=(20,), outliers={12: (600.0, 50.0)})
+        self.assertEqual(interpolate_ball_frames(frames, max_gap=4), (2, 1))
+        d = frames[12]["detection"]
+        self.assertTrue(d["interpolated"])
+        self.assertAlmostEqual(d["x"] + 5, 160.0, places=6)
+        self.assertAlmostEqual(d["y"] + 5, 224.0, places=6)
+        self.assertTrue(frames[20]["detection"]["interpolated"])
+
+    def test_uses_video_frame_with_adaptive_sampling(self):
+        from analysis.ball_tracking import interpolate_ball_frames
+
+        video = [0, 4, 8, 12, 13, 14, 15, 16, 20, 24]
+        frames = _frames([(10.0 + 3 * v, 50.0) for v in video], missing=(4, 5))
+        for fr, v in zip(frames, video):
+            fr["video_frame"] = v
+        self.assertEqual(interpolate_ball_frames(frames, max_gap=3), (2, 0))
+        self.assertAlmostEqual(frames[4]["detection"]["x"] + 5, 10.0 + 3 * 13, places=6)
+        self.assertAlmostEqual(frames[5]["detection"]["x"] + 5, 10.0 + 3 * 14, places=6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Test per il log di checkpoint append-only (analysis/checkpoint_log.py): flush, ripresa dalla coda, compattazione.
+python -m unittest tests.test_checkpoint_log -v
+"""
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+
+def _results():
+    return {"frames": [], "width": 640, "height": 360, "fps": 25.0, "frame_step": 2, "target_fps": 12.5, "crop_bounds": None}
+
+
+def _frame(i):
+    return {"frame": 2 * i, "detections": [{"x": float(i), "y": 1.5, "w": 10.0, "h": 20.0, "conf": 0.5}]}
+
+
+class TestCheckpointLog(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_without_checkpoints_writes_plain_json(self):
+        from analysis.checkpoint_log import CheckpointLog, checkpoint_log_path
+
+        out = self.tmp / "player_detections.json"
+        results = _results()
+        log = CheckpointLog(out, results)
+        for i in range(7):
+            log.append(_frame(i))
+        log.finish()
+        self.assertFalse(checkpoint_log_path(out).exists())
+        self.assertEqual(out.read_text(), json.dumps({**_results(), "frames": [_frame(i) for i in range(7)]}, indent=2))
+
+    def test_resume_from_tail_and_compact(self):
+        from analysis.checkpoint_log import CheckpointLog, checkpoint_log_path, read_checkpoint, read_checkpoint_tail
+
+        ref = self.tmp / "ref.json"
+        log = CheckpointLog(ref, _results())
+        for i in range(20):
+            log.append(_frame(i))
+        log.finish()
+
+        out = self.tmp / "ball_detections.json"
+        log = CheckpointLog(out, _results(), checkpoint_interval=4, first_checkpoint=3)
+        for i in range(13):  # interrotta: flush a 3, 7, 11 frame
+            log.append(_frame(i))
+        self.assertEqual(read_checkpoint_tail(out), (21, 11))
+        self.assertEqual(len(read_checkpoint(out)["frames"]), 11)
+        with open(checkpoint_log_path(out), "a", encoding="utf-8") as f:
+            f.write('{"n": 12, "fra')  # riga troncata da un crash durante il flush
+        self.assertEqual(read_checkpoint_tail(out), (21, 11))
+
+        results = {**_results(), "width": 0}  # i meta vengono ripresi dalla prima riga del log
+        log = CheckpointLog(out, results, checkpoint_interval=4, first_checkpoint=3, resume=True)
+        self.assertEqual((log.start_frame, log.count, results["width"]), (21, 11, 640))
+        for i in range(11, 20):
+            log.append(_frame(i))
+        log.finish()
+        self.assertFalse(checkpoint_log_path(out).exists())
+        self.assertEqual(out.read_text(), ref.read_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Test per la decodifica vettoriale YOLOX e DetectionBatch (analysis/player_detection.py).
+Eseguibili senza modello YOLOX: python -m unittest tests.test_detection_batch -v
+"""
+import unittest
+
+import numpy as np
+
+
+def _loop_decode(rows, ratio, conf_thresh):
+    """Riferimento: decodifica riga per riga come la versione a loop."""
+    out = []
+    for x1, y1, x2, y2, obj, cls_conf, cls in rows:
+        conf = obj * cls_conf
+        if conf < conf_thresh:
+            continue
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        w, h = x2 - x1, y2 - y1
+        if w <= 0 or h <= 0:
+            continue
+        out.append((x1 / ratio, y1 / ratio, w / ratio, h / ratio, conf, int(cls)))
+    return out
+
+
+class TestDetectionBatch(unittest.TestCase):
+    """Stessi box della decodifica a loop; filtro campo vettoriale."""
+
+    def test_decode_matches_loop(self):
+        from analysis.player_detection import _decode_yolox_output
+
+        rng = np.random.default_rng(0)
+        rows = np.concatenate(
+            [rng.uniform(0, 640, (50, 4)), rng.uniform(0, 1, (50, 2)), rng.integers(0, 8, (50, 1))], axis=1
+        ).astype(np.float32)
+        rows[3, 2] = rows[3, 0]  # larghezza nulla → scartata
+        batch = _decode_yolox_output([rows], {"ratio": 0.5}, conf_thresh=0.3)
+        expected = _loop_decode(rows.astype(np.float64).tolist(), 0.5, 0.3)
+        boxes = batch.to_boxes()
+        self.assertEqual(len(boxes), len(expected))
+        for b, (x, y, w, h, conf, cls) in zip(boxes, expected):
+            self.assertAlmostEqual(b.x, x)
+            self.assertAlmostEqual(b.y, y)
+            self.assertAlmostEqual(b.w, w)
+            self.assertAlmostEqual(b.h, h)
+            self.assertAlmostEqual(b.confidence, conf)
+            self.assertEqual(b.class_id, cls)
+        self.assertEqual(len(_decode_yolox_output(None, {"ratio": 1.0})), 0)
+
+    def test_filter_batch_to_field(self):
+        from analysis.player_detection import DetectionBatch, _filter_batch_to_field
+
+        batch = DetectionBatch(
+            xywh=np.array([[10.0, 10.0, 10.0, 20.0], [500.0, 500.0, 10.0, 20.0]]),
+            conf=np.array([0.9, 0.8]),
+            class_id=np.array([1, 1], dtype=np.int64),
+            team=np.array([-1, -1], dtype=np.int64),
+        )
+        # Senza calibrazione: margini euristici (il primo box è sulla tribuna/bordo)
+        self.assertEqual(len(_filter_batch_to_field(batch, 1000, 1000, None)), 1)
+        kept = _filter_batch_to_field(batch, 1000, 1000, (0, 0, 100, 100))
+        self.assertEqual(len(kept), 1)
+        self.assertAlmostEqual(float(kept.xywh[0, 0]), 10.0)
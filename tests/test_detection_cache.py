@@ -0,0 +1,72 @@
+"""
+Test per la cache delle detection (analysis/detection_cache.py): impronta video, voci complete/parziali, LRU.
+python -m unittest tests.test_detection_cache -v
+"""
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+
+class TestDetectionCache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _json(self, name: str, frames: int) -> Path:
+        path = self.tmp / name
+        path.write_text(json.dumps({"frames": [{"frame": i, "detections": []} for i in range(frames)]}))
+        return path
+
+    def test_video_fingerprint(self):
+        from analysis.detection_cache import video_fingerprint
+
+        video = self.tmp / "video.bin"
+        video.write_bytes(bytes(range(256)) * 4096)
+        fp = video_fingerprint(str(video), samples=4, chunk_size=1024)
+        self.assertEqual(fp, video_fingerprint(str(video), samples=4, chunk_size=1024))
+        data = bytearray(video.read_bytes())
+        data[0] ^= 0xFF  # il primo blocco è sempre campionato
+        video.write_bytes(bytes(data))
+        self.assertNotEqual(fp, video_fingerprint(str(video), samples=4, chunk_size=1024))
+
+    def test_complete_and_partial_entries(self):
+        from analysis.detection_cache import DetectionCache
+
+        cache = DetectionCache(str(self.tmp / "cache"), budget_mb=10)
+        self.assertIsNone(cache.lookup("a"))
+        src = self._json("full.json", 5)
+        cache.store("a", source_path=str(src))
+        out = self.tmp / "out" / "player_detections.json"
+        hit = cache.lookup("a", str(out))
+        self.assertTrue(hit.complete)
+        self.assertEqual(out.read_text(), src.read_text())
+
+        cache.store("b", data={"frames": [{"frame": 0}]}, complete=False, next_frame=3)
+        hit = cache.lookup("b")
+        self.assertFalse(hit.complete)
+        self.assertEqual((hit.next_frame, hit.data), (3, {"frames": [{"frame": 0}]}))
+
+    def test_lru_eviction(self):
+        from analysis.detection_cache import DetectionCache
+
+        src = self._json("big.json", 2000)
+        size = src.stat().st_size
+        cache = DetectionCache(str(self.tmp / "cache"), budget_mb=(2.5 * size) / (1024 * 1024))
+        cache.store("old", source_path=str(src))
+        time.sleep(0.01)
+        cache.store("used", source_path=str(src))
+        time.sleep(0.01)
+        cache.lookup("old")  # "old" diventa la più recente
+        time.sleep(0.01)
+        cache.store("new", source_path=str(src))
+        self.assertEqual(sorted(k for k, _ in cache.entries()), ["new", "old"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Test per la pipeline threaded decode → inference → post (analysis/detection_pipeline.py).
+Eseguibili senza modello YOLOX: python -m unittest tests.test_detection_pipeline -v
+"""
+import threading
+import unittest
+
+import numpy as np
+
+
+def _source(n: int):
+    from analysis.detection_pipeline import SampledFrame
+
+    for i in range(n):
+        yield SampledFrame(i * 3, np.full((4, 4, 3), i, dtype=np.uint8), None, (4, 4))
+
+
+class TestDetectionPipeline(unittest.TestCase):
+    """Ordine, batching, propagazione errori e cancel."""
+
+    def _run(self, threaded: bool, batch_size: int):
+        from analysis.detection_pipeline import run_detection_pipeline
+
+        batches = []
+        seen = []
+
+        def infer(images):
+            batches.append(len(images))
+            return [int(img[0, 0, 0]) for img in images]
+
+        stats = run_detection_pipeline(
+            _source(10),
+            infer,
+            lambda sf, d: seen.append((sf.index, d)),
+            batch_size=batch_size,
+            threaded=threaded,
+            queue_size=2,
+        )
+        return seen, batches, stats
+
+    def test_serial_and_threaded_same_order(self):
+        """Seriale e threaded producono la stessa sequenza (frame_idx, detection)."""
+        expected = [(i * 3, i) for i in range(10)]
+        for threaded in (False, True):
+            seen, batches, stats = self._run(threaded, batch_size=4)
+            self.assertEqual(seen, expected)
+            self.assertEqual(batches, [4, 4, 2])
+            self.assertEqual(stats.items["post"], 10)
+            self.assertIn(stats.as_dict()["bottleneck"], ("decode", "inference", "post"))
+
+    def test_error_in_post_stage_is_raised(self):
+        """Un'eccezione nello stadio post ferma la pipeline e viene rilanciata nel chiamante."""
+        from analysis.detection_pipeline import run_detection_pipeline
+
+        def post(sf, d):
+            if sf.index >= 6:
+                raise ValueError("post failed")
+
+        with self.assertRaises(ValueError):
+            run_detection_pipeline(_source(100), lambda imgs: [0] * len(imgs), post, threaded=True, queue_size=2)
+
+    def test_cancel_event_stops_pipeline(self):
+        """cancel_event impostato a metà stream → PipelineCancelled e thread terminati."""
+        from analysis.detection_pipeline import PipelineCancelled, run_detection_pipeline
+
+        cancel = threading.Event()
+
+        def post(sf, d):
+            if sf.index >= 9:
+                cancel.set()
+
+        n_threads = threading.active_count()
+        with self.assertRaises(PipelineCancelled):
+            run_detection_pipeline(
+                _source(1000), lambda imgs: [0] * len(imgs), post, threaded=True, queue_size=2, cancel_event=cancel
+            )
+        self.assertEqual(threading.active_count(), n_threads)
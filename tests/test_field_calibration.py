@@ -0,0 +1,52 @@
+"""
+Test per la proiezione pixel → metri in blocco (FieldCalibrator / PerFrameCalibrator).
+python -m unittest tests.test_field_calibration -v
+"""
+import unittest
+
+import numpy as np
+
+
+def _calibrator():
+    from analysis.field_calibration import FieldCalibrator
+
+    cal = FieldCalibrator()
+    for (px, py), (fx, fy) in [((100, 600), (0, 0)), ((1800, 620), (105, 0)),
+                               ((1500, 200), (105, 68)), ((400, 180), (0, 68))]:
+        cal.add_point(px, py, fx, fy)
+    return cal
+
+
+class TestPixelToFieldBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.points = np.random.default_rng(0).uniform(0, 1920, (300, 2))
+
+    def test_field_calibrator_matches_per_point(self):
+        from analysis.field_calibration import FieldCalibrator
+
+        cal = _calibrator()
+        out, valid = cal.pixel_to_field_batch(self.points)
+        self.assertTrue(valid.all())
+        self.assertEqual(out.tolist(), [list(cal.pixel_to_field(x, y)) for x, y in self.points.tolist()])
+
+        out, valid = FieldCalibrator().pixel_to_field_batch(self.points[:3])
+        self.assertFalse(valid.any())
+        self.assertTrue(np.isnan(out).all())
+
+    def test_per_frame_calibrator_filters_out_of_field(self):
+        from analysis.per_frame_calibrator import PerFrameCalibrator
+
+        pf = PerFrameCalibrator(mode="static")
+        pf.set_static_calibration(_calibrator())
+        frames = np.arange(len(self.points)) % 5
+        out, valid = pf.pixel_to_field_batch(self.points, frames)
+        expected = [pf.pixel_to_field(x, y, frame_idx=f) for (x, y), f in zip(self.points.tolist(), frames.tolist())]
+        self.assertEqual(valid.tolist(), [e is not None for e in expected])
+        self.assertTrue(0 < valid.sum() < len(valid))
+        self.assertEqual(out[valid].tolist(), [list(e) for e in expected if e is not None])
+        self.assertTrue(np.isnan(out[~valid]).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
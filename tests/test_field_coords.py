@@ -0,0 +1,115 @@
+"""
+Test per le coordinate campo proiettate una volta per analisi (analysis/field_coords.py).
+python -m unittest tests.test_field_coords -v
+"""
+import json
+import tempfile
+import unittest
+
+import numpy as np
+
+
+def _write_project(tmp):
+    from analysis.ball_tracking import get_ball_tracks_path
+    from analysis.config import get_calibration_path
+    from analysis.field_calibration import FieldCalibrator
+    from analysis.player_tracking import get_tracks_path
+
+    frames = [
+        {"frame": i, "detections": [
+            {"x": 100.0 + 40 * k + i, "y": 300.0, "w": 20.0, "h": 50.0, "team": k % 2, "track_id": k}
+            for k in range(3)
+        ]}
+        for i in range(4)
+    ]
+    players = {"frames": frames, "width": 1920, "height": 1080, "fps": 5.0, "tracks": {}}
+    balls = {"frames": [{"frame": i, "detection": {"x": 500.0 + i, "y": 400.0, "w": 8.0, "h": 8.0}} for i in (3, 1)],
+             "width": 1920, "height": 1080, "fps": 5.0}
+    get_tracks_path(tmp).write_text(json.dumps(players))
+    get_ball_tracks_path(tmp).write_text(json.dumps(balls))
+    cal = FieldCalibrator()
+    for (px, py), (fx, fy) in [((100, 600), (0, 0)), ((1800, 620), (105, 0)),
+                               ((1500, 200), (105, 68)), ((400, 180), (0, 68))]:
+        cal.add_point(px, py, fx, fy)
+    cal.save(get_calibration_path(tmp))
+    return cal
+
+
+class TestFieldCoords(unittest.TestCase):
+
+    def test_anchors_and_scale_fallback(self):
+        from analysis.ball_tracking import get_ball_tracks_path
+        from analysis.field_coords import FieldCoords
+        from analysis.player_tracking import get_tracks_path
+        from analysis.track_store import TrackStore
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cal = _write_project(tmp)
+            store = TrackStore.from_json(json.loads(get_tracks_path(tmp).read_text()))
+            balls = json.loads(get_ball_tracks_path(tmp).read_text())
+
+        coords = FieldCoords.compute(store, balls, cal)
+        # Giocatori: base del bbox; palla: centro, in ordine di frame
+        self.assertEqual(coords.player_px[0].tolist(), [110.0, 350.0])
+        self.assertEqual(coords.player_m[0].tolist(), list(cal.pixel_to_field(110.0, 350.0)))
+        self.assertEqual(coords.ball_frame.tolist(), [1, 3])
+        self.assertEqual(coords.ball_px.tolist(), [[505.0, 404.0], [507.0, 404.0]])
+
+        plain = FieldCoords.compute(store, balls, None)
+        self.assertTrue(np.isnan(plain.player_m).all())
+        self.assertEqual(plain.players(0.5).tolist(), (plain.player_px * 0.5).tolist())
+        self.assertEqual(coords.players(0.5).tolist(), coords.player_m.tolist())
+
+    def test_cached_per_calibration_and_cleared(self):
+        from analysis.config import get_calibration_path
+        from analysis.field_coords import get_field_coords_path, load_field_coords
+        from analysis.homography import clear_calibrator_cache
+
+        with tempfile.TemporaryDirectory() as tmp:
+            _write_project(tmp)
+            cal_path = get_calibration_path(tmp)
+            first = load_field_coords(tmp)
+            path = get_field_coords_path(tmp)
+            mtime = path.stat().st_mtime_ns
+            again = load_field_coords(tmp)
+            self.assertEqual(path.stat().st_mtime_ns, mtime)
+            self.assertEqual(again.player_m.tolist(), first.player_m.tolist())
+            self.assertEqual(again.key, first.key)
+
+            # Nuova calibrazione dalla UI: clear_calibrator_cache rimuove l'artefatto, nuovo hash
+            data = json.loads(cal_path.read_text())
+            data["pixel_points"][0] = [120, 600]
+            data["homography"] = None
+            cal_path.write_text(json.dumps(data))
+            clear_calibrator_cache(str(cal_path))
+            self.assertFalse(path.exists())
+            moved = load_field_coords(tmp)
+            self.assertNotEqual(moved.key["calibration"], first.key["calibration"])
+            self.assertNotEqual(moved.player_m.tolist(), first.player_m.tolist())
+            clear_calibrator_cache(str(cal_path))
+
+    def test_consumers_share_artifact(self):
+        from analysis.config import get_calibration_path
+        from analysis.event_engine import run_event_engine_from_project
+        from analysis.field_coords import get_field_coords_path, load_field_coords
+        from analysis.homography import clear_calibrator_cache
+        from analysis.overlay_index import load_overlay_index
+
+        with tempfile.TemporaryDirectory() as tmp:
+            _write_project(tmp)
+            self.assertTrue(run_event_engine_from_project(tmp, fps=5.0))
+            coords = load_field_coords(tmp)
+            _, player_idx = load_overlay_index(tmp)
+            self.assertEqual(player_idx.records["x_m"].tolist(),
+                             coords.player_m[:, 0].astype(np.float32).tolist())
+
+            # Indice overlay già valido: l'artefatto non viene né letto né ricalcolato
+            get_field_coords_path(tmp).unlink()
+            _, again = load_overlay_index(tmp)
+            self.assertFalse(get_field_coords_path(tmp).exists())
+            self.assertEqual(again.records["x_m"].tolist(), player_idx.records["x_m"].tolist())
+            clear_calibrator_cache(str(get_calibration_path(tmp)))
+
+
+if __name__ == "__main__":
+    unittest.main()
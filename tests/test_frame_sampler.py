@@ -0,0 +1,70 @@
+"""
+Test per FrameSampler (analysis/frame_sampler.py) su un piccolo video sintetico.
+python -m unittest tests.test_frame_sampler -v
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+class TestFrameSampler(unittest.TestCase):
+    """Indici esatti, timestamp e contenuto identico a una lettura completa con read()."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.video_path = str(Path(cls._tmp.name) / "sample.avi")
+        writer = cv2.VideoWriter(cls.video_path, cv2.VideoWriter_fourcc(*"MJPG"), 25, (64, 48))
+        for i in range(40):
+            frame = np.zeros((48, 64, 3), dtype=np.uint8)
+            cv2.rectangle(frame, (i, 10), (i + 8, 30), (255, 255, 255), -1)
+            writer.write(frame)
+        writer.release()
+        cap = cv2.VideoCapture(cls.video_path)
+        cls.frames = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            cls.frames.append(frame)
+        cap.release()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp.cleanup()
+
+    def _check(self, step: int, start: int, seek_threshold: int):
+        from analysis.frame_sampler import FrameSampler
+
+        expected = [i for i in range(len(self.frames)) if i >= start and i % step == 0]
+        with FrameSampler(self.video_path, step=step, start_frame=start, seek_threshold=seek_threshold) as sampler:
+            got = list(sampler)
+        self.assertEqual([vf.index for vf in got], expected)
+        for vf in got:
+            self.assertAlmostEqual(vf.timestamp_ms, vf.index * 40.0)
+            self.assertTrue(np.array_equal(vf.image, self.frames[vf.index]))
+
+    def test_grab_mode(self):
+        self._check(step=3, start=0, seek_threshold=50)
+        self._check(step=3, start=7, seek_threshold=50)
+
+    def test_seek_mode(self):
+        self._check(step=10, start=0, seek_threshold=5)
+        self._check(step=7, start=5, seek_threshold=2)
+
+    def test_read_frame_at(self):
+        from analysis.frame_sampler import read_frame_at
+
+        vf = read_frame_at(self.video_path, 21)
+        self.assertEqual(vf.index, 21)
+        self.assertTrue(np.array_equal(vf.image, self.frames[21]))
+
+    def test_frame_step_for(self):
+        from analysis.frame_sampler import frame_step_for
+
+        self.assertEqual(frame_step_for(25.0, 10.0), 2)
+        self.assertEqual(frame_step_for(30.0, 10.0), 3)
+        self.assertEqual(frame_step_for(25.0, 0), 2)
@@ -0,0 +1,50 @@
+"""
+Test per la scelta delle impostazioni dal profilo hardware (analysis/hardware_profile.py).
+python -m unittest tests.test_hardware_profile -v
+"""
+import unittest
+
+
+def _row(threads, batch, size, ms):
+    return {"threads": threads, "batch_size": batch, "input_size": size, "ms_per_frame": ms}
+
+
+class TestHardwareProfile(unittest.TestCase):
+
+    def test_thread_candidates(self):
+        from analysis.hardware_profile import thread_candidates
+
+        self.assertEqual(thread_candidates(1), [1])
+        self.assertEqual(thread_candidates(6), [1, 2, 4, 6])
+        self.assertEqual(thread_candidates(8), [1, 2, 4, 8])
+
+    def test_predict_match_seconds_uses_slowest_stage(self):
+        from analysis.hardware_profile import predict_match_seconds
+
+        # 54000 frame campionati × 100 ms = 5400 s; decodifica 135000 frame a 100 fps = 1350 s
+        self.assertAlmostEqual(predict_match_seconds(100.0, 100.0, target_fps=10, video_fps=25), 5400.0)
+        self.assertAlmostEqual(predict_match_seconds(1.0, 50.0, target_fps=10, video_fps=25), 2700.0)
+
+    def test_choose_settings(self):
+        from analysis.hardware_profile import choose_settings
+
+        rows = [_row(4, 1, 640, 90.0), _row(4, 8, 640, 70.0), _row(8, 8, 640, 60.0), _row(8, 8, 416, 30.0)]
+        rec = choose_settings(rows, decode_fps=500.0)
+        self.assertEqual((rec["threads"], rec["batch_size"], rec["input_size"]), (8, 8, 640))
+        # RAM disponibile per un solo frame per batch
+        rec = choose_settings(rows, decode_fps=500.0, ram_available_gb=0.5)
+        self.assertEqual((rec["threads"], rec["batch_size"], rec["input_size"]), (4, 1, 640))
+        # Macchina lenta: oltre MAX_MATCH_TIME_S a 640 → input ridotto
+        slow = [_row(4, 1, 640, 400.0), _row(4, 1, 416, 150.0)]
+        self.assertEqual(choose_settings(slow, decode_fps=500.0)["input_size"], 416)
+
+    def test_profile_engine_args(self):
+        from analysis.hardware_profile import profile_engine_args
+
+        self.assertEqual(profile_engine_args(None), [])
+        profile = {"recommended": {"threads": 4, "batch_size": 8, "input_size": 640}}
+        self.assertEqual(profile_engine_args(profile), ["--threads", "4", "--batch-size", "8", "--input-size", "640"])
+
+
+if __name__ == "__main__":
+    unittest.main()
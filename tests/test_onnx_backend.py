@@ -0,0 +1,111 @@
+"""
+Test per il backend ONNX Runtime (analysis/detection_backends/onnx_runtime.py).
+python -m unittest tests.test_onnx_backend -v
+
+La parità con il backend torch richiede torch, yolox, onnx, onnxruntime e models/best_ckpt.pth:
+senza, quel test viene saltato.
+"""
+import importlib.util
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+def _has(*modules: str) -> bool:
+    return all(importlib.util.find_spec(m) is not None for m in modules)
+
+
+def _sample_frames(n: int = 4):
+    """Frame sintetici: prato verde con rettangoli chiari/scuri (sagome) e rumore."""
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(n):
+        img = np.zeros((720, 1280, 3), dtype=np.uint8)
+        img[:] = (40, 140, 40)
+        for _ in range(12):
+            x, y = int(rng.integers(0, 1240)), int(rng.integers(100, 660))
+            color = tuple(int(c) for c in rng.integers(0, 255, 3))
+            img[y: y + 60, x: x + 24] = color
+        img = np.clip(img.astype(np.int16) + rng.integers(-10, 10, img.shape), 0, 255).astype(np.uint8)
+        frames.append(img)
+    return frames
+
+
+class TestOnnxPostprocess(unittest.TestCase):
+    """Postprocess NumPy (senza modello): soglia obj*cls, cxcywh → xyxy, NMS class-agnostic."""
+
+    def test_postprocess_and_nms(self):
+        from analysis.detection_backends.onnx_runtime import postprocess
+
+        pred = np.zeros((1, 4, 5 + 8), dtype=np.float32)
+        pred[0, 0, :5] = (100, 100, 20, 40, 0.9)
+        pred[0, 0, 5 + 7] = 0.9  # player
+        pred[0, 1, :5] = (102, 101, 20, 40, 0.8)  # quasi coincidente → soppresso
+        pred[0, 1, 5 + 3] = 0.9
+        pred[0, 2, :5] = (300, 100, 10, 10, 0.9)
+        pred[0, 2, 5 + 0] = 0.5  # ball
+        pred[0, 3, :5] = (500, 100, 10, 10, 0.05)  # sotto soglia
+        pred[0, 3, 5 + 0] = 0.1
+        out = postprocess(pred, num_classes=8, conf_thre=0.01, nms_thre=0.65)[0]
+        self.assertEqual(out.shape, (2, 7))
+        np.testing.assert_allclose(out[0, :4], [90, 80, 110, 120])
+        self.assertEqual(int(out[0, 6]), 7)
+        self.assertEqual(int(out[1, 6]), 0)
+        self.assertIsNone(postprocess(np.zeros((1, 3, 13), dtype=np.float32), 8, 0.01, 0.65)[0])
+
+
+class TestQuantizationAgreement(unittest.TestCase):
+    """Abbinamento detection INT8 vs FP32 usato nel report di quantizzazione."""
+
+    def test_match_detections(self):
+        from analysis.detection_backends.quantization import match_detections
+        from analysis.player_detection import DetectionBatch
+
+        def batch(rows):
+            arr = np.array(rows, dtype=np.float64)
+            return DetectionBatch(xywh=arr[:, :4], conf=np.full(len(arr), 0.9),
+                                  class_id=arr[:, 4].astype(np.int64), team=np.full(len(arr), -1, dtype=np.int64))
+
+        ref = batch([[0, 0, 10, 20, 7], [100, 100, 10, 20, 7], [200, 0, 8, 8, 0]])
+        other = batch([[1, 0, 10, 20, 7], [100, 100, 10, 20, 4], [200, 0, 8, 8, 0], [400, 0, 8, 8, 0]])
+        matched, ious = match_detections(ref, other, iou_thresh=0.5)
+        self.assertEqual(matched, 2)  # classe diversa (7 vs 4) non abbinata
+        self.assertAlmostEqual(max(ious), 1.0)
+        self.assertEqual(match_detections(ref, DetectionBatch.empty())[0], 0)
+
+
+@unittest.skipUnless(_has("torch", "yolox", "onnx", "onnxruntime"), "torch/yolox/onnx/onnxruntime non installati")
+class TestOnnxParity(unittest.TestCase):
+    """Stesse detection del backend torch sugli stessi frame (box IoU > 0.95, stessa classe, conf ±0.02)."""
+
+    def test_parity_with_torch(self):
+        from analysis.detection_backends.onnx_runtime import OnnxPlayerDetector, export_onnx
+        from analysis.player_detection import PlayerDetector, _get_soccer_checkpoint
+
+        if _get_soccer_checkpoint() is None:
+            self.skipTest("models/best_ckpt.pth assente")
+        with tempfile.TemporaryDirectory() as tmp:
+            onnx_path = str(Path(tmp) / "soccer.onnx")
+            ok, msg = export_onnx(onnx_path, dynamic_batch=True)
+            self.assertTrue(ok, msg)
+            torch_det = PlayerDetector(conf_thresh=0.2, device="cpu")
+            onnx_det = OnnxPlayerDetector(conf_thresh=0.2, model_path=onnx_path)
+            frames = _sample_frames()
+            expected = [torch_det.detect(f) for f in frames]
+            for got in (onnx_det.detect_batch(frames), [onnx_det.detect(f) for f in frames]):
+                for exp_boxes, got_boxes in zip(expected, got):
+                    self.assertEqual(len(got_boxes), len(exp_boxes))
+                    for a, b in zip(exp_boxes, got_boxes):
+                        self.assertEqual(a.class_id, b.class_id)
+                        self.assertAlmostEqual(a.confidence, b.confidence, delta=0.02)
+                        self.assertGreater(_iou(a, b), 0.95)
+
+
+def _iou(a, b) -> float:
+    ix = max(0.0, min(a.x + a.w, b.x + b.w) - max(a.x, b.x))
+    iy = max(0.0, min(a.y + a.h, b.y + b.h) - max(a.y, b.y))
+    inter = ix * iy
+    union = a.w * a.h + b.w * b.h - inter
+    return inter / union if union > 0 else 0.0
@@ -0,0 +1,134 @@
+"""
+Test per l'indice overlay in memory-map (analysis/overlay_index.py).
+python -m unittest tests.test_overlay_index -v
+"""
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+
+def _write_project(tmp, n_frames=8):
+    from analysis.ball_tracking import get_ball_tracks_path
+    from analysis.player_tracking import get_tracks_path
+
+    frames, ball = [], []
+    for i in range(n_frames):
+        dets = [{"x": 10.0 * k + i, "y": 5.5, "w": 20.0, "h": 40.0, "team": k % 2, "track_id": k} for k in range(i % 4)]
+        if dets:
+            dets[0]["x_m"], dets[0]["y_m"] = 12.25, 30.5
+        frames.append({"frame": i, "detections": dets})
+        ball.append({"frame": i, "detection": {"x": 100.0 + i, "y": 50.0, "w": 8.0, "h": 8.0, "track_id": 0} if i % 3 else None})
+    players = {"frames": frames, "width": 640, "height": 360, "fps": 5.0, "tracks": {}}
+    balls = {"frames": ball, "width": 640, "height": 360, "fps": 5.0}
+    get_tracks_path(tmp).write_text(json.dumps(players))
+    get_ball_tracks_path(tmp).write_text(json.dumps(balls))
+    return players, balls
+
+
+class TestOverlayIndex(unittest.TestCase):
+
+    def test_memory_mapped_lookup_matches_json(self):
+        from analysis.overlay_index import load_overlay_index
+
+        with tempfile.TemporaryDirectory() as tmp:
+            players, balls = _write_project(tmp)
+            ball_idx, player_idx = load_overlay_index(tmp)
+            self.assertIsInstance(player_idx.records, np.memmap)
+            self.assertEqual((len(player_idx), len(ball_idx)), (8, 8))
+            self.assertEqual(player_idx.get("width"), 640)
+            for i, fd in enumerate(players["frames"]):
+                recs = player_idx.frame(i)
+                self.assertEqual(recs["track_id"].tolist(), [d["track_id"] for d in fd["detections"]])
+                self.assertEqual(recs["x"].tolist(), [d["x"] for d in fd["detections"]])
+            self.assertEqual(len(ball_idx.frame(3)), 0)
+            self.assertEqual(ball_idx.frame(4)["x"].tolist(), [104.0])
+
+            out = player_idx.to_json()
+            self.assertEqual(out["frames"][1]["detections"][0],
+                             {"x": 1.0, "y": 5.5, "w": 20.0, "h": 40.0, "team": 0, "track_id": 0, "x_m": 12.25, "y_m": 30.5})
+            self.assertEqual(out["fps"], 5.0)
+            self.assertIsNone(ball_idx.to_json()["frames"][0]["detection"])
+            # Finestra di campioni: stessi frame del dict completo, "frame" resta l'indice assoluto
+            window = player_idx.to_json(2, 5)
+            self.assertEqual(window["frames"], out["frames"][2:5])
+            self.assertEqual(window["width"], 640)
+            self.assertEqual(player_idx.to_json(7, 20)["frames"], out["frames"][7:])
+            self.assertEqual(player_idx.to_json(3, 3)["frames"], [])
+
+    def test_rebuilt_only_when_source_changes(self):
+        from analysis.overlay_index import get_overlay_index_dir, load_overlay_index
+        from analysis.player_tracking import get_tracks_path
+
+        with tempfile.TemporaryDirectory() as tmp:
+            _write_project(tmp)
+            _, first = load_overlay_index(tmp)
+            files = sorted(p.name for p in get_overlay_index_dir(tmp).iterdir())
+            _, again = load_overlay_index(tmp)
+            self.assertEqual(sorted(p.name for p in get_overlay_index_dir(tmp).iterdir()), files)
+            self.assertEqual(again.frame(3)["x"].tolist(), first.frame(3)["x"].tolist())
+
+            _write_project(tmp, n_frames=5)
+            st = os.stat(get_tracks_path(tmp))
+            os.utime(get_tracks_path(tmp), ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+            del first, again  # mappe aperte: su Windows impediscono solo la pulizia, non il nuovo indice
+            _, player_idx = load_overlay_index(tmp)
+            self.assertEqual(len(player_idx), 5)
+            self.assertEqual(len(list(get_overlay_index_dir(tmp).glob("player_*.npy"))), 2)
+
+    def test_from_payload_dict(self):
+        from analysis.overlay_index import OverlayIndex
+
+        with tempfile.TemporaryDirectory() as tmp:
+            players, _ = _write_project(tmp)
+        idx = OverlayIndex.from_player_tracks(players)
+        self.assertNotIsInstance(idx.records, np.memmap)
+        self.assertEqual(idx.frame(3)["team"].tolist(), [0, 1, 0])
+        ball = OverlayIndex.from_ball_tracks({"frames": [{"detections": [{"x": 1, "y": 2, "w": 3, "h": 4}]}, {}]})
+        self.assertEqual(ball.offsets.tolist(), [0, 1, 1])
+        self.assertTrue(ball.has_detections())
+
+    def test_adaptive_sampling_maps_video_time(self):
+        from analysis.overlay_index import OverlayIndex, load_overlay_index
+
+        with tempfile.TemporaryDirectory() as tmp:
+            players, balls = _write_project(tmp, n_frames=5)
+            video_frames = [0, 4, 5, 15, 30]  # passo variabile, fps video 5 → 0, 800, 1000, 3000, 6000 ms
+            for data in (players, balls):
+                data["sampling"] = {"mode": "adaptive", "base_step": 1}
+                for fd, vf in zip(data["frames"], video_frames):
+                    fd["video_frame"], fd["step"] = vf, 1
+            from analysis.ball_tracking import get_ball_tracks_path
+            from analysis.player_tracking import get_tracks_path
+            get_tracks_path(tmp).write_text(json.dumps(players))
+            get_ball_tracks_path(tmp).write_text(json.dumps(balls))
+
+            ball_idx, player_idx = load_overlay_index(tmp)
+            for idx in (ball_idx, player_idx, OverlayIndex.from_player_tracks(players)):
+                # Il rapporto uniforme (durata 7000 ms) darebbe 2 a 3000 ms e 4 a 5999 ms
+                self.assertEqual([idx.frame_at(ms, 7000) for ms in (0, 799, 800, 2999, 3000, 5999, 9000)],
+                                 [0, 0, 1, 2, 3, 3, 4])
+            out = player_idx.to_json()
+            self.assertEqual([fd["video_frame"] for fd in out["frames"]], video_frames)
+            self.assertEqual(out["sampling"]["mode"], "adaptive")
+            self.assertEqual(ball_idx.to_json()["frames"][3]["video_frame"], 15)
+            self.assertEqual(player_idx.to_json(3, 4)["frames"][0]["video_frame"], 15)
+            # Campioni con tempo in [inizio, fine] ms
+            self.assertEqual(player_idx.sample_range(800, 3000, 7000), (1, 4))
+            self.assertEqual(player_idx.sample_range(801, 2999, 7000), (2, 3))
+            self.assertEqual(player_idx.sample_range(-15000, 500, 7000), (0, 1))
+            self.assertEqual(player_idx.sample_range(6001, 9000, 7000), (0, 0))
+
+            # Passo fisso: rapporto temporale come prima
+            fixed = OverlayIndex.from_player_tracks(_write_project(tmp, n_frames=4)[0])
+            self.assertIsNone(fixed.video_frame)
+            self.assertEqual([fixed.frame_at(ms, 4000) for ms in (0, 1999, 3999)], [0, 1, 3])
+            self.assertEqual(fixed.sample_range(-500, 1999, 4000), (0, 2))
+            self.assertEqual(fixed.sample_range(1000, 9000, 4000), (1, 4))
+            self.assertNotIn("video_frame", fixed.to_json()["frames"][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
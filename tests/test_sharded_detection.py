@@ -0,0 +1,35 @@
+"""
+Test per la detection a shard temporali (analysis/sharded_detection.py): divisione e unione.
+python -m unittest tests.test_sharded_detection -v
+"""
+import unittest
+
+
+class TestShardedDetection(unittest.TestCase):
+    """Shard allineati a frame_step che coprono tutti i frame campionati; merge in ordine di frame."""
+
+    def test_shard_ranges_cover_sampled_frames(self):
+        from analysis.sharded_detection import shard_ranges
+
+        for total, step, workers in ((1000, 3, 4), (100, 2, 3), (7, 5, 4), (0, 2, 3)):
+            ranges = shard_ranges(total, step, workers)
+            self.assertLessEqual(len(ranges), max(1, workers))
+            self.assertIsNone(ranges[-1][1])
+            covered = []
+            for start, end in ranges:
+                self.assertEqual(start % step, 0)
+                stop = total if end is None else end
+                covered.extend(i for i in range(start, stop) if i % step == 0)
+            self.assertEqual(covered, list(range(0, total, step)))
+
+    def test_merge_detection_results(self):
+        from analysis.sharded_detection import merge_detection_results
+
+        a = {"frames": [{"frame": 0}, {"frame": 3}], "width": 0, "height": 0, "fps": 25.0, "frame_step": 3,
+             "crop_bounds": None}
+        b = {"frames": [{"frame": 6}, {"frame": 9}], "width": 300, "height": 200, "fps": 25.0, "frame_step": 3,
+             "crop_bounds": [10, 20, 310, 220]}
+        merged = merge_detection_results([b, a])
+        self.assertEqual([f["frame"] for f in merged["frames"]], [0, 3, 6, 9])
+        self.assertEqual(merged["crop_bounds"], [10, 20, 310, 220])
+        self.assertEqual((merged["width"], merged["height"], merged["frame_step"]), (300, 200, 3))
@@ -0,0 +1,68 @@
+"""
+Test per il descrittore maglia vettoriale e la divisione in squadre (analysis/team_classifier.py).
+python -m unittest tests.test_team_classifier -v
+"""
+import unittest
+
+import cv2
+import numpy as np
+
+
+def _scene():
+    """Campo verde con 5 maglie bianche, 5 rosse e un arbitro giallo (pantaloncini scuri)."""
+    from analysis.player_detection import BoundingBox
+
+    rng = np.random.default_rng(0)
+    frame = np.full((360, 640, 3), (40, 140, 40), dtype=np.uint8)
+    colors = {0: (215, 232, 240), 1: (30, 30, 200), -1: (0, 230, 230)}
+    boxes, truth = [], []
+    for i, team in enumerate([0] * 5 + [1] * 5 + [-1]):
+        x, y = 20 + 55 * i, 40 + int(rng.integers(0, 200))
+        frame[y:y + 30, x:x + 24] = colors[team]
+        frame[y + 30:y + 60, x:x + 24] = (20, 20, 20)
+        boxes.append(BoundingBox(float(x), float(y), 24.0, 60.0, 0.9))
+        truth.append(team)
+    return frame, boxes, truth
+
+
+class TestTeamClassifier(unittest.TestCase):
+
+    def test_jersey_descriptors(self):
+        from analysis.player_detection import BoundingBox
+        from analysis.team_classifier import _is_referee_jersey_hsv, jersey_descriptors
+
+        frame, boxes, truth = _scene()
+        desc = jersey_descriptors(frame, boxes + [BoundingBox(700.0, 10.0, 20.0, 20.0, 0.5)])
+        self.assertEqual(desc.shape, (12, 3))
+        red = cv2.cvtColor(np.uint8([[[30, 30, 200]]]), cv2.COLOR_BGR2HSV)[0, 0]
+        h = desc[5, 0]
+        self.assertLess(min(abs(h - red[0]), 180 - abs(h - red[0])), 2.0)
+        self.assertGreater(desc[5, 1], 200)
+        self.assertTrue(_is_referee_jersey_hsv(*desc[10]))
+        self.assertFalse(any(_is_referee_jersey_hsv(*d) for d in desc[:10]))
+        np.testing.assert_array_equal(desc[11], [0, 0, 0])  # box fuori dal frame
+
+    def test_describe_jerseys_keeps_team(self):
+        from analysis.team_classifier import JERSEY_HIST_BINS, JERSEY_HUE_BINS, describe_jerseys
+
+        frame, boxes, truth = _scene()
+        describe_jerseys(frame, boxes)
+        self.assertEqual({b.team for b in boxes}, {-1})
+        for b in boxes:
+            self.assertEqual(len(b.jersey_hist), JERSEY_HIST_BINS)
+            self.assertLessEqual(abs(sum(b.jersey_hist) - 100), JERSEY_HIST_BINS)
+        # Maglia bianca → bin "bianco", rossa → bin di tonalità 0
+        self.assertEqual(int(np.argmax(boxes[0].jersey_hist)), JERSEY_HUE_BINS + 2)
+        self.assertEqual(int(np.argmax(boxes[5].jersey_hist)), 0)
+
+    def test_classify_teams(self):
+        from analysis.team_classifier import classify_teams
+
+        frame, boxes, truth = _scene()
+        classify_teams(frame, boxes)
+        self.assertEqual([b.team for b in boxes], truth)
+        self.assertTrue(all(b.jersey_hsv is not None and len(b.jersey_hsv) == 3 for b in boxes))
+
+
+if __name__ == "__main__":
+    unittest.main()
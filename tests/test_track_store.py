@@ -0,0 +1,137 @@
+"""
+Test per l'archivio colonnare dei track giocatori (analysis/track_store.py).
+python -m unittest tests.test_track_store -v
+"""
+import json
+import os
+import tempfile
+import unittest
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+
+def _tracks_json(sampling=False):
+    frames = []
+    for i in range(6):
+        dets = [
+            {"x": 10.0 * k + i, "y": 20.5, "w": 30.0, "h": 60.0, "team": k % 2, "track_id": k,
+             "jersey_hsv": [100.0, 50.0, 25.5]}
+            for k in range(3) if (i + k) % 4
+        ]
+        if dets:
+            dets[0]["jersey_hist"] = [1, 2, 3]
+            dets[-1].pop("jersey_hsv")
+        fd = {"frame": i, "detections": dets}
+        if sampling:
+            fd["video_frame"] = 3 * i if i != 2 else None
+            fd["step"] = 3
+        frames.append(fd)
+    data = {"frames": frames, "width": 640, "height": 360, "fps": 25.0, "frame_step": 3,
+            "tracks": {"0": {"team": 0, "hits": 4}, "2": {"team": 0, "hits": 5}}}
+    if sampling:
+        data["sampling"] = {"base_step": 3}
+    return data
+
+
+class TestTrackStore(unittest.TestCase):
+
+    def test_json_round_trip(self):
+        from analysis.track_store import TrackStore
+
+        for sampling in (False, True):
+            data = _tracks_json(sampling)
+            store = TrackStore.from_json(data)
+            self.assertEqual(len(store), sum(len(f["detections"]) for f in data["frames"]))
+            self.assertEqual(store.n_frames, 6)
+            self.assertEqual(json.dumps(store.to_json()), json.dumps(data))
+            rows = store.rows(3)
+            self.assertEqual(store["track_id"][rows].tolist(), [0, 2])
+            self.assertEqual(store["frame"][rows].tolist(), [3, 3])
+            self.assertTrue(np.isnan(store["conf"]).all())
+
+    def test_save_load_and_stale_json(self):
+        from analysis.track_store import load_player_tracks, track_store_path, write_player_tracks, TrackStore
+
+        data = _tracks_json(True)
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = Path(tmp) / "player_tracks.json"
+            self.assertIsNone(load_player_tracks(json_path))
+            write_player_tracks(json_path, TrackStore.from_json(data))
+            self.assertEqual(json.loads(json_path.read_text()), data)
+            self.assertTrue(track_store_path(json_path).exists())
+            self.assertEqual(load_player_tracks(json_path).to_json(), data)
+
+            # JSON riscritto da altri (es. cloud): l'archivio più vecchio viene ricostruito
+            data["frames"][0]["detections"][0]["x_m"] = 12.34
+            data["frames"][0]["detections"][0]["y_m"] = 5.0
+            json_path.write_text(json.dumps(data))
+            st = os.stat(json_path)
+            os.utime(json_path, ns=(st.st_atime_ns, track_store_path(json_path).stat().st_mtime_ns + 10 ** 9))
+            store = load_player_tracks(json_path)
+            self.assertEqual(store.to_json(), data)
+            self.assertEqual(TrackStore.load(track_store_path(json_path)).to_json(), data)
+
+    def test_stabilize_teams_matches_counter(self):
+        from analysis.track_store import stabilize_teams
+
+        rng = np.random.default_rng(0)
+        tids = rng.integers(0, 20, 500).astype(np.int32)
+        teams = rng.integers(-1, 2, 500).astype(np.int8)
+        expected = {}
+        for t in set(tids.tolist()):
+            expected[t] = Counter(teams[tids == t].tolist()).most_common(1)[0][0]
+        out = stabilize_teams(tids, teams)
+        self.assertEqual(out.dtype, np.int8)
+        self.assertEqual(out.tolist(), [expected[t] for t in tids.tolist()])
+
+    def test_event_engine_accepts_store(self):
+        from analysis.adaptive_sampling import sample_times_ms
+        from analysis.event_engine import _build_frame_data
+        from analysis.track_store import TrackStore
+
+        data = _tracks_json(True)
+        ball = {"frames": [{"frame": 7, "detection": {"x": 1.0, "y": 2.0, "w": 2.0, "h": 2.0}}]}
+        store = TrackStore.from_json(data)
+        self.assertEqual(
+            _build_frame_data(store, ball, None, 640, 360, 105.0, 68.0),
+            _build_frame_data(data, ball, None, 640, 360, 105.0, 68.0),
+        )
+        self.assertEqual(sample_times_ms(store), sample_times_ms(data))
+        self.assertNotIn(2, sample_times_ms(store))
+
+
+    def test_team_overlay_applied_on_load(self):
+        from analysis.track_store import (
+            TrackStore, load_player_tracks, read_team_overlay, team_overlay_path, write_player_tracks, write_team_overlay,
+        )
+
+        data = _tracks_json()
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = Path(tmp) / "player_tracks.json"
+            write_player_tracks(json_path, TrackStore.from_json(data))
+            text = json_path.read_text()
+            self.assertEqual(write_team_overlay(json_path, {0: 1, 2: -1}), 1)
+            self.assertEqual(write_team_overlay(json_path, {0: 1, 2: 1}), 2)
+            self.assertEqual(read_team_overlay(json_path), {"revision": 2, "teams": {0: 1, 2: 1}})
+            self.assertEqual(json_path.read_text(), text)  # i track non vengono riscritti
+
+            out = load_player_tracks(json_path).to_json()
+            teams = {(d["track_id"], d["team"]) for fd in out["frames"] for d in fd["detections"]}
+            self.assertEqual(teams, {(0, 1), (1, 1), (2, 1)})
+            self.assertEqual(out["tracks"]["0"]["team"], 1)
+            self.assertEqual(load_player_tracks(json_path, apply_teams=False).to_json(), data)
+
+            # Track rigenerati: la mappa viene rimossa; un JSON riscritto da altri la invalida
+            write_player_tracks(json_path, TrackStore.from_json(data))
+            self.assertFalse(team_overlay_path(json_path).exists())
+            write_team_overlay(json_path, {0: 1})
+            json_path.write_text(json.dumps(data))
+            st = os.stat(json_path)
+            os.utime(json_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+            self.assertIsNone(read_team_overlay(json_path))
+            self.assertEqual(load_player_tracks(json_path).to_json(), data)
+
+if __name__ == "__main__":
+    unittest.main()
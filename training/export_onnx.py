@@ -0,0 +1,45 @@
+"""
+Esporta il modello YOLOX-s soccer (models/best_ckpt.pth) in ONNX per il backend ONNX Runtime.
+
+Esegui dalla root del progetto:
+  python training/export_onnx.py                      # batch fisso 1 → models/best_ckpt.onnx
+  python training/export_onnx.py --batch 4            # batch fisso 4 (usare con --batch-size 4)
+  python training/export_onnx.py --dynamic            # batch dinamico
+
+Poi: FOOTBALL_ANALYZER_DETECTION_BACKEND=onnx python analysis_engine.py ...
+Richiede: pip install torch torchvision yolox onnx (solo per l'export; a runtime basta onnxruntime).
+"""
+import argparse
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export modello soccer YOLOX in ONNX")
+    parser.add_argument("--checkpoint", type=str, default=None, help="Path a best_ckpt.pth (default: models/best_ckpt.pth)")
+    parser.add_argument("--output", type=str, default=None, help="Path .onnx di output (default: models/best_ckpt.onnx)")
+    parser.add_argument("--batch", type=int, default=1, help="Dimensione batch fissa dell'input")
+    parser.add_argument("--dynamic", action="store_true", help="Asse batch dinamico (ignora --batch)")
+    parser.add_argument("--opset", type=int, default=11, help="Versione opset ONNX")
+    args = parser.parse_args()
+
+    from analysis.detection_backends.onnx_runtime import export_onnx
+
+    ok, msg = export_onnx(
+        output_path=args.output,
+        checkpoint_path=args.checkpoint,
+        batch_size=args.batch,
+        dynamic_batch=args.dynamic,
+        opset=args.opset,
+    )
+    if not ok:
+        print(f"Export fallito: {msg}")
+        sys.exit(1)
+    print(f"Modello ONNX salvato in {msg}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Quantizza il modello ONNX soccer in INT8 e confronta velocità/detection con FP32.
+
+Esegui dalla root del progetto (dopo training/export_onnx.py):
+  python training/quantize_onnx.py --videos partita1.mp4                 # dynamic → models/best_ckpt.int8.onnx
+  python training/quantize_onnx.py --mode static --videos a.mp4 b.mp4    # static, calibrazione sui video
+  python training/quantize_onnx.py --mode static --videos a.mp4 --calibration analysis_output/field_calibration.json
+
+Il report (JSON) viene salvato accanto al modello INT8 (<modello>.report.json).
+Uso in analisi: FOOTBALL_ANALYZER_ONNX_PRECISION=int8 python analysis_engine.py ...
+Richiede: pip install onnxruntime onnx
+"""
+import argparse
+import json
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantizzazione INT8 modello soccer ONNX")
+    parser.add_argument("--mode", choices=("dynamic", "static"), default="dynamic", help="Tipo di quantizzazione")
+    parser.add_argument("--videos", nargs="*", default=[], help="Video da cui estrarre frame di calibrazione/confronto")
+    parser.add_argument("--frames", type=int, default=64, help="Numero di frame di calibrazione")
+    parser.add_argument("--eval-frames", type=int, default=32, help="Numero di frame per il confronto FP32/INT8")
+    parser.add_argument("--calibration", type=str, default=None, help="field_calibration.json per ritagliare al campo")
+    parser.add_argument("--fp32", type=str, default=None, help="Modello FP32 (default: models/best_ckpt.onnx)")
+    parser.add_argument("--output", type=str, default=None, help="Modello INT8 (default: models/best_ckpt.int8.onnx)")
+    parser.add_argument("--per-channel", action="store_true", help="Quantizzazione pesi per canale")
+    parser.add_argument("--conf", type=float, default=0.2, help="Soglia confidence per il confronto")
+    args = parser.parse_args()
+
+    from analysis.detection_backends.onnx_runtime import get_onnx_model_path
+    from analysis.detection_backends.quantization import compare_models, extract_calibration_frames, quantize_model
+
+    fp32_path = args.fp32 or str(get_onnx_model_path("fp32"))
+    int8_path = args.output or str(get_onnx_model_path("int8"))
+
+    calib_frames = []
+    if args.mode == "static":
+        print(f"Estrazione {args.frames} frame di calibrazione da {len(args.videos)} video...")
+        calib_frames = extract_calibration_frames(args.videos, args.frames, args.calibration)
+    ok, msg = quantize_model(fp32_path, int8_path, args.mode, calib_frames, per_channel=args.per_channel)
+    if not ok:
+        print(f"Quantizzazione fallita: {msg}")
+        sys.exit(1)
+    print(f"Modello INT8 ({args.mode}) salvato in {int8_path}")
+
+    eval_frames = extract_calibration_frames(args.videos, args.eval_frames, args.calibration)
+    if not eval_frames:
+        print("Nessun video per il confronto: report saltato (passa --videos).")
+        return
+    report = compare_models(fp32_path, int8_path, eval_frames, conf_thresh=args.conf)
+    report["mode"] = args.mode
+    report["per_channel"] = args.per_channel
+    report_path = Path(int8_path).with_suffix(".report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    agr = report["agreement"]
+    print(f"FP32: {report['fp32']['ms_per_frame']} ms/frame, {report['fp32']['size_mb']} MB")
+    print(f"INT8: {report['int8']['ms_per_frame']} ms/frame, {report['int8']['size_mb']} MB (speedup x{report['speedup']})")
+    print(f"Accordo detection: precision {agr['precision']}, recall {agr['recall']}, F1 {agr['f1']}, IoU medio {agr['mean_iou']}")
+    print(f"Report: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,17 +9,19 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 
+from analysis.checkpoint_log import read_checkpoint_tail
 from analysis.config import get_calibration_path
+from analysis.hardware_profile import load_profile, profile_engine_args
 
 
 def has_checkpoint(project_analysis_dir: str, mode: str) -> bool:
-    """Verifica se esiste un checkpoint per la modalità indicata."""
+    """Verifica se esiste un checkpoint (log di un'analisi interrotta) per la modalità indicata."""
     det_dir = Path(project_analysis_dir) / "analysis_output" / "detections"
     if mode in ("player", "full"):
-        if list(det_dir.glob("player_detections_checkpoint_*.json")):
+        if read_checkpoint_tail(det_dir / "player_detections.json") is not None:
             return True
     if mode in ("ball", "full"):
-        if list(det_dir.glob("ball_detections_checkpoint_*.json")):
+        if read_checkpoint_tail(det_dir / "ball_detections.json") is not None:
             return True
     return False
 
@@ -32,7 +34,10 @@ def _get_engine_command(
     resume: bool = False,
     run_preprocess: bool = False,
 ) -> list:
-    """Ritorna comando per avviare analysis_engine. Preferisce script Python (exe ha bug YOLOX)."""
+    """
+    Ritorna comando per avviare analysis_engine. Preferisce script Python (exe ha bug YOLOX).
+    Thread, batch e lato input vengono dal profilo hardware (analysis/hardware_profile.py).
+    """
     exe_path = project_root / "dist" / "analysis_engine" / "analysis_engine.exe"
     script_path = project_root / "analysis_engine.py"
     use_crop = (get_calibration_path(project_analysis_dir)).exists()
@@ -45,6 +50,9 @@ def _get_engine_command(
         "--checkpoint-first", "500",
         "--checkpoint-interval", "1000",
     ] + crop_args
+    # Impostazioni dal profilo hardware; senza profilo il motore esegue il benchmark al primo avvio
+    profile = load_profile()
+    base_args += profile_engine_args(profile) if profile else ["--auto-tune"]
     if resume:
         base_args.append("--resume")
     if run_preprocess:
@@ -106,9 +114,8 @@ class AnalysisProcessDialog(QDialog):
             return {}
         order = [
             "preprocess",
-            "player_detection",
+            "detection",
             "player_tracking",
-            "ball_detection",
             "ball_tracking",
             "global_team_clustering",
             "event_engine",
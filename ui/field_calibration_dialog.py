@@ -407,16 +407,12 @@ class FieldCalibrationDialog(QDialog):
     # ── Carica frame ───────────────────────────────────────────────────────
     def _load_frame(self):
         try:
-            cap = cv2.VideoCapture(self._video_path)
-            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
-            frame_idx = int(self._video_pos_ms / 1000.0 * fps)
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-            ret, frame = cap.read()
-            cap.release()
-            if not ret:
-                cap2 = cv2.VideoCapture(self._video_path)
-                ret, frame = cap2.read()
-                cap2.release()
+            from analysis.frame_sampler import FrameSampler
+            with FrameSampler(self._video_path) as sampler:
+                frame_idx = int(self._video_pos_ms / 1000.0 * sampler.fps)
+                vf = sampler.read_frame(frame_idx) or sampler.read_frame(0)
+            ret = vf is not None
+            frame = vf.image if ret else None
             if ret:
                 self._frame_bgr = frame.copy()   # salva per auto-detection
                 rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
@@ -11,6 +11,9 @@ from PyQt5.QtWidgets import QWidget, QVBoxLayout
 from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtGui import QImage, QPixmap
 
+from analysis.overlay_index import OverlayIndex
+from analysis.track_store import ROLE_NAMES
+
 from .drawing_overlay import DrawingOverlay
 
 
@@ -51,8 +54,8 @@ class OpenCVVideoWidget(QWidget):
         self._timer.timeout.connect(self._next_frame)
         self._zoom_zone_factor = 2.0  # fattore zoom nella zona (1.0–5.0)
         self._zoom_zone_pan = (0, 0)  # (pan_x, pan_y) in frame pixels per pan nella zona
-        self._ball_tracks = None
-        self._player_tracks = None
+        self._ball_tracks = None  # OverlayIndex
+        self._player_tracks = None  # OverlayIndex
         self._show_tracking = False
         self._graphics_view.zoomZoneDefined.connect(self._on_zoom_zone_defined)
         self._graphics_view.zoomZoneWheelRequested.connect(self._on_zoom_zone_wheel)
@@ -287,8 +290,15 @@ class OpenCVVideoWidget(QWidget):
             self._display_frame(frame)
         self._capture.set(cv2.CAP_PROP_POS_MSEC, pos_ms)
 
-    def setTrackingOverlay(self, ball_tracks: dict = None, player_tracks: dict = None):
-        """Imposta i dati per overlay (ball_tracks.json, player_tracks.json)."""
+    def setTrackingOverlay(self, ball_tracks=None, player_tracks=None):
+        """
+        Imposta i dati per overlay: OverlayIndex (memory-map, da load_overlay_index) oppure dict
+        ball_tracks.json / player_tracks.json (es. payload cloud), convertiti una volta in indice.
+        """
+        if isinstance(ball_tracks, dict):
+            ball_tracks = OverlayIndex.from_ball_tracks(ball_tracks)
+        if isinstance(player_tracks, dict):
+            player_tracks = OverlayIndex.from_player_tracks(player_tracks)
         self._ball_tracks = ball_tracks
         self._player_tracks = player_tracks
 
@@ -314,24 +324,10 @@ class OpenCVVideoWidget(QWidget):
         pos_ms = getattr(self, '_position_ms', 0)
         duration_ms = getattr(self, '_duration_ms', 0)
         fh, fw = frame.shape[:2]
-        # Indice frame: usa rapporto temporale per allineare display video ↔ analisi
-        # (display e analisi possono avere FPS/durata diversi se uno è preprocessato)
-        def _get_frame_idx(frames_data):
-            n = len(frames_data)
-            if n == 0:
-                return -1
-            if duration_ms and duration_ms > 0:
-                ratio = min(1.0, max(0.0, pos_ms / duration_ms))
-                return min(n - 1, int(ratio * n))
-            fps = 25
-            for data in (self._ball_tracks, self._player_tracks):
-                if data and data.get("fps"):
-                    fps = float(data.get("fps", 25))
-                    break
-            else:
-                fps = getattr(self, '_fps', 25) or 25
-            idx = int(round(pos_ms * fps / 1000))
-            return max(0, min(n - 1, idx))
+        # Indice frame: tempo del campione (campionamento adattivo) o rapporto temporale
+        # display video ↔ analisi (vedi OverlayIndex.frame_at)
+        def _get_frame_idx(index):
+            return index.frame_at(pos_ms, duration_ms)
         # Scala coordinate: JSON = risoluzione video analisi, frame = risoluzione video mostrato
         def _scale(x, y, w, h, src_w, src_h):
             # Corregge w/h negativi: se negativi, (x,y) è angolo opposto, normalizza a (x_top, y_top, w, h)
@@ -351,19 +347,16 @@ class OpenCVVideoWidget(QWidget):
 
         # Ball: cerchio arancione
         if self._ball_tracks:
-            frames_data = self._ball_tracks.get("frames", [])
-            src_w = int(self._ball_tracks.get("width", 0) or 0)
-            src_h = int(self._ball_tracks.get("height", 0) or 0)
-            frame_idx = _get_frame_idx(frames_data)
-            if os.environ.get("FOOTBALL_ANALYZER_DEBUG") and frames_data:
+            index = self._ball_tracks
+            src_w = int(index.get("width", 0) or 0)
+            src_h = int(index.get("height", 0) or 0)
+            frame_idx = _get_frame_idx(index)
+            if os.environ.get("FOOTBALL_ANALYZER_DEBUG") and len(index):
                 import logging
-                logging.debug("tracking ball: pos_ms=%s duration=%s frame_idx=%s len=%s", pos_ms, duration_ms, frame_idx, len(frames_data))
-            if 0 <= frame_idx < len(frames_data):
-                det = frames_data[frame_idx].get("detection")
-                if det:
-                    x, y, bw, bh = det.get("x", 0), det.get("y", 0), det.get("w", 0), det.get("h", 0)
-                    x, y, bw, bh = float(x), float(y), float(bw), float(bh)
-                    x, y, bw, bh = _scale(x, y, bw, bh, src_w, src_h)
+                logging.debug("tracking ball: pos_ms=%s duration=%s frame_idx=%s len=%s", pos_ms, duration_ms, frame_idx, len(index))
+            if 0 <= frame_idx < len(index):
+                for rec in index.frame(frame_idx)[:1].tolist():
+                    x, y, bw, bh = _scale(rec[0], rec[1], rec[2], rec[3], src_w, src_h)
                     cx = x + bw // 2
                     cy = y + bh // 2
                     r = max(14, min(bw, bh) // 2 + 2)
@@ -371,19 +364,15 @@ class OpenCVVideoWidget(QWidget):
 
         # Players: rettangoli con track_id, colore per team
         if self._player_tracks:
-            frames_data = self._player_tracks.get("frames", [])
-            src_w = int(self._player_tracks.get("width", 0) or 0)
-            src_h = int(self._player_tracks.get("height", 0) or 0)
-            frame_idx = _get_frame_idx(frames_data)
-            if 0 <= frame_idx < len(frames_data):
-                for d in frames_data[frame_idx].get("detections", []):
-                    x, y, pw, ph = _scale(
-                        d.get("x", 0), d.get("y", 0), d.get("w", 0), d.get("h", 0),
-                        src_w, src_h
-                    )
-                    team = d.get("team", -1)
-                    role = d.get("role", "player")
-                    tid = d.get("track_id", -1)
+            index = self._player_tracks
+            src_w = int(index.get("width", 0) or 0)
+            src_h = int(index.get("height", 0) or 0)
+            frame_idx = _get_frame_idx(index)
+            if 0 <= frame_idx < len(index):
+                # Record: (x, y, w, h, x_m, y_m, track_id, team, role)
+                for rx, ry, rw, rh, _, _, tid, team, role_code in index.frame(frame_idx).tolist():
+                    x, y, pw, ph = _scale(rx, ry, rw, rh, src_w, src_h)
+                    role = ROLE_NAMES[role_code] if role_code >= 0 else "player"
                     # Colore per ruolo (BGR)
                     if role == "ball":
                         color = (0, 165, 255)    # arancione - palla